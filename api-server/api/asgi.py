@@ -0,0 +1,247 @@
+"""
+ASGI variant of index.py's /prompt endpoint - same request and response.
+
+    uvicorn asgi:app --app-dir api --port 8000 --workers 1
+
+One event loop serves many prompts at once:
+- OpenAI calls use the async client (modules/async_llm.py)
+- psycopg2 work (schema lookup, run_sql, the self correction assistant) runs on worker threads
+  with connections from one shared pool
+
+Load shedding:
+- at most MAX_CONCURRENT_PROMPTS prompts run at once, up to MAX_QUEUED_PROMPTS more wait for a slot
+- beyond that requests get 429 with Retry-After instead of piling up
+- each request has PROMPT_DEADLINE_SECONDS (queueing included) before it gets 504. Its running
+  queries are cancelled, and it keeps its slot until the threads it started have finished
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from psycopg2 import Error as PostgresError
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+import index
+from index import DB_URL, SQL_DEVELOPER_INSTRUCTIONS
+from modules import async_llm, db, instruments, llm, rand
+from modules.models import TurboTool
+from modules.tool_calls import MAX_TOOL_WORKERS
+
+MAX_CONCURRENT_PROMPTS = int(os.environ.get("MAX_CONCURRENT_PROMPTS", "8"))
+MAX_QUEUED_PROMPTS = int(os.environ.get("MAX_QUEUED_PROMPTS", "16"))
+PROMPT_DEADLINE_SECONDS = float(os.environ.get("PROMPT_DEADLINE_SECONDS", "60"))
+
+
+class PromptLimiter:
+    """
+    Concurrency limit with a bounded queue - admit() is False once running + waiting hits the cap
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.admitted = 0
+
+    def admit(self) -> bool:
+        if self.admitted >= self.max_concurrent + self.max_queued:
+            return False
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.admitted -= 1
+
+    def slot(self) -> asyncio.Semaphore:
+        # created on first use so it belongs to the server's event loop
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self.semaphore
+
+
+limiter = PromptLimiter(MAX_CONCURRENT_PROMPTS, MAX_QUEUED_PROMPTS)
+
+_db_pool: Optional[db.PostgresConnectionPool] = None
+
+
+def get_db_pool() -> db.PostgresConnectionPool:
+    """
+    One connection per running prompt plus spares for its parallel run_sql calls
+    """
+    global _db_pool
+    if _db_pool is None:
+        _db_pool = db.PostgresConnectionPool(
+            DB_URL, maxconn=MAX_CONCURRENT_PROMPTS + MAX_TOOL_WORKERS
+        )
+    return _db_pool
+
+
+# ---------------- Prompt Pipeline ----------------
+
+
+async def run_prompt(base_prompt: str, deadline: float) -> Optional[dict]:
+    """
+    index.prompt's pipeline. Returns None when no tables match the prompt.
+
+    When cancelled (the deadline) its running queries are cancelled and it only returns once
+    every thread it started is done - until then the request keeps its slot.
+    """
+    loop = asyncio.get_running_loop()
+    background = set()
+
+    async def blocking(func, *args):
+        """
+        Run sync work on a thread. Shielded so cancelling the request doesn't abandon the thread -
+        the finally below waits for it.
+        """
+        future = loop.run_in_executor(None, func, *args)
+        background.add(future)
+        future.add_done_callback(background.discard)
+        return await asyncio.shield(future)
+
+    def remaining() -> float:
+        return max(deadline - time.monotonic(), 1.0)
+
+    agent_instruments = instruments.PostgresAgentInstruments(
+        DB_URL, rand.generate_session_id(base_prompt), db_pool=get_db_pool()
+    )
+    try:
+        # inside the try - a deadline during __enter__ still closes whatever it opened
+        agent_instruments, prompt_db = await blocking(agent_instruments.__enter__)
+        prompt = await blocking(index.build_sql_prompt, prompt_db, base_prompt)
+        if prompt is None:
+            return None
+
+        sql_response = await async_llm.prompt(
+            prompt,
+            model="gpt-4-1106-preview",
+            instructions=SQL_DEVELOPER_INSTRUCTIONS,
+            timeout=remaining(),
+        )
+
+        tools = [
+            TurboTool("run_sql", llm.run_sql_tool_config, agent_instruments.run_sql),
+        ]
+        try:
+            await async_llm.prompt_func(
+                "Use the run_sql function to run the SQL you've just generated: "
+                + sql_response,
+                model="gpt-4-1106-preview",
+                instructions=SQL_DEVELOPER_INSTRUCTIONS,
+                turbo_tools=tools,
+                timeout=remaining(),
+                run_tool=blocking,
+            )
+            await blocking(agent_instruments.validate_run_sql)
+        except PostgresError as e:
+            print(f"Received PostgresError -> Running Self Correction Team To Resolve: {e}")
+            # the assistants api pipeline is sync - run it off the event loop
+            await blocking(
+                index.self_correcting_assistant, prompt_db, agent_instruments, tools, e
+            )
+
+        def read_results():
+            with open(agent_instruments.sql_query_file) as f:
+                sql_query = f.read()
+            with open(agent_instruments.run_sql_results_file) as f:
+                sql_query_results = f.read()
+            return sql_query, sql_query_results
+
+        sql_query, sql_query_results = await blocking(read_results)
+        return {"prompt": base_prompt, "results": sql_query_results, "sql": sql_query}
+    finally:
+        if background:
+            # cancelled mid-query - stop the queries, then wait for the threads before the
+            # connections go back to the pool
+            agent_instruments.cancel_queries()
+            await asyncio.gather(*list(background), return_exceptions=True)
+        await loop.run_in_executor(None, agent_instruments.__exit__, None, None, None)
+
+
+async def run_prompt_within_limits(base_prompt: str, deadline: float) -> Optional[dict]:
+    async with limiter.slot():
+        return await run_prompt(base_prompt, deadline)
+
+
+# ---------------- Endpoints ----------------
+
+
+def release_when_done(task: asyncio.Task):
+    limiter.release()
+    # a timed out prompt's outcome has nobody to go to
+    if not task.cancelled():
+        task.exception()
+
+
+async def prompt(request: Request):
+    if not limiter.admit():
+        return PlainTextResponse(
+            "Too many prompts in flight, try again shortly.",
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+
+    try:
+        base_prompt = (await request.json())["prompt"]
+    except Exception:
+        limiter.release()
+        raise
+
+    deadline = time.monotonic() + PROMPT_DEADLINE_SECONDS
+    task = asyncio.ensure_future(run_prompt_within_limits(base_prompt, deadline))
+    # admitted (and holding its slot) until the work has really stopped, so a prompt that timed out
+    # still counts towards backpressure while its threads wind down
+    task.add_done_callback(release_when_done)
+
+    # covers waiting for a slot too
+    done, _ = await asyncio.wait({task}, timeout=PROMPT_DEADLINE_SECONDS)
+    if not done:
+        task.cancel()
+        return PlainTextResponse(
+            f"Prompt did not finish within {PROMPT_DEADLINE_SECONDS:.0f}s.",
+            status_code=504,
+        )
+
+    response_obj = task.result()
+    if response_obj is None:
+        return PlainTextResponse("No similar tables found.", status_code=400)
+
+    return JSONResponse(response_obj)
+
+
+async def warmup(request: Request):
+    return JSONResponse(await asyncio.to_thread(index.warm_up))
+
+
+async def health(request: Request):
+    return JSONResponse(
+        {
+            "admitted": limiter.admitted,
+            "max_concurrent": limiter.max_concurrent,
+            "max_queued": limiter.max_queued,
+        }
+    )
+
+
+app = Starlette(
+    routes=[
+        Route("/prompt", prompt, methods=["POST"]),
+        Route("/warmup", warmup, methods=["GET"]),
+        Route("/health", health, methods=["GET"]),
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_headers=["Content-Type", "Authorization"],
+            allow_methods=["GET", "PUT", "POST", "DELETE", "OPTIONS"],
+        )
+    ],
+)
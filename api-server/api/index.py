@@ -1,10 +1,13 @@
 import json
-from flask import Flask, Request, Response, jsonify, request, make_response
+from flask import Flask, Request, Response, jsonify, request, make_response, stream_with_context
 import dotenv
-from modules import db, llm, emb, instruments
-from modules.turbo4 import Turbo4
+from modules import db, llm, emb, instruments, rand
 
 import os
+import queue
+import threading
+import time
+from typing import Optional
 
 from modules.models import TurboTool
 from psycopg2 import Error as PostgresError
@@ -24,6 +27,14 @@ assert os.environ.get(
 DB_URL = os.environ.get("DATABASE_URL")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
+SQL_DEVELOPER_INSTRUCTIONS = "You're an elite SQL developer. You generate the most concise and performant SQL queries."
+
+# number of result rows sent in the rows events of the streaming endpoint, ahead of the done payload
+STREAM_FIRST_ROWS = 20
+
+# load the schema cache while the instance starts instead of on its first request
+WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "0") == "1"
+
 # ---------------- Cors Helper ----------------
 
 
@@ -78,6 +89,9 @@ def self_correcting_assistant(
 
     assistant_name = "SQL Self Correction"
 
+    # only the self correction path needs the assistants api
+    from modules.turbo4 import Turbo4
+
     turbo4_assistant = Turbo4().get_or_create_assistant(assistant_name)
 
     print(f"Generated Assistant: {assistant_name}")
@@ -116,6 +130,116 @@ def self_correcting_assistant(
     pass
 
 
+# ---------------- Prompt Pipeline Steps ----------------
+
+
+def build_sql_prompt(db: db.PostgresManager, base_prompt: str):
+    """
+    Attach the table definitions that match the prompt. Returns None if no tables match.
+    """
+    # simple word match for now - dropped embeddings for deployment size
+    similar_tables = emb.DatabaseEmbedder(db).get_similar_table_defs_for_prompt(
+        base_prompt
+    )
+
+    if len(similar_tables) == 0:
+        print(f"No similar tables found for prompt: {base_prompt}")
+        return None
+
+    print("similar_tables", similar_tables)
+
+    print(f"base_prompt: {base_prompt}")
+
+    prompt = f"Fulfill this database query: {base_prompt}. "
+    return llm.add_cap_ref(
+        prompt,
+        f"Use these TABLE_DEFINITIONS to satisfy the database query.",
+        "TABLE_DEFINITIONS",
+        similar_tables,
+    )
+
+
+def run_sql_tools(agent_instruments: instruments.PostgresAgentInstruments) -> list:
+    return [
+        TurboTool("run_sql", llm.run_sql_tool_config, agent_instruments.run_sql),
+    ]
+
+
+def try_generated_sql(
+    agent_instruments: instruments.PostgresAgentInstruments,
+    tools: list,
+    sql_response: str,
+) -> Optional[PostgresError]:
+    """
+    Have the model run the sql it generated. Returns the PostgresError if it failed, None if it ran.
+    """
+    try:
+        llm.prompt_func(
+            "Use the run_sql function to run the SQL you've just generated: "
+            + sql_response,
+            model="gpt-4-1106-preview",
+            instructions=SQL_DEVELOPER_INSTRUCTIONS,
+            turbo_tools=tools,
+        )
+        agent_instruments.validate_run_sql()
+        return None
+    except PostgresError as e:
+        print(
+            f"Received PostgresError -> Running Self Correction Team To Resolve: {e}"
+        )
+        return e
+
+
+def run_generated_sql(
+    db: db.PostgresManager,
+    agent_instruments: instruments.PostgresAgentInstruments,
+    sql_response: str,
+):
+    """
+    Have the model run the sql it generated. Falls back to the self correcting assistant on postgres errors.
+    Returns True if the self correcting assistant had to step in.
+    """
+    tools = run_sql_tools(agent_instruments)
+
+    error = try_generated_sql(agent_instruments, tools, sql_response)
+    if error is None:
+        return False
+
+    # ---------------- Run Self Correction Team - Diagnosis, Generate New SQL, Retry ----------------
+    self_correcting_assistant(db, agent_instruments, tools, error)
+
+    print(f"Self Correction Team Complete.")
+    return True
+
+
+# ---------------- Warm Up ----------------
+
+
+def warm_up() -> dict:
+    """
+    Fill the schema cache so the first prompt on this instance doesn't pay for it
+    """
+    start = time.time()
+    with db.PostgresManager() as warm_db:
+        warm_db.connect_with_url(DB_URL)
+        table_count = len(emb.get_table_definition_map(warm_db, refresh=True))
+    seconds = round(time.time() - start, 3)
+    print(f"🔥 Warmed up {table_count} table definitions in {seconds}s")
+    return {"tables": table_count, "seconds": seconds}
+
+
+@app.route("/warmup", methods=["GET"])
+def warmup():
+    """
+    Point the platform's warm-up / cron ping here
+    """
+    return jsonify(warm_up())
+
+
+if WARMUP_ON_START:
+    warm_up()
+
+
 # ---------------- Primary Endpoint ----------------
 
 
@@ -126,67 +250,34 @@ def prompt():
     if request.method == "OPTIONS":
         return response
 
-    # Get access to db, state, and functions
-    with instruments.PostgresAgentInstruments(DB_URL, "prompt-endpoint") as (
+    base_prompt = request.json["prompt"]
+
+    # Get access to db, state, and functions - every request gets its own session so concurrent requests can't
+    # overwrite each other's result files
+    with instruments.PostgresAgentInstruments(
+        DB_URL, rand.generate_session_id(base_prompt)
+    ) as (
         agent_instruments,
         db,
     ):
         # ---------------- Build Prompt ----------------
 
-        base_prompt = request.json["prompt"]
-
-        # simple word match for now - dropped embeddings for deployment size
-        similar_tables = emb.DatabaseEmbedder(db).get_similar_table_defs_for_prompt(
-            base_prompt
-        )
+        prompt = build_sql_prompt(db, base_prompt)
 
-        if len(similar_tables) == 0:
-            print(f"No similar tables found for prompt: {base_prompt}")
+        if prompt is None:
             response.status_code = 400
             response.data = "No similar tables found."
             return response
 
-        print("similar_tables", similar_tables)
-
-        print(f"base_prompt: {base_prompt}")
-
-        prompt = f"Fulfill this database query: {base_prompt}. "
-        prompt = llm.add_cap_ref(
-            prompt,
-            f"Use these TABLE_DEFINITIONS to satisfy the database query.",
-            "TABLE_DEFINITIONS",
-            similar_tables,
-        )
-
         # ---------------- Run 2 Agent Team - Generate SQL & Results ----------------
 
-        tools = [
-            TurboTool("run_sql", llm.run_sql_tool_config, agent_instruments.run_sql),
-        ]
-
         sql_response = llm.prompt(
             prompt,
             model="gpt-4-1106-preview",
-            instructions="You're an elite SQL developer. You generate the most concise and performant SQL queries.",
+            instructions=SQL_DEVELOPER_INSTRUCTIONS,
         )
-        try:
-            llm.prompt_func(
-                "Use the run_sql function to run the SQL you've just generated: "
-                + sql_response,
-                model="gpt-4-1106-preview",
-                instructions="You're an elite SQL developer. You generate the most concise and performant SQL queries.",
-                turbo_tools=tools,
-            )
-            agent_instruments.validate_run_sql()
-        except PostgresError as e:
-            print(
-                f"Received PostgresError -> Running Self Correction Team To Resolve: {e}"
-            )
-
-            # ---------------- Run Self Correction Team - Diagnosis, Generate New SQL, Retry ----------------
-            self_correcting_assistant(db, agent_instruments, tools, e)
 
-            print(f"Self Correction Team Complete.")
+        run_generated_sql(db, agent_instruments, sql_response)
 
         # ---------------- Read result files and respond ----------------
 
@@ -206,6 +297,145 @@ def prompt():
         return response
 
 
+# ---------------- Streaming Endpoint ----------------
+
+
+def sse_event(event: str, data) -> str:
+    """
+    Format a single Server-Sent-Event
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def run_sql_stage(
+    events: queue.Queue,
+    db: db.PostgresManager,
+    agent_instruments: instruments.PostgresAgentInstruments,
+    sql_response: str,
+):
+    """
+    run_generated_sql for prompt_stream, on a worker thread. Puts (event, data) on events and ends
+    with (None, None), or (None, exception) when it failed.
+    """
+    try:
+        tools = run_sql_tools(agent_instruments)
+        error = try_generated_sql(agent_instruments, tools, sql_response)
+        if error is not None:
+            # announced before the team runs - it can take several round trips
+            events.put(("stage", {"stage": "self_correction"}))
+            self_correcting_assistant(db, agent_instruments, tools, error)
+            print(f"Self Correction Team Complete.")
+        events.put((None, None))
+    except Exception as e:
+        events.put((None, e))
+
+
+@app.route("/prompt/stream", methods=["GET", "POST", "OPTIONS"])
+def prompt_stream():
+    """
+    Same pipeline as /prompt but streamed as Server-Sent-Events:
+
+        stage      {"stage": "tables" | "generate_sql" | "run_sql" | "self_correction"}
+        sql_delta  {"delta": "..."}                     - generated sql as the model writes it
+        sql        {"sql": "..."}                       - the sql that actually ran
+        rows       {"sql", "rows": [...], "total": n}   - sent for every chunk of rows a run_sql query produces, while
+                                                          it's still running: its first STREAM_FIRST_ROWS rows and how
+                                                          many it has read so far (a new sql means a new query)
+        done       {"prompt", "results", "sql"}         - same payload as /prompt
+        error      {"error": "..."}                     - ends the stream, also sent if any stage raises
+
+    GET takes ?prompt=... so the endpoint also works with the browser's EventSource.
+    """
+    if request.method == "OPTIONS":
+        return make_cors_response()
+
+    if request.method == "POST":
+        base_prompt = request.json["prompt"]
+    else:
+        base_prompt = request.args.get("prompt", "")
+
+    def generate():
+        try:
+            with instruments.PostgresAgentInstruments(
+                DB_URL, rand.generate_session_id(base_prompt)
+            ) as (
+                agent_instruments,
+                db,
+            ):
+                yield sse_event("stage", {"stage": "tables"})
+
+                prompt = build_sql_prompt(db, base_prompt)
+
+                if prompt is None:
+                    yield sse_event("error", {"error": "No similar tables found."})
+                    return
+
+                yield sse_event("stage", {"stage": "generate_sql"})
+
+                sql_response = ""
+                for delta in llm.prompt_stream(
+                    prompt,
+                    model="gpt-4-1106-preview",
+                    instructions=SQL_DEVELOPER_INSTRUCTIONS,
+                ):
+                    sql_response += delta
+                    yield sse_event("sql_delta", {"delta": delta})
+
+                yield sse_event("stage", {"stage": "run_sql"})
+
+                # the model runs the sql through a tool call on another thread - its events come back on a queue
+                events = queue.Queue()
+                first_rows = {}
+
+                def on_rows(sql: str, rows: list, total: int):
+                    first = first_rows.setdefault(sql, [])
+                    first.extend(rows[: max(STREAM_FIRST_ROWS - len(first), 0)])
+                    events.put(("rows", {"sql": sql, "rows": list(first), "total": total}))
+
+                agent_instruments.on_rows = on_rows
+                worker = threading.Thread(
+                    target=run_sql_stage,
+                    args=(events, db, agent_instruments, sql_response),
+                    name="prompt_stream_run_sql",
+                    daemon=True,
+                )
+                worker.start()
+                try:
+                    while True:
+                        event, data = events.get()
+                        if event is None:
+                            if data is not None:
+                                raise data
+                            break
+                        yield sse_event(event, data)
+                finally:
+                    if worker.is_alive():
+                        # the client went away - stop its queries before the session's connection is closed
+                        agent_instruments.cancel_queries()
+                        worker.join()
+
+                sql_query = open(agent_instruments.sql_query_file).read()
+                sql_query_results = open(agent_instruments.run_sql_results_file).read()
+
+                yield sse_event("sql", {"sql": sql_query})
+
+                yield sse_event(
+                    "done",
+                    {"prompt": base_prompt, "results": sql_query_results, "sql": sql_query},
+                )
+        except Exception as e:
+            # the 200 and the headers are already sent - report the failure in the stream
+            print(f"❌ Streamed prompt failed: {e}")
+            yield sse_event("error", {"error": str(e)})
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    response.headers.add("Cache-Control", "no-cache")
+    # stop proxies from buffering the stream
+    response.headers.add("X-Accel-Buffering", "no")
+    return response
+
+
 if __name__ == "__main__":
     port = 3000
     print(f"Starting server on port {port}")
@@ -0,0 +1,118 @@
+"""
+Purpose:
+    Async counterparts of llm.prompt and llm.prompt_func for the ASGI server (api/asgi.py).
+
+    - one AsyncOpenAI client per process, the sdk retries transient failures
+    - at most OPENAI_MAX_CONCURRENCY requests in flight per process (same env var as openai_client.py)
+    - tool functions are sync (psycopg2), so they run on worker threads, concurrently per model step
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, List, Optional
+
+import openai
+
+from modules import tool_calls
+from modules.models import TurboTool
+
+MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "2"))
+
+_client: Optional[openai.AsyncOpenAI] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_client() -> openai.AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = openai.AsyncOpenAI(max_retries=MAX_RETRIES)
+    return _client
+
+
+def get_semaphore() -> asyncio.Semaphore:
+    # created on first use so it belongs to the server's event loop
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def chat_completion(timeout: Optional[float] = None, **kwargs):
+    async with get_semaphore():
+        return await get_client().chat.completions.create(
+            timeout=timeout or openai.NOT_GIVEN, **kwargs
+        )
+
+
+async def prompt(
+    prompt: str,
+    model: str = "gpt-4-1106-preview",
+    instructions: str = "You are a helpful assistant.",
+    timeout: Optional[float] = None,
+) -> str:
+    """
+    Async llm.prompt
+    """
+    response = await chat_completion(
+        timeout=timeout,
+        model=model,
+        messages=[
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": prompt},
+        ],
+    )
+    return response.choices[0].message.content
+
+
+async def prompt_func(
+    prompt: str,
+    turbo_tools: List[TurboTool],
+    model: str = "gpt-4-1106-preview",
+    instructions: str = "You are a helpful assistant.",
+    timeout: Optional[float] = None,
+    run_tool: Optional[Callable[..., Awaitable]] = None,
+) -> List[str]:
+    """
+    Async llm.prompt_func - forces a call to the tool when there's only one, returns the tool outputs.
+    A tool's exception (e.g. a PostgresError from run_sql) is raised to the caller.
+
+    run_tool(func, *args) runs a tool call off the event loop - asyncio.to_thread unless the caller
+    needs to track the threads.
+    """
+    run_tool = run_tool or asyncio.to_thread
+    tool_choice = (
+        "auto"
+        if len(turbo_tools) > 1
+        else {"type": "function", "function": {"name": turbo_tools[0].name}}
+    )
+
+    response = await chat_completion(
+        timeout=timeout,
+        model=model,
+        messages=[
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": prompt},
+        ],
+        tools=[turbo_tool.config for turbo_tool in turbo_tools],
+        tool_choice=tool_choice,
+    )
+
+    response_message = response.choices[0].message
+    if not response_message.tool_calls:
+        return []
+
+    map_function_tools = {turbo_tool.name: turbo_tool for turbo_tool in turbo_tools}
+    known_tool_calls = [
+        tool_call
+        for tool_call in response_message.tool_calls
+        if tool_call.function.name in map_function_tools
+    ]
+
+    results = await asyncio.gather(
+        *[
+            run_tool(tool_calls.run_tool_call, tool_call, map_function_tools)
+            for tool_call in known_tool_calls
+        ]
+    )
+    return [result.output for result in results]
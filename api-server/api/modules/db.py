@@ -1,7 +1,37 @@
+from contextlib import contextmanager
 from datetime import datetime
 import json
+import os
+import re
+import threading
+from typing import Iterator
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from psycopg2.sql import SQL, Identifier
+from modules import pg_json
+
+# rows per fetch when reading a query - the first fetch is small so the first rows arrive quickly
+SQL_FIRST_CHUNK_ROWS = int(os.environ.get("SQL_FIRST_CHUNK_ROWS", "20"))
+SQL_CHUNK_ROWS = int(os.environ.get("SQL_CHUNK_ROWS", "5000"))
+
+# statements iter_sql_chunks can read through a server side cursor - DECLARE ... CURSOR FOR takes a single query
+# (a data-modifying WITH or SELECT INTO is rejected too)
+QUERY_START = re.compile(r"(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/|\()*(select|with|values|table)\b", re.I | re.S)
+DATA_MODIFYING = re.compile(r"\b(insert|update|delete|merge|into)\b", re.I)
+SEMICOLON = re.compile(r";\s*\S")
+
+
+def is_single_query(sql: str) -> bool:
+    """
+    Clone of postgres_da_ai_agent/modules/db.py is_single_query
+    """
+    if not QUERY_START.match(sql) or SEMICOLON.search(sql):
+        return False
+    return not DATA_MODIFYING.search(sql)
+
+
+# borrowing a pooled connection raises after waiting this long instead of hanging
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "60"))
 
 
 # comm
@@ -13,6 +43,7 @@ class PostgresManager:
     def __init__(self):
         self.conn = None
         self.cur = None
+        self._cursor_count = 0
 
     def __enter__(self):
         return self
@@ -27,6 +58,13 @@ class PostgresManager:
         self.conn = psycopg2.connect(url)
         self.cur = self.conn.cursor()
 
+    def use_connection(self, conn):
+        """
+        Use an existing connection (e.g. borrowed from a PostgresConnectionPool)
+        """
+        self.conn = conn
+        self.cur = self.conn.cursor()
+
     def close(self):
         if self.cur:
             self.cur.close()
@@ -37,16 +75,40 @@ class PostgresManager:
         """
         Run a SQL query against the postgres database
         """
-        self.cur.execute(sql)
-        columns = [desc[0] for desc in self.cur.description]
-        res = self.cur.fetchall()
-
-        list_of_dicts = [dict(zip(columns, row)) for row in res]
+        list_of_dicts = [row for chunk in self.iter_sql_chunks(sql) for row in chunk]
 
-        json_result = json.dumps(list_of_dicts, indent=4, default=self.datetime_handler)
+        json_result = pg_json.dumps(list_of_dicts, indent=4)
 
         return json_result
 
+    def iter_sql_chunks(
+        self,
+        sql,
+        chunk_rows: int = SQL_CHUNK_ROWS,
+        first_chunk_rows: int = SQL_FIRST_CHUNK_ROWS,
+    ) -> Iterator[list]:
+        """
+        A query's rows as lists of dicts of json friendly values, as postgres produces them - single
+        queries are read through a server side cursor (see is_single_query), anything else on a regular one.
+        """
+        if is_single_query(sql):
+            self._cursor_count += 1
+            cur = self.conn.cursor(name=f"run_sql_{self._cursor_count}")
+        else:
+            cur = self.conn.cursor()
+        try:
+            cur.execute(sql)
+            if cur.description is None:
+                return
+            rows = cur.fetchmany(first_chunk_rows)
+            while rows:
+                # converters are picked once per column from the type OIDs (see modules/pg_json.py)
+                yield pg_json.rows_to_dicts(cur.description, rows)
+                rows = cur.fetchmany(chunk_rows)
+        finally:
+            if not cur.closed:
+                cur.close()
+
     def datetime_handler(self, obj):
         """
         Handle datetime objects when serializing to JSON.
@@ -165,3 +227,50 @@ class PostgresManager:
 
     def roll_back(self):
         self.conn.rollback()
+
+
+class PostgresConnectionPool:
+    """
+    Clone of postgres_da_ai_agent/modules/db.py PostgresConnectionPool
+
+    A thread safe pool of postgres connections. Borrowing waits up to DB_POOL_TIMEOUT while all connections are in use.
+    """
+
+    def __init__(self, url, minconn=1, maxconn=10):
+        self.pool = ThreadedConnectionPool(minconn, maxconn, url)
+        self.maxconn = maxconn
+        self.available = threading.BoundedSemaphore(maxconn)
+
+    @contextmanager
+    def connection(self, timeout: float = DB_POOL_TIMEOUT):
+        if not self.available.acquire(timeout=timeout):
+            raise TimeoutError(
+                f"No pooled database connection free after {timeout}s - all {self.maxconn} are in use"
+            )
+        try:
+            conn = self.pool.getconn()
+            db = PostgresManager()
+            try:
+                db.use_connection(conn)
+                yield db
+            finally:
+                self._return(db, conn)
+        finally:
+            # a failed connect or a dropped connection must not cost the pool a slot
+            self.available.release()
+
+    def _return(self, db, conn):
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                if db.cur:
+                    db.cur.close()
+                # end any open transaction so the next borrower starts clean
+                conn.rollback()
+            except psycopg2.Error as e:
+                print(f"Discarding broken pooled connection: {e}")
+                broken = True
+        self.pool.putconn(conn, close=broken)
+
+    def close(self):
+        self.pool.closeall()
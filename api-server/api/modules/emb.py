@@ -1,4 +1,25 @@
 from modules.db import PostgresManager
+import os
+import threading
+import time
+
+# table definitions are read from the database at most this often per process
+SCHEMA_CACHE_SECONDS = float(os.environ.get("SCHEMA_CACHE_SECONDS", "300"))
+
+_schema_cache = {"loaded_at": 0.0, "definitions": {}}
+_schema_cache_lock = threading.Lock()
+
+
+def get_table_definition_map(db: PostgresManager, refresh: bool = False) -> dict:
+    """
+    Process wide cache of table name -> definition. Warm instances skip the per-table catalog queries.
+    """
+    with _schema_cache_lock:
+        expired = time.monotonic() - _schema_cache["loaded_at"] > SCHEMA_CACHE_SECONDS
+        if refresh or expired or not _schema_cache["definitions"]:
+            _schema_cache["definitions"] = db.get_table_definition_map_for_embeddings()
+            _schema_cache["loaded_at"] = time.monotonic()
+        return _schema_cache["definitions"]
 
 
 class DatabaseEmbedder:
@@ -13,7 +34,7 @@ class DatabaseEmbedder:
         self.db = db
 
     def get_similar_table_defs_for_prompt(self, prompt: str, n_similar=5, n_foreign=0):
-        map_table_name_to_table_def = self.db.get_table_definition_map_for_embeddings()
+        map_table_name_to_table_def = get_table_definition_map(self.db)
         for name, table_def in map_table_name_to_table_def.items():
             self.add_table(name, table_def)
 
@@ -1,7 +1,13 @@
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Optional
 import json
-from modules.db import PostgresManager
+from modules.db import PostgresConnectionPool, PostgresManager
 from modules import file
+from modules import pg_json
+from modules import sessions
+from modules.tool_calls import MAX_TOOL_WORKERS
 import os
+import threading
 
 BASE_DIR = os.environ.get("BASE_DIR", "./agent_results")
 
@@ -28,10 +34,10 @@ class AgentInstruments:
         raise NotImplementedError
 
     def make_agent_chat_file(self, team_name: str):
-        return os.path.join(self.root_dir, f"agent_chats_{team_name}.json")
+        return os.path.join(sessions.ensure_dir(self.root_dir), f"agent_chats_{team_name}.jsonl")
 
     def make_agent_cost_file(self, team_name: str):
-        return os.path.join(self.root_dir, f"agent_cost_{team_name}.json")
+        return os.path.join(sessions.ensure_dir(self.root_dir), f"agent_cost_{team_name}.json")
 
     @property
     def root_dir(self):
@@ -55,29 +61,90 @@ class PostgresAgentInstruments(AgentInstruments):
         - The state lifecycle lives between all agent orchestrations
     """
 
-    def __init__(self, db_url: str, session_id: str) -> None:
+    def __init__(self, db_url: str, session_id: str, db_pool: Optional[PostgresConnectionPool] = None) -> None:
         super().__init__()
 
         self.db_url = db_url
         self.db = None
+        self.db_pool = db_pool
         self.session_id = session_id
         self.messages = []
         self.innovation_index = 0
+        self._exit_stack = ExitStack()
+        # tool functions can run concurrently (see modules/tool_calls.py)
+        self.files_lock = threading.Lock()
+        self.tool_db_pool = db_pool
+        self.tool_db_pool_lock = threading.Lock()
+        # connections tool calls are using right now - see cancel_queries
+        self.active_tool_dbs = set()
+        self.cancelled = threading.Event()
+        # on_rows(sql, rows, total) is called with each chunk of rows run_sql reads - see index.prompt_stream
+        self.on_rows: Optional[Callable[[str, list, int], None]] = None
 
     def __enter__(self):
         """
         Support entering the 'with' statement
         """
+        sessions.mark_active(self.session_id, BASE_DIR)
+        self._exit_stack.callback(sessions.mark_inactive, self.session_id)
+        sessions.schedule_gc(BASE_DIR)
         self.reset_files()
-        self.db = PostgresManager()
-        self.db.connect_with_url(self.db_url)
+        if self.db_pool:
+            # borrow a connection - it goes back to the pool on exit
+            self.db = self._exit_stack.enter_context(self.db_pool.connection())
+        else:
+            self.db = PostgresManager()
+            self.db.connect_with_url(self.db_url)
+            self._exit_stack.callback(self.db.close)
         return self, self.db
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
         Support exiting the 'with' statement
         """
-        self.db.close()
+        self._exit_stack.close()
+
+    @contextmanager
+    def tool_connection(self):
+        """
+        Borrow a connection for a single tool call so parallel run_sql calls don't share a cursor.
+        Without a shared pool a small one is opened on first use and closed on exit.
+        """
+        if self.cancelled.is_set():
+            raise RuntimeError(f"Session {self.session_id} was cancelled")
+
+        with self.tool_db_pool_lock:
+            if self.tool_db_pool is None:
+                self.tool_db_pool = PostgresConnectionPool(
+                    self.db_url, maxconn=MAX_TOOL_WORKERS
+                )
+                self._exit_stack.callback(self.tool_db_pool.close)
+
+        with self.tool_db_pool.connection() as db:
+            with self.tool_db_pool_lock:
+                self.active_tool_dbs.add(db)
+            try:
+                yield db
+            finally:
+                with self.tool_db_pool_lock:
+                    self.active_tool_dbs.discard(db)
+
+    def cancel_queries(self):
+        """
+        Cancel the queries running on this session's connections - safe to call from any thread.
+        Tool calls that start afterwards fail right away.
+        """
+        self.cancelled.set()
+        with self.tool_db_pool_lock:
+            dbs = list(self.active_tool_dbs)
+        if self.db:
+            dbs.append(self.db)
+
+        for db in dbs:
+            try:
+                db.conn.cancel()
+            except Exception as e:
+                print(f"Could not cancel query for session {self.session_id}: {e}")
 
     def sync_messages(self, messages: list):
         """
@@ -87,12 +154,11 @@ class PostgresAgentInstruments(AgentInstruments):
 
     def reset_files(self):
         """
-        Clear everything in the root_dir
+        Clear everything in the root_dir.
+        The directory itself is created lazily by get_file_path - sessions that never write a file never touch the disk.
         """
-
-        # if it does not exist create it
         if not os.path.exists(self.root_dir):
-            os.makedirs(self.root_dir)
+            return
 
         for fname in os.listdir(self.root_dir):
             os.remove(os.path.join(self.root_dir, fname))
@@ -101,7 +167,7 @@ class PostgresAgentInstruments(AgentInstruments):
         """
         Get the full path to a file in the root_dir
         """
-        return os.path.join(self.root_dir, fname)
+        return os.path.join(sessions.ensure_dir(self.root_dir), fname)
 
     # -------------------------- Agent Properties -------------------------- #
 
@@ -124,16 +190,24 @@ class PostgresAgentInstruments(AgentInstruments):
         Run a SQL query against the postgres database
         """
 
-        with open(self.sql_query_file, "w") as f:
-            f.write(sql)
+        with self.files_lock:
+            with open(self.sql_query_file, "w") as f:
+                f.write(sql)
 
-        results_as_json = self.db.run_sql(sql)
+        with self.tool_connection() as db:
+            rows = []
+            for chunk in db.iter_sql_chunks(sql):
+                rows.extend(chunk)
+                if self.on_rows:
+                    self.on_rows(sql, chunk, len(rows))
+            results_as_json = pg_json.dumps(rows, indent=4)
 
         fname = self.run_sql_results_file
 
         # dump these results to a file
-        with open(fname, "w") as f:
-            f.write(results_as_json)
+        with self.files_lock:
+            with open(fname, "w") as f:
+                f.write(results_as_json)
 
         return "Successfully delivered results to json file"
 
@@ -160,9 +234,10 @@ class PostgresAgentInstruments(AgentInstruments):
         return file.write_json_file(fname, json_str)
 
     def write_innovation_file(self, content: str):
-        fname = self.get_file_path(f"{self.innovation_index}_innovation_file.json")
-        file.write_file(fname, content)
-        self.innovation_index += 1
+        with self.files_lock:
+            fname = self.get_file_path(f"{self.innovation_index}_innovation_file.json")
+            file.write_file(fname, content)
+            self.innovation_index += 1
         return f"Successfully wrote innovation file. You can check my work."
 
     def validate_innovation_files(self):
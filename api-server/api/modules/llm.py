@@ -8,10 +8,12 @@ import json
 import sys
 from dotenv import load_dotenv
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 import openai
 
 from modules.models import TurboTool
+from modules import openai_client
+from modules import tool_calls
 
 # load .env file
 load_dotenv()
@@ -72,6 +74,7 @@ def prompt(
     prompt: str,
     model: str = "gpt-4-1106-preview",
     instructions: str = "You are a helpful assistant.",
+    timeout: Optional[float] = None,
 ) -> str:
     """
     Generate a response from a prompt using the OpenAI API.
@@ -86,7 +89,8 @@ Example bash command:
             """
         )
 
-    response = openai.chat.completions.create(
+    response = openai_client.get_client().chat_completion(
+        timeout=timeout,
         model=model,
         messages=[
             {
@@ -108,6 +112,7 @@ def prompt_func(
     turbo_tools: List[TurboTool],
     model: str = "gpt-4-1106-preview",
     instructions: str = "You are a helpful assistant.",
+    timeout: Optional[float] = None,
 ) -> str:
     """
     Generate a response from a prompt using the OpenAI API.
@@ -116,6 +121,7 @@ def prompt_func(
     :param prompt: The prompt to send to the model.
     :param turbo_tools: List of TurboTool objects each containing the tool's name, configuration, and function.
     :param model: The model version to use, default is 'gpt-4-1106-preview'.
+    :param timeout: Deadline in seconds for the call including rate limit waits and retries.
     :return: The response generated by the model.
     """
 
@@ -131,35 +137,39 @@ def prompt_func(
     messages.insert(
         0, {"role": "system", "content": instructions}
     )  # Insert instructions as the first system message
-    response = openai.chat.completions.create(
-        model=model, messages=messages, tools=tools, tool_choice=tool_choice
+    response = openai_client.get_client().chat_completion(
+        model=model,
+        messages=messages,
+        tools=tools,
+        tool_choice=tool_choice,
+        timeout=timeout,
     )
 
     response_message = response.choices[0].message
-    tool_calls = response_message.tool_calls
 
     func_responses = []
 
-    if tool_calls:
+    if response_message.tool_calls:
         messages.append(response_message)
 
-        for tool_call in tool_calls:
-            for turbo_tool in turbo_tools:
-                if tool_call.function.name == turbo_tool.name:
-                    function_response = turbo_tool.function(
-                        **json.loads(tool_call.function.arguments)
-                    )
-
-                    func_responses.append(function_response)
-
-                    message_to_append = {
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": turbo_tool.name,
-                        "content": function_response,
-                    }
-                    messages.append(message_to_append)
-                    break
+        map_function_tools = {turbo_tool.name: turbo_tool for turbo_tool in turbo_tools}
+        known_tool_calls = [
+            tool_call
+            for tool_call in response_message.tool_calls
+            if tool_call.function.name in map_function_tools
+        ]
+
+        # independent tool calls run concurrently, responses keep the model's order
+        for result in tool_calls.execute_tool_calls(known_tool_calls, map_function_tools):
+            func_responses.append(result.output)
+
+            message_to_append = {
+                "tool_call_id": result.tool_call_id,
+                "role": "tool",
+                "name": result.name,
+                "content": result.output,
+            }
+            messages.append(message_to_append)
 
     return func_responses
 
@@ -168,6 +178,7 @@ def prompt_json_response(
     prompt: str,
     model: str = "gpt-4-1106-preview",
     instructions: str = "You are a helpful assistant.",
+    timeout: Optional[float] = None,
 ) -> str:
     """
     Generate a response from a prompt using the OpenAI API.
@@ -189,7 +200,8 @@ Example bash command:
             """
         )
 
-    response = openai.chat.completions.create(
+    response = openai_client.get_client().chat_completion(
+        timeout=timeout,
         model=model,
         messages=[
             {
@@ -207,6 +219,71 @@ Example bash command:
     return response_parser(response.model_dump())
 
 
+# ------------------ streaming content generators ------------------
+
+
+def stream_parser(chunks) -> Iterator[str]:
+    """
+    Yield the content delta of each streamed chat completion chunk, skipping empty ones.
+    """
+    for chunk in chunks:
+        delta = safe_get(chunk.model_dump(), "choices.0.delta.content")
+        if delta:
+            yield delta
+
+
+def prompt_stream(
+    prompt: str,
+    model: str = "gpt-4-1106-preview",
+    instructions: str = "You are a helpful assistant.",
+    timeout: Optional[float] = None,
+) -> Iterator[str]:
+    """
+    Streaming version of prompt(). Yields content deltas as the model generates them.
+
+    Example:
+        sql = ""
+        for delta in llm.prompt_stream("Generate a SQL query ..."):
+            sql += delta
+    """
+
+    chunks = openai_client.get_client().chat_completion(
+        model=model,
+        messages=[
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": prompt},
+        ],
+        stream=True,
+        timeout=timeout,
+    )
+
+    yield from stream_parser(chunks)
+
+
+def prompt_json_response_stream(
+    prompt: str,
+    model: str = "gpt-4-1106-preview",
+    instructions: str = "You are a helpful assistant.",
+    timeout: Optional[float] = None,
+) -> Iterator[str]:
+    """
+    Streaming version of prompt_json_response(). The deltas only form valid JSON once joined.
+    """
+
+    chunks = openai_client.get_client().chat_completion(
+        model=model,
+        messages=[
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": prompt},
+        ],
+        response_format={"type": "json_object"},
+        stream=True,
+        timeout=timeout,
+    )
+
+    yield from stream_parser(chunks)
+
+
 def add_cap_ref(
     prompt: str, prompt_suffix: str, cap_ref: str, cap_ref_content: str
 ) -> str:
@@ -244,14 +321,18 @@ def estimate_price_and_tokens(text, model="gpt-4"):
     """
     Conservative estimate the price and tokens for a given text.
     """
-    # round up to the output tokens
-    COST_PER_1k_TOKENS = map_model_to_cost_per_1k_tokens[model]
-
     tokens = count_tokens(text)
 
+    return estimate_price(tokens, model), tokens
+
+
+def estimate_price(tokens, model="gpt-4"):
+    """
+    Conservative estimate of the price of a token count - lets callers keep running token totals.
+    """
+    COST_PER_1k_TOKENS = map_model_to_cost_per_1k_tokens[model]
+
     estimated_cost = (tokens / 1000) * COST_PER_1k_TOKENS
 
     # round
-    estimated_cost = round(estimated_cost, 2)
-
-    return estimated_cost, tokens
+    return round(estimated_cost, 2)
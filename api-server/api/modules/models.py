@@ -16,3 +16,20 @@ class Chat:
     to_name: str
     message: str
     created: int = field(default_factory=time.time)
+
+
+@dataclass
+class RunStats:
+    run_id: str
+    status: str
+    polls: int
+    waited_seconds: float
+    streamed: bool = False
+
+
+@dataclass
+class ToolCallResult:
+    tool_call_id: str
+    name: str
+    output: str
+    seconds: float
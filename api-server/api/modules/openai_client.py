@@ -0,0 +1,325 @@
+"""
+Clone of postgres_da_ai_agent/modules/openai_client.py
+
+Purpose:
+    Shared, rate limit aware access to the OpenAI API.
+    Every OpenAI call (chat completions and the Assistants API) goes through RateLimitedClient.call so that
+    bursts are held at the account's limits instead of failing on the first 429.
+
+    - token bucket per model for requests per minute and tokens per minute
+    - jittered exponential backoff that honors retry-after headers
+    - a deadline per call that covers queueing, retries and the request itself
+    - a limit on the number of requests in flight at once - a streamed response holds its slot until it's read
+    - tokens are reserved from an estimate (prompt + max_tokens) and reconciled with the response's usage
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import openai
+
+# (requests per minute, tokens per minute) - adjust to your account's tier
+map_model_to_rate_limits = {
+    "gpt-4": (500, 10_000),
+    "gpt-4-1106-preview": (500, 150_000),
+    "gpt-4-1106-vision-preview": (80, 10_000),
+    "gpt-3.5-turbo-1106": (3_500, 160_000),
+}
+
+DEFAULT_RATE_LIMITS = (500, 40_000)
+
+MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "6"))
+DEFAULT_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "120"))
+# completion tokens reserved for calls that don't set max_tokens - corrected once the usage comes back
+COMPLETION_TOKENS_ESTIMATE = int(os.environ.get("OPENAI_COMPLETION_TOKENS_ESTIMATE", "1000"))
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,  # includes openai.APITimeoutError
+    openai.InternalServerError,
+)
+
+# 5xx the server sends instead of processing the request (overloaded)
+UNPROCESSED_STATUS_CODES = (503,)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket. Holds up to `capacity` tokens and refills continuously over a minute.
+    """
+
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = float(capacity_per_minute)
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.refill_per_second
+        )
+        self.updated = now
+
+    def acquire(self, amount: float, deadline: float) -> bool:
+        """
+        Block until `amount` tokens are available. Returns False if the deadline passes first.
+        Requests larger than the bucket are capped so they can still run once the bucket is full.
+        """
+        amount = min(float(amount), self.capacity)
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+
+                wait = max(
+                    self.paused_until - now,
+                    (amount - self.tokens) / self.refill_per_second,
+                )
+                if now + wait > deadline:
+                    return False
+                self.condition.wait(timeout=wait)
+
+    def adjust(self, amount: float):
+        """
+        Take `amount` more tokens (or give them back when negative) once the real usage is known.
+        The bucket can go below zero - later callers wait for the overdraft to refill.
+        """
+        with self.condition:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - amount)
+            if amount < 0:
+                self.condition.notify_all()
+
+    def pause(self, seconds: float):
+        """
+        The server told us to back off - stop handing out tokens for `seconds`.
+        """
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.condition.notify_all()
+
+
+class SlotStream:
+    """
+    A streamed response - it holds its concurrency slot until it's read to the end, closed or dropped.
+    """
+
+    def __init__(self, stream: Any, release: Callable[[], None]):
+        self.stream = stream
+        self._release = release
+        self._released = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        try:
+            yield from self.stream
+        finally:
+            self.close()
+
+    def close(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        try:
+            close = getattr(self.stream, "close", None)
+            if close:
+                close()
+        finally:
+            self._release()
+
+    def __del__(self):
+        self.close()
+
+
+class RateLimitedClient:
+    """
+    Wraps openai.OpenAI. Use call() with a function that receives the underlying client:
+
+        client = openai_client.get_client()
+        client.call(lambda c: c.beta.threads.create(), model="gpt-4-1106-preview")
+        client.call(lambda c: c.beta.threads.runs.retrieve(...), idempotent=True)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_retries: int = MAX_RETRIES,
+        default_timeout: float = DEFAULT_TIMEOUT,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        # retries are handled here, not by the sdk
+        self.client = openai.OpenAI(max_retries=0)
+        self.max_retries = max_retries
+        self.default_timeout = default_timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.concurrency = threading.BoundedSemaphore(max_concurrency)
+        self.map_model_to_buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self.buckets_lock = threading.Lock()
+
+    def buckets_for(self, model: Optional[str]) -> Tuple[TokenBucket, TokenBucket]:
+        model = model or "default"
+        with self.buckets_lock:
+            if model not in self.map_model_to_buckets:
+                rpm, tpm = map_model_to_rate_limits.get(model, DEFAULT_RATE_LIMITS)
+                self.map_model_to_buckets[model] = (TokenBucket(rpm), TokenBucket(tpm))
+            return self.map_model_to_buckets[model]
+
+    def call(
+        self,
+        func: Callable[[openai.OpenAI], Any],
+        model: Optional[str] = None,
+        estimated_tokens: int = 0,
+        timeout: Optional[float] = None,
+        idempotent: bool = False,
+    ) -> Any:
+        """
+        Run func(client) within the model's rate limits, retrying transient failures until the deadline.
+
+        A timeout or dropped connection can come after the server acted on the request, so those are only
+        retried for idempotent calls (reads, updates, chat completions) - retrying e.g. threads.messages.create
+        could add the message twice. Every call retries rate limits and 503s, which were never processed.
+        """
+        deadline = time.monotonic() + (timeout or self.default_timeout)
+        request_bucket, token_bucket = self.buckets_for(model)
+
+        reserved = min(float(estimated_tokens), token_bucket.capacity)
+
+        attempt = 0
+        while True:
+            if not request_bucket.acquire(1, deadline) or not token_bucket.acquire(
+                estimated_tokens, deadline
+            ):
+                raise DeadlineExceeded(f"Rate limit queue exceeded deadline for {model}")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.concurrency.acquire(timeout=remaining):
+                raise DeadlineExceeded(f"Concurrency limit exceeded deadline for {model}")
+
+            holds_slot = False
+            try:
+                remaining = deadline - time.monotonic()
+                response = func(self.client.with_options(timeout=max(remaining, 1.0)))
+                if isinstance(response, openai.Stream):
+                    # the response is only read as the caller iterates it - keep the slot until then
+                    holds_slot = True
+                    return SlotStream(response, self.concurrency.release)
+
+                usage = getattr(response, "usage", None)
+                if usage is not None and getattr(usage, "total_tokens", None):
+                    token_bucket.adjust(usage.total_tokens - reserved)
+                return response
+            except RETRYABLE_ERRORS as e:
+                if not idempotent and not never_processed(e):
+                    raise
+                delay = self.retry_delay(e, attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay > deadline:
+                    raise
+
+                if isinstance(e, openai.RateLimitError):
+                    # everyone sharing this model waits, not just this call
+                    request_bucket.pause(delay)
+                    token_bucket.pause(delay)
+
+                print(
+                    f"openai_client: {type(e).__name__} on attempt {attempt + 1}, retrying in {delay:.2f}s"
+                )
+            finally:
+                if not holds_slot:
+                    self.concurrency.release()
+
+            time.sleep(delay)
+            attempt += 1
+
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        """
+        Honor retry-after(-ms) when the server sends it, otherwise full jitter exponential backoff.
+        """
+        retry_after = parse_retry_after(error)
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+
+    def chat_completion(self, timeout: Optional[float] = None, **kwargs):
+        """
+        Rate limited openai.chat.completions.create
+        """
+        model = kwargs.get("model")
+        estimated_tokens = estimate_tokens(kwargs.get("messages", [])) + (
+            kwargs.get("max_tokens") or COMPLETION_TOKENS_ESTIMATE
+        )
+        return self.call(
+            lambda client: client.chat.completions.create(**kwargs),
+            model=model,
+            estimated_tokens=estimated_tokens,
+            timeout=timeout,
+            idempotent=True,
+        )
+
+
+def never_processed(error: Exception) -> bool:
+    return isinstance(error, openai.RateLimitError) or (
+        isinstance(error, openai.InternalServerError)
+        and error.status_code in UNPROCESSED_STATUS_CODES
+    )
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        # retry-after can also be an http date - fall back to backoff
+        return None
+    return None
+
+
+def estimate_tokens(messages: List[Any]) -> int:
+    """
+    Rough estimate of prompt tokens for rate limiting (~4 chars per token on average, so it can
+    undershoot) - call() reconciles the bucket with the response's usage.
+    """
+    chars = 0
+    for message in messages:
+        content = (
+            message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        )
+        chars += len(str(content or ""))
+    return chars // 4 + 1
+
+
+_client: Optional[RateLimitedClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> RateLimitedClient:
+    """
+    Process wide client so every caller shares the same limits.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = RateLimitedClient()
+        return _client
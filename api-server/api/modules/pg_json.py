@@ -0,0 +1,191 @@
+"""
+Clone of postgres_da_ai_agent/modules/pg_json.py
+
+Purpose:
+    Turn Postgres result rows into JSON friendly values, fast.
+
+    The converter for each column is picked once from the cursor's type OIDs (cursor.description[i].type_code),
+    not per value through json.dumps's default hook:
+
+    - numeric -> int/float (stays a number instead of becoming a string), or a string when a float would round it
+    - date, time, timestamp(tz) -> isoformat()
+    - interval -> seconds as a float
+    - uuid -> str, bytea -> "\\x..." hex like psql prints it
+    - json/jsonb are already parsed by psycopg2 and pass through
+    - arrays of the above convert element-wise
+
+    dumps() uses orjson when it's installed (set PG_JSON_BACKEND=json to force the standard library).
+"""
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import json
+import os
+from typing import Any, Callable, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+USE_ORJSON = orjson is not None and os.environ.get("PG_JSON_BACKEND", "") != "json"
+
+JSON_NATIVE_TYPES = (str, int, float, bool, type(None), list, dict)
+
+Converter = Optional[Callable[[Any], Any]]
+
+# -------------------------- Converters -------------------------- #
+
+
+def to_number(value):
+    if not isinstance(value, Decimal):
+        return value
+    if not value.is_finite():
+        # NaN / Infinity aren't valid JSON
+        return str(value)
+    if value == value.to_integral_value():
+        return int(value)
+    as_float = float(value)
+    if Decimal(repr(as_float)) != value:
+        # more digits than a float holds (e.g. numeric(30,10)) - keep them all
+        return str(value)
+    return as_float
+
+
+def to_isoformat(value):
+    return value.isoformat() if isinstance(value, (date, time)) else value
+
+
+def to_seconds(value):
+    return value.total_seconds() if isinstance(value, timedelta) else value
+
+
+def to_str(value):
+    return str(value)
+
+
+def to_hex(value):
+    return "\\x" + bytes(value).hex()
+
+
+def fallback(value):
+    """
+    Unknown types - the old behaviour, decided per value
+    """
+    if isinstance(value, JSON_NATIVE_TYPES):
+        return value
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return to_number(value)
+    if isinstance(value, (memoryview, bytes)):
+        return to_hex(value)
+    return str(value)
+
+
+def array_of(convert: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    def convert_array(value):
+        if not isinstance(value, list):
+            return convert(value)
+        # nested lists are multi-dimensional arrays
+        return [None if v is None else convert_array(v) for v in value]
+
+    return convert_array
+
+
+# Postgres type OIDs (select oid, typname from pg_type) -> converter. None means the value is already JSON friendly.
+OID_CONVERTERS = {
+    16: None,  # bool
+    20: None,  # int8
+    21: None,  # int2
+    23: None,  # int4
+    25: None,  # text
+    700: None,  # float4
+    701: None,  # float8
+    1042: None,  # bpchar
+    1043: None,  # varchar
+    19: None,  # name
+    790: None,  # money - psycopg2 returns it as a string
+    114: None,  # json
+    3802: None,  # jsonb
+    1700: to_number,  # numeric
+    1082: to_isoformat,  # date
+    1083: to_isoformat,  # time
+    1266: to_isoformat,  # timetz
+    1114: to_isoformat,  # timestamp
+    1184: to_isoformat,  # timestamptz
+    1186: to_seconds,  # interval
+    2950: to_str,  # uuid
+    17: to_hex,  # bytea
+    # arrays
+    1000: None,  # bool[]
+    1005: None,  # int2[]
+    1007: None,  # int4[]
+    1016: None,  # int8[]
+    1009: None,  # text[]
+    1015: None,  # varchar[]
+    1021: None,  # float4[]
+    1022: None,  # float8[]
+    199: None,  # json[]
+    3807: None,  # jsonb[]
+    1231: array_of(to_number),  # numeric[]
+    1182: array_of(to_isoformat),  # date[]
+    1183: array_of(to_isoformat),  # time[]
+    1115: array_of(to_isoformat),  # timestamp[]
+    1185: array_of(to_isoformat),  # timestamptz[]
+    1187: array_of(to_seconds),  # interval[]
+    2951: array_of(to_str),  # uuid[]
+    1001: array_of(to_hex),  # bytea[]
+}
+
+
+def column_converter(type_code) -> Converter:
+    return OID_CONVERTERS.get(type_code, fallback)
+
+
+# -------------------------- Rows -------------------------- #
+
+
+def rows_to_dicts(description: Sequence, rows: List[tuple]) -> List[dict]:
+    """
+    Rows from cursor.fetchall() -> list of dicts of JSON friendly values
+    """
+    columns = [desc[0] for desc in description]
+    converters = [column_converter(desc[1]) for desc in description]
+
+    if not any(converters):
+        return [dict(zip(columns, row)) for row in rows]
+
+    convert_at = [
+        (i, convert) for i, convert in enumerate(converters) if convert is not None
+    ]
+
+    result = []
+    for row in rows:
+        values = list(row)
+        for i, convert in convert_at:
+            value = values[i]
+            if value is not None:
+                values[i] = convert(value)
+        result.append(dict(zip(columns, values)))
+    return result
+
+
+# -------------------------- Serialization -------------------------- #
+
+
+def dumps(value, indent: Optional[int] = None) -> str:
+    """
+    json.dumps for rows from rows_to_dicts - anything unexpected still goes through fallback().
+    orjson only indents by 2, so any indent means 2 spaces with it.
+    """
+    if USE_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(value, default=fallback, option=option).decode("utf-8")
+        except TypeError:
+            # e.g. ints beyond 64 bits
+            pass
+    return json.dumps(value, indent=indent, default=fallback)
@@ -0,0 +1,35 @@
+"""
+Clone of postgres_da_ai_agent/modules/rand.py
+"""
+
+from datetime import datetime
+import re
+import uuid
+
+
+def generate_session_id(raw_prompt: str):
+    """
+    "get jobs with 'Completed' or 'Started' status"
+
+    ->
+
+    "get_jobs_with_completed_or_start__12_22_22__3f9c2a1b"
+
+    The random suffix keeps ids unique when the same prompt runs concurrently (or twice in one second).
+    """
+
+    now = datetime.now()
+    hours = now.hour
+    minutes = now.minute
+    seconds = now.second
+
+    short_time_mm_ss = f"{hours:02}_{minutes:02}_{seconds:02}"
+
+    lower_case = raw_prompt.lower()
+    no_spaces = lower_case.replace(" ", "_")
+    no_quotes = no_spaces.replace("'", "")
+    # the id is a directory name - drop path separators and anything else odd
+    safe = re.sub(r"[^a-z0-9_\-]", "", no_quotes)
+    shorter = safe[:30]
+    with_uuid = shorter + "__" + short_time_mm_ss + "__" + uuid.uuid4().hex[:8]
+    return with_uuid
@@ -0,0 +1,66 @@
+"""
+Clone of postgres_da_ai_agent/modules/tool_calls.py
+
+Purpose:
+    Run the tool calls from one model step concurrently.
+
+    Works with chat completion tool calls (llm.prompt_func) and Assistants API
+    requires_action tool calls (Turbo4.run_thread) - both have .id, .function.name and .function.arguments.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import time
+from typing import Dict, List
+
+from modules.models import ToolCallResult, TurboTool
+
+MAX_TOOL_WORKERS = int(os.environ.get("MAX_TOOL_WORKERS", "4"))
+
+
+def parse_arguments(arguments) -> dict:
+    # Check if arguments is already a dictionary, otherwise assume a JSON string
+    if isinstance(arguments, dict):
+        return arguments
+    return json.loads(arguments)
+
+
+def run_tool_call(tool_call, map_function_tools: Dict[str, TurboTool]) -> ToolCallResult:
+    tool_name = tool_call.function.name
+    tool_arguments = parse_arguments(tool_call.function.arguments)
+
+    print(f"Calling {tool_name}({tool_arguments})")
+
+    start = time.monotonic()
+    output = map_function_tools[tool_name].function(**tool_arguments)
+    seconds = time.monotonic() - start
+
+    print(f"{tool_name} finished in {seconds:.2f}s")
+
+    return ToolCallResult(
+        tool_call_id=tool_call.id, name=tool_name, output=output, seconds=seconds
+    )
+
+
+def execute_tool_calls(
+    tool_calls,
+    map_function_tools: Dict[str, TurboTool],
+    max_workers: int = MAX_TOOL_WORKERS,
+) -> List[ToolCallResult]:
+    """
+    Run every tool call of a step on a bounded thread pool. Results keep the order of tool_calls.
+    The first failing tool call's exception is raised once all calls have finished.
+    """
+    tool_calls = list(tool_calls)
+    if len(tool_calls) <= 1 or max_workers <= 1:
+        return [run_tool_call(tool_call, map_function_tools) for tool_call in tool_calls]
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(tool_calls)), thread_name_prefix="tool_call"
+    ) as pool:
+        futures = [
+            pool.submit(run_tool_call, tool_call, map_function_tools)
+            for tool_call in tool_calls
+        ]
+    return [future.result() for future in futures]
@@ -0,0 +1,83 @@
+"""
+Load test /prompt - compare the Flask (index.py) and ASGI (asgi.py) servers at equal worker counts.
+
+    gunicorn --chdir api -w 4 --threads 1 -b :3000 index:app
+    uvicorn asgi:app --app-dir api --workers 4 --port 8000
+
+    python scripts/load_test.py --url http://localhost:3000/prompt --url http://localhost:8000/prompt \
+        --requests 200 --concurrency 32 --prompt "How many users signed up last week?"
+
+Reports throughput, latency percentiles and status codes (429s show the ASGI server shedding load).
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import time
+
+import requests
+
+
+def send(session: requests.Session, url: str, prompt: str, timeout: float):
+    start = time.perf_counter()
+    try:
+        status = session.post(url, json={"prompt": prompt}, timeout=timeout).status_code
+    except requests.RequestException as e:
+        status = type(e).__name__
+    return status, time.perf_counter() - start
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def run(url: str, prompt: str, total: int, concurrency: int, timeout: float) -> dict:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(
+            pool.map(lambda _: send(session, url, prompt, timeout), range(total))
+        )
+    elapsed = time.perf_counter() - start
+
+    ok_latencies = [seconds for status, seconds in results if status == 200]
+    return {
+        "url": url,
+        "seconds": elapsed,
+        "throughput": len(ok_latencies) / elapsed,
+        "p50": percentile(ok_latencies, 50),
+        "p95": percentile(ok_latencies, 95),
+        "p99": percentile(ok_latencies, 99),
+        "statuses": Counter(status for status, _ in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", action="append", required=True, help="/prompt url (repeatable)")
+    parser.add_argument("--prompt", default="How many users signed up last week?")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    for url in args.url:
+        report = run(url, args.prompt, args.requests, args.concurrency, args.timeout)
+        statuses = ", ".join(f"{status}: {count}" for status, count in report["statuses"].most_common())
+        print(
+            f"{report['url']}\n"
+            f"  {args.requests} requests @ {args.concurrency} concurrent in {report['seconds']:.1f}s\n"
+            f"  throughput {report['throughput']:.2f} ok/s | p50 {report['p50']:.2f}s p95 {report['p95']:.2f}s p99 {report['p99']:.2f}s\n"
+            f"  statuses {statuses}"
+        )
+
+
+if __name__ == "__main__":
+    main()
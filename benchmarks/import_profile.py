@@ -0,0 +1,77 @@
+"""
+Import time profile - what a cold start pays before the first request.
+
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile --module index --path api-server/api --top 15
+
+Each module is imported in a fresh interpreter with `python -X importtime`. The report shows the total
+import time and the slowest packages by cumulative time.
+"""
+
+from typing import List, Tuple
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_MODULES = [
+    "postgres_da_ai_agent.prompt_handler",
+    "postgres_da_ai_agent.batch_main",
+]
+
+
+def profile_import(module: str, paths: List[str]) -> Tuple[float, List[Tuple[int, int, str]], str]:
+    """
+    Returns (total seconds, [(self_us, cumulative_us, name)], error output if the import failed)
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(paths + [env.get("PYTHONPATH", "")])
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+
+    entries = []
+    errors = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        entries.append((int(parts[0]), int(parts[1]), parts[2].rstrip()))
+
+    # top level imports aren't indented - their cumulative times add up to the total
+    total_us = sum(cumulative for _, cumulative, name in entries if not name.startswith("  "))
+    error = "\n".join(errors[-5:]) if completed.returncode != 0 else ""
+    return total_us / 1_000_000, entries, error
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", action="append", help="Module to import (repeatable)")
+    parser.add_argument("--path", action="append", default=[], help="Extra sys.path entry (repeatable)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest packages to list")
+    args = parser.parse_args()
+
+    for module in args.module or DEFAULT_MODULES:
+        total, entries, error = profile_import(module, [os.getcwd()] + args.path)
+        print(f"\n⏱️  import {module}: {total:.2f}s")
+        if error:
+            print(f"   ❌ import failed:\n{error}")
+
+        # top level packages only (e.g. 'torch', not 'torch.nn.modules.conv')
+        packages = [
+            (cumulative, name.strip())
+            for _, cumulative, name in entries
+            if "." not in name.strip()
+        ]
+        for cumulative, name in sorted(packages, reverse=True)[: args.top]:
+            print(f"   {cumulative / 1000:9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Microbenchmark: serializing a mixed-type Postgres result set to JSON.
+
+    python -m benchmarks.pg_json_bench --rows 50000
+
+No database needed - rows and cursor.description are synthesized with the types psycopg2 returns.
+Compares the old per-value default hook against pg_json's per-column converters, with the
+standard json module and with orjson (if installed).
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+import argparse
+import json
+import random
+import time
+import uuid
+
+from postgres_da_ai_agent.modules import pg_json
+
+# (name, type OID) - the same shape as cursor.description for what rows_to_dicts reads
+DESCRIPTION = [
+    ("id", 20),
+    ("name", 1043),
+    ("price", 1700),
+    ("quantity", 23),
+    ("created_at", 1184),
+    ("ship_date", 1082),
+    ("duration", 1186),
+    ("order_uuid", 2950),
+    ("payload", 3802),
+    ("tags", 1009),
+    ("amounts", 1231),
+    ("active", 16),
+]
+
+
+def make_rows(n: int) -> list:
+    rnd = random.Random(42)
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n):
+        rows.append(
+            (
+                i,
+                f"product {i}",
+                Decimal(rnd.randint(0, 100_000)) / 100,
+                rnd.randint(0, 50),
+                now + timedelta(seconds=rnd.randint(0, 10_000_000)),
+                date(2024, 1, 1) + timedelta(days=rnd.randint(0, 365)),
+                timedelta(minutes=rnd.randint(0, 10_000)),
+                uuid.UUID(int=rnd.getrandbits(128)),
+                {"sku": f"SKU-{i}", "weight": rnd.random()},
+                ["a", "b"],
+                [Decimal("1.50"), Decimal("2")],
+                i % 2 == 0,
+            )
+        )
+    return rows
+
+
+def datetime_handler(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+def legacy(rows: list) -> str:
+    """
+    What PostgresManager.run_sql did before pg_json
+    """
+    columns = [desc[0] for desc in DESCRIPTION]
+    list_of_dicts = [
+        {
+            column: value
+            if isinstance(value, pg_json.JSON_NATIVE_TYPES)
+            else datetime_handler(value)
+            for column, value in zip(columns, row)
+        }
+        for row in rows
+    ]
+    return json.dumps(list_of_dicts, indent=4, default=datetime_handler)
+
+
+def typed_json(rows: list) -> str:
+    return json.dumps(pg_json.rows_to_dicts(DESCRIPTION, rows), indent=4, default=pg_json.fallback)
+
+
+def typed_orjson(rows: list) -> str:
+    return pg_json.dumps(pg_json.rows_to_dicts(DESCRIPTION, rows), indent=4)
+
+
+def best_of(func, rows: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+
+    candidates = [("legacy default hook", legacy), ("typed + json", typed_json)]
+    if pg_json.orjson is not None:
+        candidates.append(("typed + orjson", typed_orjson))
+    else:
+        print("orjson not installed - skipping the orjson run")
+
+    print(f"{args.rows} rows x {len(DESCRIPTION)} columns, best of {args.repeat}")
+    baseline = None
+    for name, func in candidates:
+        seconds = best_of(func, rows, args.repeat)
+        baseline = baseline or seconds
+        print(f"  {name:<22} {seconds * 1000:8.1f} ms  {baseline / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
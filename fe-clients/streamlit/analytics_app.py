@@ -11,12 +11,32 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 import numpy as np
 from PIL import Image
 from postgres_da_ai_agent.modules import rand
+from postgres_da_ai_agent.modules.ndjson_results import NdjsonResultReader
 from postgres_da_ai_agent.agents.instruments import PostgresAgentInstruments
-from postgres_da_ai_agent.prompt_handler import PromptHandler
-from postgres_da_ai_agent.types import Innovation
+from postgres_da_ai_agent.agents import turbo4_pool
+from postgres_da_ai_agent.modules.db import PostgresConnectionPool, PostgresManager
+from postgres_da_ai_agent.modules.embeddings import DatabaseEmbedder
+from postgres_da_ai_agent.modules.tool_calls import MAX_TOOL_WORKERS
+from postgres_da_ai_agent.prompt_handler import PromptHandler, SQL_DEVELOPER_INSTRUCTIONS
+from postgres_da_ai_agent.types import ConversationResult, Innovation
 import pandas as pd 
+import requests
 
 DB_URL = os.environ.get("DATABASE_URL")
+# When set (e.g. http://localhost:3000) prompts are streamed from the api-server instead of run in process
+API_URL = os.environ.get("API_URL")
+
+# Connections shared by every browser session - one per running prompt, plus MAX_TOOL_WORKERS per running
+# prompt in a separate pool for its parallel run_sql calls
+DB_POOL_SIZE = int(os.environ.get("STREAMLIT_DB_POOL_SIZE", "10"))
+
+# Result table paging - only the current page is loaded and rendered
+PAGE_SIZES = [25, 50, 100, 500]
+# Charts in the Artifact tab are drawn from at most this many rows
+CHART_ROWS = 1000
+
+# the app serves prompt after prompt - keep Turbo4 handles warm between them
+turbo4_pool.enable_prewarm()
 
 st.title("Ask a question")
 
@@ -43,6 +63,33 @@ def track_tab_click():
     tab_name = ["Response", "SQL", "Innovation", "Artifact"][selected_tab]
     components.html(f"<script>window.trackTabClick('{tab_name}');</script>", height=0, width=0)
 
+# ---------------- Process wide resources - built once, shared by every session and rerun ----------------
+
+@st.cache_resource
+def get_db_pool():
+    return PostgresConnectionPool(DB_URL, maxconn=DB_POOL_SIZE)
+
+@st.cache_resource
+def get_tool_db_pool():
+    # run_sql borrows from its own pool - if it shared get_db_pool, DB_POOL_SIZE running prompts would hold
+    # every connection and their run_sql calls would wait on each other
+    return PostgresConnectionPool(DB_URL, maxconn=DB_POOL_SIZE * MAX_TOOL_WORKERS)
+
+@st.cache_resource
+def get_database_embedder():
+    """
+    Schema cache - the BERT model and every table definition embedding, computed once per process.
+    Holds its own connection since the embedder outlives any single prompt.
+    """
+    db = PostgresManager()
+    db.connect_with_url(DB_URL)
+    return DatabaseEmbedder(db).load_table_definitions()
+
+@st.cache_resource
+def warm_assistant_pool():
+    # Turbo4 handles (assistant looked up, thread created) ready before the first AssistantAPI prompt
+    return turbo4_pool.get_pool("Turbo4", SQL_DEVELOPER_INSTRUCTIONS)
+
 def prompt_response(raw_prompt):
     print(f"running prompt_response")
     # Logic to generate a response string and object based on the prompt
@@ -58,13 +105,68 @@ def prompt_response(raw_prompt):
 
     response = None
     run_mode = st.session_state.get('run_mode', 'CrewAI')  # Get the run_mode from the session state, default to 'CrewAI'
-    with PostgresAgentInstruments(DB_URL, session_id) as (agent_instruments, db):
-        with PromptHandler(raw_prompt, agent_instruments, db, executor=run_mode) as executor:  # Pass the run_mode to the PromptHandler
+    with PostgresAgentInstruments(DB_URL, session_id, db_pool=get_db_pool(), tool_db_pool=get_tool_db_pool()) as (agent_instruments, db):
+        with PromptHandler(raw_prompt, agent_instruments, db, executor=run_mode, database_embedder=get_database_embedder()) as executor:  # Pass the run_mode to the PromptHandler
             response = executor.execute()
             response_string = response
             response_object = np.random.randn(30, 3) if random.randint(1, 10) % 2 else None
     return response_string, response_object
 
+def read_sse_events(response):
+    """
+    Parse a Server-Sent-Events response into (event, data) tuples
+    """
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+def stream_prompt_response(raw_prompt):
+    """
+    Stream the prompt through the api-server's /prompt/stream endpoint, showing progress,
+    the sql as it's generated and the first rows while the query is still reading the rest.
+    """
+    status = st.empty()
+    sql_placeholder = st.empty()
+    rows_placeholder = st.empty()
+    sql = ""
+    rows = []
+
+    with requests.post(f"{API_URL}/prompt/stream", json={"prompt": raw_prompt}, stream=True) as response:
+        response.raise_for_status()
+        for event, data in read_sse_events(response):
+            match event:
+                case "stage":
+                    status.info(f"⏳ {data['stage'].replace('_', ' ')}...")
+                case "sql_delta":
+                    sql += data["delta"]
+                    sql_placeholder.code(sql, language="sql")
+                case "sql":
+                    sql = data["sql"]
+                    sql_placeholder.code(sql, language="sql")
+                case "rows":
+                    rows_placeholder.dataframe(pd.DataFrame(data["rows"]), use_container_width=True)
+                    status.info(f"⏳ showing {len(data['rows'])} of {data['total']} rows read so far...")
+                case "done":
+                    rows = json.loads(data["results"])
+                case "error":
+                    status.error(data["error"])
+                    return ConversationResult(success=False, messages=[], cost=0.0, tokens=0, last_message_str="", error_message=data["error"]), None
+
+    # the full response is rendered by display_assistant_response
+    status.empty()
+    sql_placeholder.empty()
+    rows_placeholder.empty()
+
+    return ConversationResult(success=True, messages=[], cost=0.0, tokens=0, last_message_str="", error_message="", sql=sql, result=rows), None
+
 def chat_response(prompt):
     full_response = ""
     assistant_response = random.choice(
@@ -81,7 +183,77 @@ def chat_response(prompt):
     the_thing = np.random.randn(30, 3) if random.randint(1, 10) % 2 else None
     return full_response, the_thing
 
-def display_assistant_response(full_response, the_thing):
+@st.cache_resource(max_entries=32)
+def cached_result_reader(result_path, mtime, size):
+    # the index is read once per version of a result file, pages are read on demand
+    return NdjsonResultReader(result_path)
+
+def get_result_reader(result_path):
+    # a session's result file is rewritten by its next prompt - key the cache on its mtime and size too
+    stat = os.stat(result_path)
+    return cached_result_reader(result_path, stat.st_mtime_ns, stat.st_size)
+
+def is_paged_from_file(full_response):
+    result = full_response.result
+    return bool(full_response.result_path) and full_response.row_count is not None and not (
+        isinstance(result, list) and len(result) >= full_response.row_count
+    )
+
+def read_result_rows(full_response, offset=0, limit=None):
+    """
+    Rows of the result - large results are paged from the session's NDJSON file instead of held in memory
+    """
+    if is_paged_from_file(full_response):
+        return get_result_reader(full_response.result_path).read_rows(offset, limit)
+
+    result = full_response.result
+    if isinstance(result, str):
+        result = json.loads(result)
+    if not isinstance(result, list):
+        return result
+    return result[offset:] if limit is None else result[offset:offset + limit]
+
+def result_row_count_and_columns(full_response):
+    if is_paged_from_file(full_response):
+        reader = get_result_reader(full_response.result_path)
+        return reader.row_count, reader.columns
+
+    rows = read_result_rows(full_response)
+    if not isinstance(rows, list):
+        return 0, []
+    columns = list(rows[0].keys()) if rows and isinstance(rows[0], dict) else []
+    return len(rows), columns
+
+def display_result_table(full_response, key):
+    """
+    One paginated dataframe - page size, page and column controls are applied before anything is loaded
+    """
+    if not is_paged_from_file(full_response):
+        result = read_result_rows(full_response)
+        if result and not isinstance(result, list):
+            # e.g. a dict from CrewAI - not rows, show it as is
+            st.json(result)
+            return
+
+    row_count, columns = result_row_count_and_columns(full_response)
+    if row_count == 0:
+        st.info("No rows returned.")
+        return
+
+    controls = st.columns([1, 1, 3])
+    page_size = controls[0].selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    page_count = max(1, -(-row_count // page_size))
+    page = controls[1].number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key=f"{key}_page")
+    selected_columns = controls[2].multiselect("Columns", columns, default=columns, key=f"{key}_columns")
+
+    start = (page - 1) * page_size
+    rows = read_result_rows(full_response, start, page_size)
+    df = pd.DataFrame(rows, columns=selected_columns or columns)
+
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    st.caption(f"Rows {start + 1}-{start + len(rows)} of {row_count}")
+
+def display_assistant_response(full_response, the_thing, key="latest"):
     # Parse the full_response if it's a string (JSON)
     if isinstance(full_response, str):
         full_response = json.loads(full_response)
@@ -89,22 +261,8 @@ def display_assistant_response(full_response, the_thing):
     # Create tabs for Response, SQL, Innovation, and Artifact
     tab1, tab2, tab3, tab4 = st.tabs(["Response", "SQL", "Innovation", "Artifact"])
     # Set the value of full_response to the Response tab
-    with tab1:             
-        # Check if full_response.result is a string and parse it as JSON                                             
-        if isinstance(full_response.result, str):                                                                    
-            result = json.loads(full_response.result)                                                           
-        else:                                                                                                        
-            result = full_response.result  
-                                                                                         
-        # Check if full_response.result is a valid data structure for st.dataframe
-        if isinstance(result, (pd.DataFrame, pd.Series, pd.Index, np.ndarray, dict, list, set)):
-            result_data = pd.DataFrame(result)  # Convert to DataFrame if not already one
-            # Display as json
-            with st.container():
-                st.json(result, expanded=True)            
-            # Display as DataFrame with new Streamlit 1.29.0 parameters
-            with st.container():
-                st.dataframe(result_data, use_container_width=True)
+    with tab1:
+        display_result_table(full_response, key)
     # Set the value of SQL to the SQL tab
     with tab2:
         st.code(full_response.sql, language="sql", line_numbers=True)
@@ -117,8 +275,8 @@ def display_assistant_response(full_response, the_thing):
             st.markdown("---")  # Divider between each innovation
     # Set the value of the_thing to the Artifact tab
     with tab4:
-        # Create a pandas dataframe from full_response.result
-        result_data = full_response.result
+        # Create a pandas dataframe from the first CHART_ROWS rows
+        result_data = read_result_rows(full_response, 0, CHART_ROWS)
         df = pd.DataFrame(result_data)
 
         # Display various charts using the dataframe if the data format is suitable
@@ -191,10 +349,10 @@ if "messages" not in st.session_state:
     st.session_state.run_mode = 'CrewAI'  # Set the default run_mode to 'CrewAI' when the page loads
 
 # Display chat messages from history on app rerun
-for message in st.session_state.messages:
+for index, message in enumerate(st.session_state.messages):
     with st.chat_message(message["role"]):
         if message["role"] == "assistant":
-            display_assistant_response(message["content"], message.get("artifact"))
+            display_assistant_response(message["content"], message.get("artifact"), key=f"message_{index}")
         else:
             st.markdown(message["content"])
 
@@ -210,15 +368,18 @@ if prompt := st.chat_input("What is up?"):
     # components.html(f"<script>window.trackUserPromptSubmission({json.dumps(prompt)});</script>", height=0, width=0)
 
     with st.chat_message("assistant"):
-        with st.spinner("Processing..."):
-            # Generate assistant response and potentially a numpy array
-            full_response, the_thing = prompt_response(prompt)
+        if API_URL:
+            full_response, the_thing = stream_prompt_response(prompt)
+        else:
+            with st.spinner("Processing..."):
+                # Generate assistant response and potentially a numpy array
+                full_response, the_thing = prompt_response(prompt)
 
-            # Add assistant response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": full_response, "artifact": the_thing})
+        # Add assistant response to chat history
+        st.session_state.messages.append({"role": "assistant", "content": full_response, "artifact": the_thing})
 
-            # Display assistant response in chat message container
-            display_assistant_response(full_response, the_thing)
+        # Display assistant response in chat message container - same widget keys it gets from the history loop on rerun
+        display_assistant_response(full_response, the_thing, key=f"message_{len(st.session_state.messages) - 1}")
 
 
 
@@ -227,8 +388,11 @@ st.sidebar.markdown("This assistant helps to navigate and answer questions you m
 run_mode_expander = st.sidebar.expander("Run mode")
 run_mode = run_mode_expander.radio(
     label="Choose the run mode:",
-    options=("AssistantAPI", "Autogen", "CrewAI")
+    options=("AssistantAPI", "Autogen", "CrewAI"),
+    key="run_mode",  # kept in the session state so prompt_response runs the selected mode
 )
+if run_mode == "AssistantAPI" and not API_URL:
+    warm_assistant_pool()
 with st.container() as border1:
     roles = {
         "AssistantAPI": ["Turbo4", "Informational"],
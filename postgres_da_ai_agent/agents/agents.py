@@ -1,9 +1,12 @@
 from typing import Optional, List, Dict, Any
 from postgres_da_ai_agent.agents.instruments import PostgresAgentInstruments
+from postgres_da_ai_agent.modules import memory
 from postgres_da_ai_agent.modules import orchestrator
+from postgres_da_ai_agent.modules.termination import TerminationPolicy
 from postgres_da_ai_agent.agents import agent_config
 import autogen
 import guidance
+import os
 
 # ------------------------ PROMPTS ------------------------
 
@@ -272,22 +275,42 @@ def build_team_orchestrator(
     team: str,
     agent_instruments: PostgresAgentInstruments,
     validate_results: callable = None,
+    memory_policy: Optional[memory.MemoryPolicy] = None,
+    stop_early: bool = True,
 ) -> orchestrator.Orchestrator:
     """
     Based on a team name, build a team of agents and return an orchestrator
+
+    memory_policy defaults to ORCHESTRATOR_MEMORY ('window', 'tokens' or 'summary', unset sends full history)
+    stop_early ends the conversation as soon as validate_results (and the team's extra checks) pass
     """
+    if memory_policy is None:
+        memory_policy = memory.build_memory_policy(os.environ.get("ORCHESTRATOR_MEMORY"))
+
+    termination_policy = None
+    if stop_early and validate_results:
+        predicates = []
+        if team == "data_insights":
+            # validate_innovation_files passes before anything is written
+            predicates.append(agent_instruments.validate_innovation_files_written)
+        termination_policy = TerminationPolicy(predicates=predicates)
+
     if team == "data_eng":
         return orchestrator.Orchestrator(
             name="data_eng_team",
             agents=build_data_eng_team(agent_instruments),
             instruments=agent_instruments,
             validate_results_func=validate_results,
+            memory_policy=memory_policy,
+            termination_policy=termination_policy,
         )
     elif team == "data_viz":
         return orchestrator.Orchestrator(
             name="data_viz_team",
             agents=build_data_viz_team(agent_instruments),
             validate_results_func=validate_results,
+            memory_policy=memory_policy,
+            termination_policy=termination_policy,
         )
     elif team == "scrum_master":
         return orchestrator.Orchestrator(
@@ -295,6 +318,8 @@ def build_team_orchestrator(
             agents=build_scrum_master_team(agent_instruments),
             instruments=agent_instruments,
             validate_results_func=validate_results,
+            memory_policy=memory_policy,
+            termination_policy=termination_policy,
         )
     elif team == "data_insights":
         return orchestrator.Orchestrator(
@@ -302,6 +327,8 @@ def build_team_orchestrator(
             agents=build_insights_team(agent_instruments),
             instruments=agent_instruments,
             validate_results_func=validate_results,
+            memory_policy=memory_policy,
+            termination_policy=termination_policy,
         )
 
     raise Exception("Unknown team: " + team)
@@ -1,8 +1,17 @@
-from postgres_da_ai_agent.modules.db import PostgresManager
-from postgres_da_ai_agent.types import Innovation
-import json
+from contextlib import ExitStack, contextmanager
+from typing import Optional
+from postgres_da_ai_agent.modules.db import PostgresConnectionPool, PostgresManager
+from postgres_da_ai_agent.modules import result_store
+from postgres_da_ai_agent.modules.result_store import SessionResultStore
+from postgres_da_ai_agent.modules.run_history import RunRecord
+from postgres_da_ai_agent.types import ConversationResult
+from dataclasses import asdict
+from postgres_da_ai_agent.modules import tool_calls
+from postgres_da_ai_agent.modules.tool_calls import MAX_TOOL_WORKERS
 from postgres_da_ai_agent.modules import file
+from postgres_da_ai_agent.modules import sessions
 import os
+import threading
 
 BASE_DIR = os.environ.get("BASE_DIR", "./agent_results")
 
@@ -29,10 +38,10 @@ class AgentInstruments:
         raise NotImplementedError
 
     def make_agent_chat_file(self, team_name: str):
-        return os.path.join(self.root_dir, f"agent_chats_{team_name}.json")
+        return os.path.join(sessions.ensure_dir(self.root_dir), f"agent_chats_{team_name}.jsonl")
 
     def make_agent_cost_file(self, team_name: str):
-        return os.path.join(self.root_dir, f"agent_cost_{team_name}.json")
+        return os.path.join(sessions.ensure_dir(self.root_dir), f"agent_cost_{team_name}.json")
 
     @property
     def root_dir(self):
@@ -56,29 +65,67 @@ class PostgresAgentInstruments(AgentInstruments):
         - The state lifecycle lives between all agent orchestrations
     """
 
-    def __init__(self, db_url: str, session_id: str) -> None:
+    def __init__(
+        self,
+        db_url: str,
+        session_id: str,
+        db_pool: Optional[PostgresConnectionPool] = None,
+        tool_db_pool: Optional[PostgresConnectionPool] = None,
+    ) -> None:
         super().__init__()
 
         self.db_url = db_url
         self.db = None
+        self.db_pool = db_pool
         self.session_id = session_id
         self.messages = []
-        self.innovation_index = 0
+        # sql, results and innovations live here - the files are an optional background export
+        self.results = SessionResultStore(self.root_dir)
+        self._exit_stack = ExitStack()
+        # tool functions can run concurrently (see modules/tool_calls.py). Sharing db_pool is only safe when
+        # its size bounds the sessions using it - otherwise sessions hold every connection and run_sql waits forever
+        self.tool_db_pool = tool_db_pool or db_pool
+        self.tool_db_pool_lock = threading.Lock()
 
     def __enter__(self):
         """
         Support entering the 'with' statement
         """
+        sessions.mark_active(self.session_id, BASE_DIR)
+        self._exit_stack.callback(sessions.mark_inactive, self.session_id)
+        sessions.schedule_gc(BASE_DIR)
         self.reset_files()
-        self.db = PostgresManager()
-        self.db.connect_with_url(self.db_url)
+        self._exit_stack.callback(self.results.close)
+        if self.db_pool:
+            # borrow a connection - it goes back to the pool on exit
+            self.db = self._exit_stack.enter_context(self.db_pool.connection())
+        else:
+            self.db = PostgresManager()
+            self.db.connect_with_url(self.db_url)
+            self._exit_stack.callback(self.db.close)
         return self, self.db
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
         Support exiting the 'with' statement
         """
-        self.db.close()
+        self._exit_stack.close()
+
+    @contextmanager
+    def tool_connection(self):
+        """
+        Borrow a connection for a single tool call so parallel run_sql calls don't share a cursor.
+        Without a shared pool a small one is opened on first use and closed on exit.
+        """
+        with self.tool_db_pool_lock:
+            if self.tool_db_pool is None:
+                self.tool_db_pool = PostgresConnectionPool(
+                    self.db_url, maxconn=MAX_TOOL_WORKERS
+                )
+                self._exit_stack.callback(self.tool_db_pool.close)
+
+        with self.tool_db_pool.connection() as db:
+            yield db
 
     def sync_messages(self, messages: list):
         """
@@ -88,12 +135,11 @@ class PostgresAgentInstruments(AgentInstruments):
 
     def reset_files(self):
         """
-        Clear everything in the root_dir
+        Clear everything in the root_dir.
+        The directory itself is created lazily by get_file_path - sessions that never write a file never touch the disk.
         """
-
-        # if it does not exist create it
         if not os.path.exists(self.root_dir):
-            os.makedirs(self.root_dir)
+            return
 
         for fname in os.listdir(self.root_dir):
             os.remove(os.path.join(self.root_dir, fname))
@@ -102,81 +148,88 @@ class PostgresAgentInstruments(AgentInstruments):
         """
         Get the full path to a file in the root_dir
         """
-        return os.path.join(self.root_dir, fname)
+        return os.path.join(sessions.ensure_dir(self.root_dir), fname)
 
     # -------------------------- Agent Properties -------------------------- #
 
     @property
     def run_sql_results_file(self):
-        return self.get_file_path("run_sql_results.json")
+        return self.get_file_path(result_store.RUN_SQL_RESULTS_FILE)
 
     @property
     def sql_query_file(self):
-        return self.get_file_path("sql_query.sql")
+        return self.get_file_path(result_store.SQL_QUERY_FILE)
+
+    @property
+    def innovation_index(self):
+        return len(self.results.innovations)
 
     # -------------------------- Agent Functions -------------------------- #
 
     def populate_conversation_result(self):
         """
-          Reads from the run_sql_results_file, sql_query_file and innovation_file to return                                             
-          the result and sql and innovation_ as a tuple. The population of these files happens                                         
-          async by the assistant tool functions and can only be read at the end                                        
-          of the process. TODO: move results to a db rather.   
-        """
-        # Read the SQL query results
-        with open(self.run_sql_results_file, 'r') as results_file:
-            result = json.loads(results_file.read())
-
-        # Read the SQL query
-        with open(self.sql_query_file, 'r') as query_file:
-            sql = query_file.read()
-
-        # Initialize a list to hold the content of innovation files
-        innovation_contents = []
-        # Loop through the innovation files and read their content
-        for i in range(self.innovation_index):
-            fname = self.get_file_path(f"{i}_innovation_file.json")
-            with open(fname, "r") as f:
-                content_str = f.read()
-                # Check if content_str is a string and parse it as JSON
-                if isinstance(content_str, str):
-                    content = json.loads(content_str)
-                # Convert each JSON object into an Innovation instance
-                innovations = [Innovation(**item) for item in content]
-                # Convert each JSON object into an Innovation instance
-                innovation_contents.extend(innovations)
-
-        return result, sql, innovation_contents
+        Returns the result, sql and innovations the tool functions stored during the conversation as a tuple.
 
+        Results too large to keep in memory come back as their first RESULT_PREVIEW_ROWS rows -
+        page through the rest with self.results.read_rows or an NdjsonResultReader on self.results.result_path.
+        """
+        if not self.results.has_results:
+            raise ValueError(f"No SQL results for session {self.session_id}")
+
+        if self.results.is_spilled:
+            result = self.results.read_rows(0, result_store.RESULT_PREVIEW_ROWS)
+        else:
+            result = self.results.get_results()
+
+        return result, self.results.sql, self.results.get_innovations()
+
+    def make_run_record(
+        self,
+        prompt: str,
+        executor: str = "",
+        conversation_result: Optional[ConversationResult] = None,
+        error_message: str = "",
+        seconds: float = 0.0,
+    ) -> RunRecord:
+        """
+        Snapshot of this session for the run history
+        """
+        conversation_result = conversation_result or ConversationResult(
+            success=False, messages=[], cost=0.0, tokens=0, last_message_str="", error_message=""
+        )
+        return RunRecord(
+            session_id=self.session_id,
+            prompt=prompt,
+            executor=executor,
+            success=not error_message and self.results.has_results,
+            error_message=error_message or conversation_result.error_message,
+            sql=self.results.sql or "",
+            row_count=self.results.row_count if self.results.has_results else None,
+            result_path=self.results.result_path,
+            innovations=[asdict(innovation) for innovation in self.results.get_innovations()],
+            cost=conversation_result.cost,
+            tokens=conversation_result.tokens,
+            seconds=seconds,
+        )
 
     def run_sql(self, sql: str) -> str:
         """
         Run a SQL query against the postgres database
         """
-        results_as_json = self.db.run_sql(sql)
-
-        fname = self.run_sql_results_file
-
-        # dump these results to a file
-        with open(fname, "w") as f:
-            f.write(results_as_json)
-
-        with open(self.sql_query_file, "w") as f:
-            f.write(sql)
+        with self.tool_connection() as db:
+            # streamed from a server side cursor - large results go straight to disk
+            self.results.set_sql_result(
+                sql, db.iter_sql_rows(sql), order=tool_calls.current_call_order()
+            )
 
         return "Successfully delivered results to json file"
 
     def validate_run_sql(self):
         """
-        validate that the run_sql results file exists and has content
+        validate that run_sql has delivered results
         """
-        fname = self.run_sql_results_file
-
-        with open(fname, "r") as f:
-            content = f.read()
-
-        if not content:
-            return False, f"File {fname} is empty"
+        if not self.results.has_results:
+            return False, f"No SQL results for session {self.session_id}"
 
         return True, ""
 
@@ -193,20 +246,26 @@ class PostgresAgentInstruments(AgentInstruments):
         return file.write_yml_file(fname, json_str)
 
     def write_innovation_file(self, content: str):
-        fname = self.get_file_path(f"{self.innovation_index}_innovation_file.json")
-        file.write_file(fname, content)
-        self.innovation_index += 1
+        try:
+            self.results.add_innovations(content)
+        except (ValueError, TypeError) as e:
+            return f"Could not read the innovations - send a JSON list of objects with insight, actionable_business_value and sql: {e}"
         return f"Successfully wrote innovation file. You can check my work."
 
+    def validate_innovation_files_written(self):
+        """
+        validate that at least one innovation file has been written
+        """
+        if self.innovation_index == 0:
+            return False, "No innovation files written yet"
+        return True, ""
+
     def validate_innovation_files(self):
         """
-        loop from 0 to innovation_index and verify file exists with content
+        verify every stored innovation batch has content
         """
-        for i in range(self.innovation_index):
-            fname = self.get_file_path(f"{i}_innovation_file.json")
-            with open(fname, "r") as f:
-                content = f.read()
-                if not content:
-                    return False, f"File {fname} is empty"
+        for i, innovations in enumerate(self.results.innovations):
+            if not innovations:
+                return False, f"Innovation batch {i} is empty"
 
         return True, ""
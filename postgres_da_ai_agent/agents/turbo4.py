@@ -1,3 +1,4 @@
+import inspect
 import json
 import os
 import openai
@@ -10,10 +11,24 @@ from openai.types import FileObject
 from openai.types.beta.threads.thread_message import ThreadMessage
 from openai.types.beta.threads.run_submit_tool_outputs_params import ToolOutput
 from postgres_da_ai_agent.modules import llm
-from postgres_da_ai_agent.types import Chat, TurboTool
+from postgres_da_ai_agent.modules import assistant_registry
+from postgres_da_ai_agent.modules import openai_client
+from postgres_da_ai_agent.modules import tool_calls
+from postgres_da_ai_agent.types import Chat, RunStats, ToolCallResult, TurboTool
 
 dotenv.load_dotenv()
 
+RUN_FAILED_STATUSES = ("failed", "expired", "cancelled")
+RUN_FAILED_EVENTS = ("thread.run.failed", "thread.run.expired", "thread.run.cancelled")
+
+# Assistants streaming events arrived in openai 1.14 - older clients fall back to adaptive polling
+try:
+    from openai.resources.beta.threads.runs import Runs
+
+    RUNS_SUPPORT_STREAMING = "stream" in inspect.signature(Runs.create).parameters
+except (ImportError, ValueError):
+    RUNS_SUPPORT_STREAMING = False
+
 
 class Turbo4:
     """
@@ -22,28 +37,37 @@ class Turbo4:
 
     def __init__(self):
         openai.api_key = os.environ.get("OPENAI_API_KEY")
-        self.client = openai.OpenAI()
+        self.client = openai_client.get_client()
+        self.registry = assistant_registry.get_registry()
+        self.assistant_name = None
         self.map_function_tools: Dict[str, TurboTool] = {}
         self.current_thread_id = None
-        self.thread_messages: List[ThreadMessage] = []
+        self.thread_messages: List[ThreadMessage] = []  # oldest first, synced incrementally
+        self.thread_chats: List[Chat] = []
+        self.thread_tokens = 0
+        self.last_message_id = None
+        self.chats_logged: Dict[str, int] = {}  # chat log file -> chats already appended
         self.local_messages = []
         self.assistant_id = None
         self.polling_interval = (
-            0.5  # Interval in seconds to poll the API for thread run completion
+            0.1  # Initial interval in seconds to poll the API for thread run completion
         )
+        self.polling_backoff = 1.5  # Each poll waits this much longer than the last
+        self.max_polling_interval = 2.0
+        self.run_timeout = 600  # Seconds before a run is cancelled
+        self.stream_runs = True  # Use run events instead of polling when the client supports it
+        self.run_stats: List[RunStats] = []
+        self.max_tool_workers = tool_calls.MAX_TOOL_WORKERS  # Tool calls of one step run in parallel
+        self.tool_call_stats: List[ToolCallResult] = []
         self.model = "gpt-4-1106-preview"
+        # what's been pushed to the assistant - pushed again if it has to be recreated
+        self.instructions: Optional[str] = None
+        self.tools_on_assistant = False
+        self._recovering_assistant = False
 
     @property
     def chat_messages(self) -> List[Chat]:
-        return [
-            Chat(
-                from_name=msg.role,
-                to_name="assistant" if msg.role == "user" else "user",
-                message=llm.safe_get(msg.model_dump(), "content.0.text.value"),
-                created=msg.created_at,
-            )
-            for msg in self.thread_messages
-        ]
+        return list(self.thread_chats)
 
     @property
     def tool_config(self):
@@ -53,17 +77,25 @@ class Turbo4:
 
     def run_validation(self, validation_func: Callable):
         print(f"run_validation({validation_func.__name__})")
-        validation_func()
+        validation = validation_func()
+        # validators either raise or return (ok, error_message)
+        if isinstance(validation, tuple) and not validation[0]:
+            raise ValueError(f"{validation_func.__name__} failed: {validation[1]}")
         return self
 
     def spy_on_assistant(self, output_file: str):
-        sorted_messages = sorted(
-            self.chat_messages, key=lambda msg: msg.created, reverse=False
-        )
-        messages_as_json = [asdict(msg) for msg in sorted_messages]
-        with open(output_file, "w") as f:
-            json.dump(messages_as_json, f, indent=2)
+        """
+        Append the thread's messages since the last spy to a JSON Lines chat log (already oldest first)
+        """
+        logged = self.chats_logged.get(output_file, 0)
+
+        # one batch per call - written directly, a background writer would only be flushed straight away
+        with open(output_file, "w" if logged == 0 else "a") as f:
+            f.writelines(
+                json.dumps(asdict(chat), default=str) + "\n" for chat in self.thread_chats[logged:]
+            )
 
+        self.chats_logged[output_file] = len(self.thread_chats)
         return self
 
     def get_costs_and_tokens(self, output_file: str) -> Tuple[float, float]:
@@ -78,13 +110,9 @@ class Turbo4:
         retrival_costs = 0
         code_interpreter_costs = 0
 
-        msgs = [
-            llm.safe_get(msg.model_dump(), "content.0.text.value")
-            for msg in self.thread_messages
-        ]
-        joined_msgs = " ".join(msgs)
-
-        msg_cost, tokens = llm.estimate_price_and_tokens(joined_msgs)
+        # tokens are counted as messages are synced - see load_threads()
+        tokens = self.thread_tokens
+        msg_cost = llm.estimate_price(self.thread_tokens, self.model)
 
         with open(output_file, "w") as f:
             json.dump(
@@ -98,12 +126,70 @@ class Turbo4:
 
         return self
 
+    def api(
+        self,
+        request: Callable[[openai.OpenAI], Any],
+        timeout: Optional[float] = None,
+        idempotent: bool = False,
+    ):
+        """
+        Run an OpenAI request through the shared rate limited client (retries, backoff, deadlines).
+        Only idempotent requests are retried after a timeout - see RateLimitedClient.call.
+        """
+        return self.client.call(request, model=self.model, timeout=timeout, idempotent=idempotent)
+
+    def api_on_assistant(self, request: Callable[[openai.OpenAI], Any], idempotent: bool = False):
+        """
+        self.api for requests that use the cached assistant id. If the assistant was deleted on the OpenAI side
+        the registry entry is forgotten, the assistant looked up or created again and the request retried once.
+        """
+        try:
+            return self.api(request, idempotent=idempotent)
+        except openai.NotFoundError:
+            if self._recovering_assistant:
+                raise
+            print(f"Assistant {self.assistant_id} no longer exists - recreating {self.assistant_name}")
+            self._recover_assistant()
+            return self.api(request, idempotent=idempotent)
+
+    def _recover_assistant(self):
+        self._recovering_assistant = True
+        try:
+            self.registry.forget_assistant(self.assistant_name)
+            self.get_or_create_assistant(self.assistant_name, self.model)
+            if self.instructions is not None:
+                self.set_instructions(self.instructions)
+            if self.tools_on_assistant:
+                self.equip_tools(list(self.map_function_tools.values()), equip_on_assistant=True)
+        finally:
+            self._recovering_assistant = False
+
     # ------------- CORE ASSISTANTS API FUNCTIONS -----------------
 
     def get_or_create_assistant(self, name: str, model: str = "gpt-4-1106-preview"):
         print(f"get_or_create_assistant({name}, {model})")
-        # Retrieve the list of existing assistants
-        assistants: List[Assistant] = self.client.beta.assistants.list().data
+        self.assistant_name = name
+        self.model = model
+
+        cached = self.registry.get_assistant(name)
+        if cached:
+            self.assistant_id = cached["id"]
+            if cached.get("model") == model:
+                return self
+            print(f"Updating assistant model from {cached.get('model')} to {model}")
+            try:
+                self.api(lambda client: client.beta.assistants.update(
+                    assistant_id=self.assistant_id, model=model
+                ), idempotent=True)
+                self.registry.update_assistant(name, model=model)
+                return self
+            except openai.NotFoundError:
+                # deleted on the OpenAI side - look it up by name below
+                print(f"Assistant {self.assistant_id} no longer exists - looking up {name}")
+                self.registry.forget_assistant(name)
+
+        # Not cached yet - retrieve the list of existing assistants
+        assistants: List[Assistant] = self.api(lambda client: client.beta.assistants.list(), idempotent=True).data
 
         # Check if an assistant with the given name already exists
         for assistant in assistants:
@@ -113,15 +199,16 @@ class Turbo4:
                 # update model if different
                 if assistant.model != model:
                     print(f"Updating assistant model from {assistant.model} to {model}")
-                    self.client.beta.assistants.update(
+                    self.api(lambda client: client.beta.assistants.update(
                         assistant_id=self.assistant_id, model=model
-                    )
+                    ), idempotent=True)
                 break
         else:  # If no assistant was found with the name, create a new one
-            assistant = self.client.beta.assistants.create(model=model, name=name)
+            assistant = self.api(lambda client: client.beta.assistants.create(model=model, name=name))
             self.assistant_id = assistant.id
 
-        self.model = model
+        # instructions and tools aren't known to match yet - the first set_instructions/equip_tools pushes them
+        self.registry.update_assistant(name, id=self.assistant_id, model=model)
 
         return self
 
@@ -131,9 +218,20 @@ class Turbo4:
             raise ValueError(
                 "No assistant has been created or retrieved. Call get_or_create_assistant() first."
             )
+
+        self.instructions = instructions
+        instructions_hash = assistant_registry.config_hash(instructions)
+        cached = self.registry.get_assistant(self.assistant_name) or {}
+        if cached.get("instructions_hash") == instructions_hash:
+            print(f"set_instructions() unchanged - skipping update")
+            return self
+
         # Update the assistant with the new instructions
-        updated_assistant = self.client.beta.assistants.update(
+        updated_assistant = self.api_on_assistant(lambda client: client.beta.assistants.update(
             assistant_id=self.assistant_id, instructions=instructions
+        ), idempotent=True)
+        self.registry.update_assistant(
+            self.assistant_name, instructions_hash=instructions_hash
         )
         return self
 
@@ -150,10 +248,18 @@ class Turbo4:
         self.map_function_tools = {tool.name: tool for tool in turbo_tools}
 
         if equip_on_assistant:
+            self.tools_on_assistant = True
+            tools_hash = assistant_registry.config_hash(self.tool_config)
+            cached = self.registry.get_assistant(self.assistant_name) or {}
+            if cached.get("tools_hash") == tools_hash:
+                print(f"equip_tools() unchanged - skipping update")
+                return self
+
             # Update the assistant with the new list of tools, replacing any existing tools
-            updated_assistant = self.client.beta.assistants.update(
+            updated_assistant = self.api_on_assistant(lambda client: client.beta.assistants.update(
                 tools=self.tool_config, assistant_id=self.assistant_id
-            )
+            ), idempotent=True)
+            self.registry.update_assistant(self.assistant_name, tools_hash=tools_hash)
 
         return self
 
@@ -165,32 +271,78 @@ class Turbo4:
                 "No assistant has been created. Call create_assistant() first."
             )
 
-        response = self.client.beta.threads.create()
+        response = self.api(lambda client: client.beta.threads.create())
         self.current_thread_id = response.id
         self.thread_messages = []
+        self.thread_chats = []
+        self.thread_tokens = 0
+        self.last_message_id = None
         return self
 
+    def reset(self):
+        """
+        Cheap reset for reuse - drop per conversation state and start a fresh thread on the same assistant
+        """
+        print(f"reset()")
+        self.chats_logged = {}
+        self.local_messages = []
+        self.map_function_tools = {}
+        self.run_stats = []
+        self.tool_call_stats = []
+        return self.make_thread()
+
     def add_message(self, message: str, refresh_threads: bool = False):
         print(f"add_message({message})")
         self.local_messages.append(message)
-        self.client.beta.threads.messages.create(
+        self.api(lambda client: client.beta.threads.messages.create(
             thread_id=self.current_thread_id, content=message, role="user"
-        )
+        ))
         if refresh_threads:
             self.load_threads()
         return self
 
     def load_threads(self):
-        self.thread_messages = self.client.beta.threads.messages.list(
-            thread_id=self.current_thread_id
-        ).data
+        """
+        Sync only the messages added since the last sync into the local, oldest first store.
+        Messages are synced before and after each run so their content is final by then.
+        """
+        while True:
+            page = self.api(lambda client: client.beta.threads.messages.list(
+                thread_id=self.current_thread_id,
+                order="asc",
+                after=self.last_message_id or openai.NOT_GIVEN,
+                limit=100,
+            ), idempotent=True)
+
+            for msg in page.data:
+                self._store_message(msg)
+
+            if not page.data or not page.has_more:
+                break
+
+        return self
+
+    def _store_message(self, msg: ThreadMessage):
+        text = llm.safe_get(msg.model_dump(), "content.0.text.value") or ""
+
+        self.thread_messages.append(msg)
+        self.thread_chats.append(
+            Chat(
+                from_name=msg.role,
+                to_name="assistant" if msg.role == "user" else "user",
+                message=text,
+                created=msg.created_at,
+            )
+        )
+        self.thread_tokens += llm.count_tokens(text)
+        self.last_message_id = msg.id
 
     def list_steps(self):
         print(f"list_steps()")
-        steps = self.client.beta.threads.runs.steps.list(
+        steps = self.api(lambda client: client.beta.threads.runs.steps.list(
             thread_id=self.current_thread_id,
             run_id=self.run_id,
-        )
+        ), idempotent=True)
         print("steps", steps)
         return steps
 
@@ -216,58 +368,141 @@ class Turbo4:
         # refresh current thread
         self.load_threads()
 
+        if self.stream_runs and RUNS_SUPPORT_STREAMING:
+            self._stream_run(tools)
+        else:
+            self._poll_run(tools)
+
+        self.load_threads()
+        return self
+
+    def _run_tool_calls(self, requested_tool_calls) -> List[ToolOutput]:
+        """
+        Call the equipped tool functions for a requires_action step - concurrently when the model asked for several
+        """
+        results = tool_calls.execute_tool_calls(
+            requested_tool_calls, self.map_function_tools, self.max_tool_workers
+        )
+        self.tool_call_stats.extend(results)
+
+        return [
+            ToolOutput(tool_call_id=result.tool_call_id, output=result.output)
+            for result in results
+        ]
+
+    def _record_run(self, status: str, polls: int, started: float, streamed: bool):
+        run_stats = RunStats(
+            run_id=self.run_id,
+            status=status,
+            polls=polls,
+            waited_seconds=round(time.monotonic() - started, 3),
+            streamed=streamed,
+        )
+        self.run_stats.append(run_stats)
+        print(
+            f"run_thread() {run_stats.run_id} {run_stats.status} - polls={run_stats.polls}, waited={run_stats.waited_seconds}s, streamed={run_stats.streamed}"
+        )
+        return run_stats
+
+    def _raise_for_terminal_status(self, run):
+        if run.status in RUN_FAILED_STATUSES:
+            raise RuntimeError(
+                f"Run {self.run_id} ended with status '{run.status}': {run.last_error}"
+            )
+
+    def _poll_run(self, tools: Optional[List[dict]]):
+        """
+        Adaptive polling: start fast so short runs return quickly, back off exponentially
+        so long runs don't hammer the API, and give up at run_timeout.
+        """
+        started = time.monotonic()
+        deadline = started + self.run_timeout
+        interval = self.polling_interval
+        polls = 0
+
         # Start the thread running
-        run = self.client.beta.threads.runs.create(
+        run = self.api_on_assistant(lambda client: client.beta.threads.runs.create(
             thread_id=self.current_thread_id,
             assistant_id=self.assistant_id,
             tools=tools,
-        )
+        ))
         self.run_id = run.id
 
-        # Polling mechanism to wait for thread's run completion or required actions
         while True:
-            # self.list_steps()
-
-            run_status = self.client.beta.threads.runs.retrieve(
+            run_status = self.api(lambda client: client.beta.threads.runs.retrieve(
                 thread_id=self.current_thread_id, run_id=self.run_id
-            )
-            if run_status.status == "requires_action":
-                tool_outputs: List[ToolOutput] = []
-                for (
-                    tool_call
-                ) in run_status.required_action.submit_tool_outputs.tool_calls:
-                    tool_function = tool_call.function
-                    tool_name = tool_function.name
-
-                    # Check if tool_arguments is already a dictionary, if so, proceed directly
-                    if isinstance(tool_function.arguments, dict):
-                        tool_arguments = tool_function.arguments
-                    else:
-                        # Assume the arguments are JSON string and parse them
-                        tool_arguments = json.loads(tool_function.arguments)
-
-                    print(f"run_thread() Calling {tool_name}({tool_arguments})")
-
-                    # Assuming arguments are passed as a dictionary
-                    function_output = self.map_function_tools[tool_name].function(
-                        **tool_arguments
-                    )
+            ), idempotent=True)
+            polls += 1
 
-                    tool_outputs.append(
-                        ToolOutput(tool_call_id=tool_call.id, output=function_output)
-                    )
+            if run_status.status == "requires_action":
+                tool_outputs = self._run_tool_calls(
+                    run_status.required_action.submit_tool_outputs.tool_calls
+                )
 
                 # Submit the tool outputs back to the API
-                self.client.beta.threads.runs.submit_tool_outputs(
+                self.api(lambda client: client.beta.threads.runs.submit_tool_outputs(
                     thread_id=self.current_thread_id,
                     run_id=self.run_id,
-                    tool_outputs=[to for to in tool_outputs],
-                )
+                    tool_outputs=tool_outputs,
+                ))
+                # the run picks straight back up - poll fast again
+                interval = self.polling_interval
             elif run_status.status == "completed":
-                self.load_threads()
-                return self
+                self._record_run(run_status.status, polls, started, streamed=False)
+                return
+            elif run_status.status in RUN_FAILED_STATUSES:
+                self._record_run(run_status.status, polls, started, streamed=False)
+                self._raise_for_terminal_status(run_status)
+
+            if time.monotonic() + interval > deadline:
+                self.api(lambda client: client.beta.threads.runs.cancel(
+                    thread_id=self.current_thread_id, run_id=self.run_id
+                ), idempotent=True)
+                self._record_run("timed_out", polls, started, streamed=False)
+                raise TimeoutError(
+                    f"Run {self.run_id} did not finish within {self.run_timeout}s"
+                )
+
+            time.sleep(interval)  # Wait a little before polling again
+            interval = min(interval * self.polling_backoff, self.max_polling_interval)
+
+    def _stream_run(self, tools: Optional[List[dict]]):
+        """
+        Event driven run completion (openai>=1.14): no polling, the run's events are pushed to us.
+        """
+        started = time.monotonic()
 
-            time.sleep(self.polling_interval)  # Wait a little before polling again
+        stream = self.api_on_assistant(lambda client: client.beta.threads.runs.create(
+            thread_id=self.current_thread_id,
+            assistant_id=self.assistant_id,
+            tools=tools,
+            stream=True,
+        ))
+
+        while stream is not None:
+            next_stream = None
+            for event in stream:
+                if event.event == "thread.run.created":
+                    self.run_id = event.data.id
+                elif event.event == "thread.run.requires_action":
+                    tool_outputs = self._run_tool_calls(
+                        event.data.required_action.submit_tool_outputs.tool_calls
+                    )
+                    next_stream = self.api(lambda client: client.beta.threads.runs.submit_tool_outputs(
+                        thread_id=self.current_thread_id,
+                        run_id=self.run_id,
+                        tool_outputs=tool_outputs,
+                        stream=True,
+                    ))
+                elif event.event == "thread.run.completed":
+                    self._record_run("completed", 0, started, streamed=True)
+                    return
+                elif event.event in RUN_FAILED_EVENTS:
+                    self._record_run(event.data.status, 0, started, streamed=True)
+                    self._raise_for_terminal_status(event.data)
+            stream = next_stream
+
+        raise RuntimeError(f"Run {self.run_id} stream ended before the run finished")
 
     def enable_retrieval(self):
         print(f"enable_retrieval()")
@@ -277,8 +512,13 @@ class Turbo4:
             )
 
         # Update the assistant with the new list of tools, replacing any existing tools
-        updated_assistant = self.client.beta.assistants.update(
-            tools=[{"type": "retrieval"}], assistant_id=self.assistant_id
+        retrieval_tools = [{"type": "retrieval"}]
+        updated_assistant = self.api_on_assistant(lambda client: client.beta.assistants.update(
+            tools=retrieval_tools, assistant_id=self.assistant_id
+        ), idempotent=True)
+        # the function tools are gone - the next equip_tools must push them again
+        self.registry.update_assistant(
+            self.assistant_name, tools_hash=assistant_registry.config_hash(retrieval_tools)
         )
 
         return self
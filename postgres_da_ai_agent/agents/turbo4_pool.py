@@ -0,0 +1,147 @@
+"""
+Purpose:
+    Keep warm Turbo4 handles (assistant looked up, instructions set, thread created) ready
+    so a prompt doesn't pay for assistant and thread setup calls.
+
+    pool = turbo4_pool.get_pool("Turbo4", SQL_DEVELOPER_INSTRUCTIONS)
+
+    with pool.handle(tools) as assistant:
+        assistant.add_message(prompt).run_thread()
+
+    Prewarming is opt-in - only long running processes (Streamlit, job workers) gain from it:
+
+    turbo4_pool.enable_prewarm()  # or TURBO4_PREWARM=1, before the first get_pool()
+
+    With it, TURBO4_POOL_SIZE handles are created up front and a returned handle is reset (fresh thread)
+    in the background for the next prompt. Without it, the pool holds no spare handles: each checkout
+    creates one inline and a returned handle is dropped, so a one shot CLI run makes no extra api calls.
+    Either way threads are never shared between conversations.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import os
+import queue
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from postgres_da_ai_agent.agents.turbo4 import Turbo4
+from postgres_da_ai_agent.types import TurboTool
+
+TURBO4_POOL_SIZE = int(os.environ.get("TURBO4_POOL_SIZE", "4"))
+TURBO4_PREWARM = os.environ.get("TURBO4_PREWARM", "").lower() in ("1", "true", "yes")
+
+
+class Turbo4Pool:
+    """
+    Thread safe pool of warm Turbo4 handles for one assistant configuration.
+    """
+
+    def __init__(
+        self,
+        assistant_name: str,
+        instructions: str,
+        model: str = "gpt-4-1106-preview",
+        size: int = TURBO4_POOL_SIZE,
+        recycle: bool = True,
+    ):
+        self.assistant_name = assistant_name
+        self.instructions = instructions
+        self.model = model
+        self.size = size
+        self.recycle = recycle
+        self.idle: "queue.Queue[Turbo4]" = queue.Queue(maxsize=max(size, 1))
+        self.warmer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="turbo4_pool")
+
+    def _create_handle(self) -> Turbo4:
+        return (
+            Turbo4()
+            .get_or_create_assistant(self.assistant_name, self.model)
+            .set_instructions(self.instructions)
+            .make_thread()
+        )
+
+    def _add_idle(self, handle: Turbo4):
+        try:
+            self.idle.put_nowait(handle)
+        except queue.Full:
+            # a burst created extra handles inline - let them go
+            pass
+
+    def _warm(self):
+        try:
+            self._add_idle(self._create_handle())
+        except Exception as e:
+            print(f"turbo4_pool: failed to warm a handle: {e}")
+
+    def _recycle(self, handle: Turbo4):
+        try:
+            self._add_idle(handle.reset())
+        except Exception as e:
+            print(f"turbo4_pool: failed to reset a handle: {e}")
+
+    def prewarm(self, count: Optional[int] = None):
+        """
+        Create handles in the background until `count` (default: the pool size) are idle.
+        """
+        count = self.size if count is None else count
+        for _ in range(max(count - self.idle.qsize(), 0)):
+            self.warmer.submit(self._warm)
+        return self
+
+    def checkout(self, turbo_tools: List[TurboTool]) -> Turbo4:
+        try:
+            handle = self.idle.get_nowait()
+        except queue.Empty:
+            print(f"turbo4_pool: no warm {self.assistant_name} handle - creating one inline")
+            handle = self._create_handle()
+
+        # tools are equipped locally (the run passes them) - no api call
+        return handle.equip_tools(turbo_tools)
+
+    def checkin(self, handle: Turbo4):
+        if not self.recycle:
+            # resetting costs a thread create call - only worth it when another prompt will follow
+            return
+        self.warmer.submit(self._recycle, handle)
+
+    @contextmanager
+    def handle(self, turbo_tools: List[TurboTool]):
+        assistant = self.checkout(turbo_tools)
+        try:
+            yield assistant
+        finally:
+            self.checkin(assistant)
+
+    def close(self):
+        self.warmer.shutdown(wait=False, cancel_futures=True)
+
+
+_pools: Dict[Tuple[str, str, str], Turbo4Pool] = {}
+_pools_lock = threading.Lock()
+_prewarm = TURBO4_PREWARM
+
+
+def enable_prewarm():
+    """
+    Call once at start up in long running processes, before the first get_pool().
+    """
+    global _prewarm
+    _prewarm = True
+
+
+def get_pool(
+    assistant_name: str, instructions: str, model: str = "gpt-4-1106-preview"
+) -> Turbo4Pool:
+    """
+    Process wide pool per assistant configuration. With prewarming enabled the first call starts warming it
+    in the background.
+    """
+    key = (assistant_name, instructions, model)
+    with _pools_lock:
+        if key not in _pools:
+            if _prewarm:
+                _pools[key] = Turbo4Pool(assistant_name, instructions, model).prewarm()
+            else:
+                _pools[key] = Turbo4Pool(assistant_name, instructions, model, size=0, recycle=False)
+        return _pools[key]
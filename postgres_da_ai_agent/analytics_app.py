@@ -16,33 +16,9 @@ st.title("Ask a question")
 if 'download_triggered' not in st.session_state:
     st.session_state.download_triggered = False
 
-from datetime import datetime
-import uuid
+from modules.rand import generate_session_id
 
 
-def generate_session_id(raw_prompt: str):
-    """
-    "get jobs with 'Completed' or 'Started' status"
-
-    ->
-
-    "get_jobs_with_Completed_or_Started_status__12_22_22"
-    """
-
-    now = datetime.now()
-    hours = now.hour
-    minutes = now.minute
-    seconds = now.second
-
-    short_time_mm_ss = f"{hours:02}_{minutes:02}_{seconds:02}"
-
-    lower_case = raw_prompt.lower()
-    no_spaces = lower_case.replace(" ", "_")
-    no_quotes = no_spaces.replace("'", "")
-    shorter = no_quotes[:30]
-    with_uuid = shorter + "__" + short_time_mm_ss
-    return with_uuid
-
 def prompt_response(raw_prompt):
     # Logic to generate a response string and object based on the prompt
     response_string = "This is a placeholder response."
@@ -0,0 +1,199 @@
+"""
+Run a file of prompts through the data analysis pipeline in one process.
+
+    poetry run batch --prompts questions.txt --output results.jsonl --concurrency 8
+
+All prompts share one database connection pool and one DatabaseEmbedder
+(the BERT model and every table definition embedding are computed once),
+and up to --concurrency prompts run against the LLM and Postgres at a time.
+
+The prompts file is one prompt per line (blank lines and lines starting with # are skipped)
+or JSON Lines with a "prompt" key. Results are written as JSON Lines in input order.
+"""
+
+from postgres_da_ai_agent.agents.instruments import PostgresAgentInstruments
+from postgres_da_ai_agent.modules import rand
+from postgres_da_ai_agent.modules import llm
+from postgres_da_ai_agent.modules import run_history
+from postgres_da_ai_agent.modules.db import PostgresConnectionPool, PostgresManager
+from postgres_da_ai_agent.modules.embeddings import DatabaseEmbedder
+from postgres_da_ai_agent.modules.tool_calls import MAX_TOOL_WORKERS
+from postgres_da_ai_agent.types import TurboTool
+from postgres_da_ai_agent.prompt_handler import (
+    POSTGRES_TABLE_DEFINITIONS_CAP_REF,
+    SQL_DEVELOPER_INSTRUCTIONS,
+    run_sql_tool_config,
+)
+from typing import List
+import argparse
+import asyncio
+import json
+import os
+import time
+
+DB_URL = os.environ.get("DATABASE_URL")
+
+
+def read_prompts(fname: str) -> List[str]:
+    prompts = []
+    with open(fname, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                line = json.loads(line)["prompt"]
+            prompts.append(line)
+    return prompts
+
+
+def generate_and_run_sql(
+    raw_prompt: str,
+    agent_instruments: PostgresAgentInstruments,
+    database_embedder: DatabaseEmbedder,
+):
+    """
+    2 api calls: generate the sql, then run it via the run_sql tool
+    """
+    table_definitions = database_embedder.get_similar_table_defs_for_prompt(
+        raw_prompt, model="gpt-4-1106-preview"
+    )
+
+    prompt = llm.add_cap_ref(
+        f"Fulfill this database query: {raw_prompt}. ",
+        f"Use these {POSTGRES_TABLE_DEFINITIONS_CAP_REF} to satisfy the database query.",
+        POSTGRES_TABLE_DEFINITIONS_CAP_REF,
+        table_definitions,
+    )
+
+    tools = [
+        TurboTool("run_sql", run_sql_tool_config, agent_instruments.run_sql),
+    ]
+
+    sql_response = llm.prompt(
+        prompt,
+        model="gpt-4-1106-preview",
+        instructions=SQL_DEVELOPER_INSTRUCTIONS,
+    )
+    llm.prompt_func(
+        "Use the run_sql function to run the SQL you've just generated: "
+        + sql_response,
+        model="gpt-4-1106-preview",
+        instructions=SQL_DEVELOPER_INSTRUCTIONS,
+        turbo_tools=tools,
+    )
+
+    result, sql, _ = agent_instruments.populate_conversation_result()
+    return result, sql
+
+
+def run_prompt(
+    index: int,
+    raw_prompt: str,
+    db_pool: PostgresConnectionPool,
+    database_embedder: DatabaseEmbedder,
+) -> dict:
+    """
+    Run a single prompt and record it in the run history
+    """
+    start = time.time()
+    session_id = rand.generate_session_id(f"batch_{index}_{raw_prompt}")
+    output = {"index": index, "prompt": raw_prompt, "session_id": session_id}
+
+    try:
+        with PostgresAgentInstruments(DB_URL, session_id, db_pool=db_pool) as (
+            agent_instruments,
+            db,
+        ):
+            error_message = ""
+            try:
+                result, sql = generate_and_run_sql(
+                    raw_prompt, agent_instruments, database_embedder
+                )
+            except Exception as e:
+                error_message = str(e)
+                raise
+            finally:
+                run_history.get_history().record(
+                    agent_instruments.make_run_record(
+                        raw_prompt,
+                        executor="batch",
+                        error_message=error_message,
+                        seconds=time.time() - start,
+                    )
+                )
+
+        output.update(success=True, sql=sql, result=result, error_message="")
+        print(f"✅ [{index}] {raw_prompt}")
+    except Exception as e:
+        output.update(success=False, sql="", result=None, error_message=str(e))
+        print(f"❌ [{index}] {raw_prompt}: {e}")
+
+    output["seconds"] = round(time.time() - start, 2)
+    return output
+
+
+async def run_batch(
+    prompts: List[str], output_file: str, concurrency: int = 8
+) -> List[dict]:
+    """
+    Run every prompt with at most `concurrency` in flight and write the results to one JSON Lines file.
+    """
+    # one connection held per prompt plus spares for its parallel run_sql tool calls
+    db_pool = PostgresConnectionPool(DB_URL, maxconn=concurrency + MAX_TOOL_WORKERS)
+
+    # the shared schema cache keeps its own connection - a pooled one would go back to the pool
+    # while the embedder still uses it
+    embedder_db = PostgresManager()
+    embedder_db.connect_with_url(DB_URL)
+
+    try:
+        # build the shared schema cache once, up front
+        database_embedder = DatabaseEmbedder(embedder_db).load_table_definitions()
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(index: int, raw_prompt: str) -> dict:
+            async with semaphore:
+                return await asyncio.to_thread(
+                    run_prompt, index, raw_prompt, db_pool, database_embedder
+                )
+
+        results = await asyncio.gather(
+            *[run_one(index, raw_prompt) for index, raw_prompt in enumerate(prompts)]
+        )
+    finally:
+        embedder_db.close()
+        db_pool.close()
+
+    with open(output_file, "w") as f:
+        for result in results:
+            f.write(json.dumps(result, default=str) + "\n")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", help="File with one prompt per line (or JSON Lines with a 'prompt' key)")
+    parser.add_argument("--output", default="batch_results.jsonl", help="Consolidated JSON Lines output file")
+    parser.add_argument("--concurrency", type=int, default=8, help="Prompts in flight at once")
+    args = parser.parse_args()
+
+    if not args.prompts:
+        print("Please provide a prompts file")
+        return
+
+    prompts = read_prompts(args.prompts)
+
+    start = time.time()
+    results = asyncio.run(run_batch(prompts, args.output, args.concurrency))
+    succeeded = sum(1 for result in results if result["success"])
+
+    print(
+        f"💰📊🤖 Batch complete: {succeeded}/{len(results)} succeeded in {time.time() - start:.1f}s -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
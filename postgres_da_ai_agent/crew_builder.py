@@ -4,12 +4,18 @@ from langchain.llms import Ollama
 from postgres_da_ai_agent.agents.instruments import PostgresAgentInstruments
 from postgres_da_ai_agent.modules.embeddings import DatabaseEmbedder
 from textwrap import dedent
+from functools import lru_cache
 import json
 
 POSTGRES_TABLE_DEFINITIONS_CAP_REF = "TABLE_DEFINITIONS"
 
-ollama_llm = Ollama(model="sqlcoder")
-mistral_llm = Ollama(model="mistral")
+
+@lru_cache(maxsize=None)
+def get_ollama_llm(model: str = "sqlcoder"):
+    """
+    Local Ollama clients are created on first use, not at import - e.g. get_ollama_llm("mistral")
+    """
+    return Ollama(model=model)
 
 class CrewBuilder:
     def __init__(self, agent_instruments: PostgresAgentInstruments, prompt: str):
@@ -28,7 +34,7 @@ class CrewBuilder:
             backstory="""You are a meticulous Data Engineer responsible for building and maintaining the data architecture of the company. Your expertise in data modeling, ETL processes, and data warehousing is unparalleled. Pay very close attention to detail and make sure any SQL yu produce is error free. You double check yourself to be sure.""",
             verbose=True,
             allow_delegation=False,
-            # llm=ollama_llm
+            # llm=get_ollama_llm("sqlcoder")
         )
 
         self.data_analyst = Agent(
@@ -41,7 +47,7 @@ class CrewBuilder:
             ],
             verbose=True,
             allow_delegation=False,
-            # llm=ollama_llm
+            # llm=get_ollama_llm("sqlcoder")
         )
 
         self.scrum_master = Agent(
@@ -50,7 +56,7 @@ class CrewBuilder:
             backstory="""You are the Scrum Master, the team's coach, and facilitator. Your primary goal is to ensure that the team adheres to Agile practices and works efficiently towards their goals.""",
             verbose=True,
             allow_delegation=False,
-            # llm=mistral_llm
+            # llm=get_ollama_llm("mistral")
 
         )
 
@@ -63,7 +69,7 @@ class CrewBuilder:
             ],
             verbose=True,
             allow_delegation=False,
-            # llm=mistral_llm
+            # llm=get_ollama_llm("mistral")
         )
 
 
@@ -73,7 +79,7 @@ class CrewBuilder:
             backstory="""As a Data Innovator, you have a unique ability to see beyond the data. You connect the dots between disparate pieces of information to generate new, valuable insights that can transform the way your team operates.""",
             verbose=True,
             allow_delegation=False,
-            # llm=ollama_llm
+            # llm=get_ollama_llm("sqlcoder")
         )
 
         # Add the agents to the list
@@ -0,0 +1,49 @@
+"""
+Look up past runs from the run history (see modules/run_history.py).
+
+    poetry run history --recent 20
+    poetry run history --prompt "How many users signed up last week?"
+    poetry run history --session <session_id>
+"""
+
+from postgres_da_ai_agent.modules import run_history
+import argparse
+
+
+def print_run(run: run_history.RunRecord):
+    status = "✅" if run.success else "❌"
+    rows = "-" if run.row_count is None else run.row_count
+    print(
+        f"{status} {run.session_id} | {run.executor} | {run.seconds:.1f}s | rows: {rows} | tokens: {run.tokens} | {run.prompt}"
+    )
+    if run.error_message:
+        print(f"    error: {run.error_message}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recent", type=int, default=20, help="Show the most recent runs")
+    parser.add_argument("--prompt", help="Show runs of this exact prompt")
+    parser.add_argument("--session", help="Show one session in full")
+    args = parser.parse_args()
+
+    history = run_history.get_history()
+
+    if args.session:
+        run = history.get(args.session)
+        if run is None:
+            print(f"No run found for session {args.session}")
+            return
+        print_run(run)
+        print(f"\nSQL:\n{run.sql}\n\nResults: {run.result_path or 'in memory only'}")
+        for innovation in run.innovations:
+            print(f"\n💡 {innovation['insight']}\n{innovation['sql']}")
+        return
+
+    runs = history.for_prompt(args.prompt, args.recent) if args.prompt else history.recent(args.recent)
+    for run in runs:
+        print_run(run)
+
+
+if __name__ == "__main__":
+    main()
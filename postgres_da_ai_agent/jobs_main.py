@@ -0,0 +1,218 @@
+"""
+Queue long running prompts and fetch their results later (see modules/job_queue.py).
+
+    poetry run jobs worker --workers 4
+    poetry run jobs submit --prompt "How many users signed up last week?" --priority high
+    poetry run jobs watch <job_id>
+    poetry run jobs status <job_id>
+    poetry run jobs list --status queued
+
+Workers share one database connection pool and one schema cache, like batch_main.
+At most MAX_LLM_SESSIONS prompts talk to the LLM at once in a worker process, however many workers it runs.
+Jobs left running by a worker process that died are requeued when the next one starts on the same host,
+up to MAX_JOB_ATTEMPTS times before the job is failed. Jobs of other live worker processes are left alone.
+"""
+
+from dataclasses import asdict
+from typing import Optional
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+from postgres_da_ai_agent.agents import turbo4_pool
+from postgres_da_ai_agent.agents.instruments import PostgresAgentInstruments
+from postgres_da_ai_agent.modules import job_queue
+from postgres_da_ai_agent.modules import rand
+from postgres_da_ai_agent.modules.db import PostgresConnectionPool
+from postgres_da_ai_agent.modules.embeddings import DatabaseEmbedder
+from postgres_da_ai_agent.modules.job_queue import Job, JobQueue
+from postgres_da_ai_agent.modules.tool_calls import MAX_TOOL_WORKERS
+from postgres_da_ai_agent.prompt_handler import PromptHandler
+from postgres_da_ai_agent.warmup import EXECUTOR_MODULES, warm_up
+
+DB_URL = os.environ.get("DATABASE_URL")
+
+MAX_LLM_SESSIONS = int(os.environ.get("MAX_LLM_SESSIONS", "4"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", str(MAX_LLM_SESSIONS)))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1"))
+
+# process wide - every pool in the process draws from the same sessions
+llm_sessions = threading.BoundedSemaphore(MAX_LLM_SESSIONS)
+
+
+class JobWorkerPool:
+    """
+    Worker threads that claim jobs from the queue and run them through the PromptHandler
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        workers: int = JOB_WORKERS,
+        warm_executor: str = "AssistantAPI",
+        poll_seconds: float = JOB_POLL_SECONDS,
+    ):
+        self.queue = queue
+        self.workers = workers
+        self.warm_executor = warm_executor
+        self.poll_seconds = poll_seconds
+        self.stopping = threading.Event()
+        self.threads = []
+        self.db_pool: Optional[PostgresConnectionPool] = None
+        self.database_embedder: Optional[DatabaseEmbedder] = None
+
+    def start(self):
+        self.queue.requeue_running()
+
+        # one connection held per running job plus spares for its parallel run_sql tool calls
+        self.db_pool = PostgresConnectionPool(
+            DB_URL, maxconn=min(self.workers, MAX_LLM_SESSIONS) + MAX_TOOL_WORKERS
+        )
+        self.database_embedder, _ = warm_up(DB_URL, executor=self.warm_executor)
+        # workers run prompt after prompt - keep assistant handles warm between them
+        turbo4_pool.enable_prewarm()
+
+        for index in range(self.workers):
+            worker = f"{socket.gethostname()}:{os.getpid()}:{index}"
+            thread = threading.Thread(target=self._run, args=(worker,), name=worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"👷 {self.workers} job workers started, {MAX_LLM_SESSIONS} LLM sessions")
+
+    def stop(self):
+        """
+        Running jobs finish first - they are not interrupted
+        """
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join()
+        if self.db_pool:
+            self.db_pool.close()
+
+    def _run(self, worker: str):
+        while not self.stopping.is_set():
+            # hold the session before claiming so queued jobs wait in the queue, not in a worker
+            with llm_sessions:
+                job = self.queue.claim(worker)
+                if job:
+                    self.run_job(job)
+                    continue
+            self.stopping.wait(self.poll_seconds)
+
+    def run_job(self, job: Job):
+        start = time.time()
+        session_id = rand.generate_session_id(job.prompt)
+        print(f"👷 Job {job.id} started: {job.prompt}")
+
+        try:
+            with PostgresAgentInstruments(DB_URL, session_id, db_pool=self.db_pool) as (
+                agent_instruments,
+                db,
+            ):
+                self.queue.set_stage(job.id, "gate", session_id=session_id)
+                with PromptHandler(
+                    job.prompt,
+                    agent_instruments,
+                    db,
+                    executor=job.executor,
+                    database_embedder=self.database_embedder,
+                ) as prompt_executor:
+                    self.queue.set_stage(job.id, type(prompt_executor).__name__)
+                    result = prompt_executor.execute()
+
+            # informational prompts have no result
+            self.queue.complete(job.id, asdict(result) if result else None)
+            print(f"✅ Job {job.id} done in {time.time() - start:.1f}s")
+        except Exception as e:
+            self.queue.fail(job.id, str(e))
+            print(f"❌ Job {job.id} failed: {e}")
+
+
+# ---------------- CLI ----------------
+
+
+def print_job(job: Job):
+    status = {"succeeded": "✅", "failed": "❌"}.get(job.status, "⏳")
+    print(f"{status} {job.id} | {job.status} | {job.stage} | priority {job.priority} | {job.prompt}")
+    if job.error_message:
+        print(f"    error: {job.error_message}")
+
+
+def print_result(job: Job):
+    if job.result is None:
+        print("No result - the prompt was not answered with SQL")
+        return
+    print(f"\nSQL:\n{job.result['sql']}\n\nResults: {job.result['result_path'] or 'in the job'}")
+    print(json.dumps(job.result["result"], indent=2, default=str)[:2000])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker = commands.add_parser("worker", help="Run jobs until interrupted")
+    worker.add_argument("--workers", type=int, default=JOB_WORKERS, help="Worker threads")
+    worker.add_argument("--executor", default="AssistantAPI", choices=list(EXECUTOR_MODULES), help="Executor to warm up")
+
+    submit = commands.add_parser("submit", help="Queue a prompt and print its job id")
+    submit.add_argument("--prompt", required=True)
+    submit.add_argument("--executor", default="AssistantAPI", choices=list(EXECUTOR_MODULES))
+    submit.add_argument("--priority", default="normal", choices=list(job_queue.PRIORITIES))
+    submit.add_argument("--wait", action="store_true", help="Watch the job until it finishes")
+
+    for name, help_text in [("status", "Show a job"), ("watch", "Follow a job's stages until it finishes")]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("job_id")
+
+    listing = commands.add_parser("list", help="Show recent jobs")
+    listing.add_argument("--status", choices=[job_queue.QUEUED, job_queue.RUNNING, job_queue.SUCCEEDED, job_queue.FAILED])
+    listing.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    queue = job_queue.get_queue()
+
+    if args.command == "worker":
+        pool = JobWorkerPool(queue, workers=args.workers, warm_executor=args.executor)
+        pool.start()
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            print("👷 Stopping - waiting for running jobs")
+            pool.stop()
+        return
+
+    if args.command == "list":
+        for job in queue.list(args.status, args.limit):
+            print_job(job)
+        return
+
+    if args.command == "submit":
+        job_id, deduplicated = queue.submit(
+            args.prompt, executor=args.executor, priority=job_queue.PRIORITIES[args.priority]
+        )
+        print(job_id)
+        if not args.wait:
+            return
+        args.job_id = job_id
+
+    job = queue.get(args.job_id)
+    if job is None:
+        print(f"No job {args.job_id}")
+        return
+
+    if args.command in ("watch", "submit"):
+        for job in queue.watch(job.id):
+            print_job(job)
+
+    if args.command == "status":
+        print_job(job)
+    if job.status == job_queue.SUCCEEDED:
+        print_result(job)
+
+
+if __name__ == "__main__":
+    main()
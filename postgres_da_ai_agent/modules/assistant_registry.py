@@ -0,0 +1,177 @@
+"""
+Purpose:
+    Local cache of what Turbo4 has already set up on the OpenAI account so per-request setup
+    doesn't need any API round trips once things are in place.
+
+    - assistants keyed by name, with the model and a hash of the instructions and tools last pushed
+    - uploaded files keyed by a hash of their content
+
+    Stored as JSON at TURBO4_REGISTRY_FILE and shared by every process using it (Streamlit, job workers,
+    the api-server): reads pick up other processes' writes, and each write re-reads and changes the file
+    under an exclusive lock (TURBO4_REGISTRY_FILE.lock) so no process drops another's entries. Entries for assistants or files deleted on the OpenAI side
+    are forgotten and recreated by Turbo4 the first time a request for them 404s - delete the file to
+    force a full refresh.
+"""
+
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # windows - writes are only serialized within the process
+    fcntl = None
+
+BASE_DIR = os.environ.get("BASE_DIR", "./agent_results")
+
+REGISTRY_FILE = os.environ.get(
+    "TURBO4_REGISTRY_FILE", os.path.join(BASE_DIR, "turbo4_registry.json")
+)
+
+
+def config_hash(value: Any) -> str:
+    """
+    Stable hash of any json serializable value (instructions, tool configs, ...)
+    """
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class AssistantRegistry:
+    """
+    Thread safe, JSON backed registry of assistant ids and file ids.
+    """
+
+    def __init__(self, path: str = REGISTRY_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {"assistants": {}, "files": {}}
+        self._loaded_version = None
+        with self.lock:
+            self.load()
+
+    def _file_version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def load(self):
+        """
+        Re-read the file if another process (or this one) changed it since it was last read - hold self.lock
+        """
+        version = self._file_version()
+        if version is None or version == self._loaded_version:
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"assistant_registry: ignoring unreadable registry {self.path}: {e}")
+            return
+        self.data["assistants"] = data.get("assistants", {})
+        self.data["files"] = data.get("files", {})
+        self._loaded_version = version
+
+    @contextmanager
+    def _file_lock(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _update(self, change: Callable[[dict], bool]):
+        """
+        Apply change to the latest registry and save it if change returns True
+        """
+        with self.lock, self._file_lock():
+            self.load()
+            if change(self.data):
+                self.save()
+
+    def save(self):
+        # write then rename so a crash never leaves a half written registry - call under _file_lock
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._loaded_version = self._file_version()
+
+    # ------------- assistants -----------------
+
+    def get_assistant(self, name: str) -> Optional[dict]:
+        with self.lock:
+            self.load()
+            entry = self.data["assistants"].get(name)
+            return dict(entry) if entry else None
+
+    def update_assistant(self, name: str, **fields):
+        def change(data: dict) -> bool:
+            data["assistants"].setdefault(name, {}).update(fields)
+            return True
+
+        self._update(change)
+
+    def forget_assistant(self, name: str):
+        self._update(lambda data: data["assistants"].pop(name, None) is not None)
+
+    # ------------- files -----------------
+
+    def get_file(self, file_hash: str) -> Optional[dict]:
+        with self.lock:
+            self.load()
+            entry = self.data["files"].get(file_hash)
+            return dict(entry) if entry else None
+
+    def update_file(self, file_hash: str, file_id: str, filename: str, size: int):
+        def change(data: dict) -> bool:
+            data["files"][file_hash] = {
+                "id": file_id,
+                "filename": filename,
+                "bytes": size,
+            }
+            return True
+
+        self._update(change)
+
+    def forget_file_id(self, file_id: str):
+        def change(data: dict) -> bool:
+            stale = [h for h, f in data["files"].items() if f["id"] == file_id]
+            for file_hash in stale:
+                del data["files"][file_hash]
+            return bool(stale)
+
+        self._update(change)
+
+
+_registry: Optional[AssistantRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> AssistantRegistry:
+    """
+    Process wide registry so every Turbo4 instance sees the same cache.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = AssistantRegistry()
+        return _registry
@@ -0,0 +1,135 @@
+"""
+Purpose:
+    Append-only JSON Lines chat logs.
+
+    Each chat is one line, appended by a background thread, so logging a long conversation
+    never rewrites what's already on disk.
+
+    log = ChatLogWriter("agent_chats_team.jsonl")
+    log.append({"from_name": "a", "to_name": "b", "message": "hi", "created": 1700000000})
+    log.close()  # waits for everything to be written
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+CHAT_LOG_FLUSH_INTERVAL = float(os.environ.get("CHAT_LOG_FLUSH_INTERVAL", "0.5"))
+CHAT_LOG_MAX_BUFFER = int(os.environ.get("CHAT_LOG_MAX_BUFFER", "1000"))
+
+_CLOSE = object()
+_FLUSH = object()
+
+
+class ChatLogWriter:
+    """
+    Buffers chats in a bounded queue and writes them from a background thread, flushing to disk
+    at most every flush_interval seconds (and on flush()/close()).
+    append() blocks when the buffer is full so a stalled disk slows the conversation down instead of growing memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        truncate: bool = True,
+        flush_interval: float = CHAT_LOG_FLUSH_INTERVAL,
+        max_buffer: int = CHAT_LOG_MAX_BUFFER,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max_buffer)
+        self.file = open(path, "w" if truncate else "a")
+        self.closed = False
+        self.error: Optional[Exception] = None
+        self.thread = threading.Thread(
+            target=self._run, name=f"chat_log:{os.path.basename(path)}", daemon=True
+        )
+        self.thread.start()
+
+    def append(self, chat: dict):
+        if self.closed:
+            raise ValueError(f"Chat log {self.path} is closed")
+        self.queue.put(chat)
+
+    def flush(self):
+        """
+        Block until every appended chat is written and flushed
+        """
+        self.queue.put(_FLUSH)
+        self.queue.join()
+        if self.error:
+            raise self.error
+
+    def close(self):
+        """
+        Final flush, then stop the background thread and close the file
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(_CLOSE)
+        self.thread.join()
+        self.file.close()
+        if self.error:
+            raise self.error
+
+    def _run(self):
+        dirty = False
+        last_flush = time.monotonic()
+
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if dirty:
+                    self._flush_file()
+                    dirty = False
+                    last_flush = time.monotonic()
+                continue
+
+            # drain whatever else is buffered and write it as one batch
+            batch = [item]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(chat is _CLOSE for chat in batch)
+            force = stop or any(chat is _FLUSH for chat in batch)
+            try:
+                self.file.writelines(
+                    json.dumps(chat, default=str) + "\n"
+                    for chat in batch
+                    if chat is not _CLOSE and chat is not _FLUSH
+                )
+                dirty = True
+                if force or time.monotonic() - last_flush >= self.flush_interval:
+                    self._flush_file()
+                    dirty = False
+                    last_flush = time.monotonic()
+            except Exception as e:
+                print(f"chat_log: failed to write {self.path}: {e}")
+                self.error = e
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+            if stop:
+                return
+
+    def _flush_file(self):
+        try:
+            self.file.flush()
+        except Exception as e:
+            print(f"chat_log: failed to flush {self.path}: {e}")
+            self.error = e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
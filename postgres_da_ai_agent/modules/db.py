@@ -1,7 +1,36 @@
+from contextlib import contextmanager
 from datetime import datetime
 import json
+import os
+import re
+import threading
+from typing import Iterator
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from psycopg2.sql import SQL, Identifier
+from postgres_da_ai_agent.modules import pg_json
+from postgres_da_ai_agent.modules.ndjson_results import NDJSON_CHUNK_ROWS
+
+SEARCH_PATH_OPTIONS = "-c search_path=atomic,public"
+
+# statements iter_sql_rows can read through a server side cursor - DECLARE ... CURSOR FOR takes a single query
+# (a data-modifying WITH or SELECT INTO is rejected too)
+QUERY_START = re.compile(r"(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/|\()*(select|with|values|table)\b", re.I | re.S)
+DATA_MODIFYING = re.compile(r"\b(insert|update|delete|merge|into)\b", re.I)
+SEMICOLON = re.compile(r";\s*\S")
+
+
+def is_single_query(sql: str) -> bool:
+    """
+    Conservative - anything it isn't sure of runs on a regular cursor (correct, just not streamed)
+    """
+    if not QUERY_START.match(sql) or SEMICOLON.search(sql):
+        return False
+    return not DATA_MODIFYING.search(sql)
+
+
+# borrowing a pooled connection raises after waiting this long instead of hanging
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "60"))
 
 
 class PostgresManager:
@@ -12,6 +41,7 @@ class PostgresManager:
     def __init__(self):
         self.conn = None
         self.cur = None
+        self._cursor_count = 0
 
     def __enter__(self):
         return self
@@ -23,7 +53,14 @@ class PostgresManager:
             self.conn.close()
 
     def connect_with_url(self, url):
-        self.conn = psycopg2.connect(url,options="-c search_path=atomic,public")
+        self.conn = psycopg2.connect(url,options=SEARCH_PATH_OPTIONS)
+        self.cur = self.conn.cursor()
+
+    def use_connection(self, conn):
+        """
+        Use an existing connection (e.g. borrowed from a PostgresConnectionPool)
+        """
+        self.conn = conn
         self.cur = self.conn.cursor()
 
     def close(self):
@@ -36,16 +73,44 @@ class PostgresManager:
         """
         Run a SQL query against the postgres database
         """
-        self.cur.execute(sql)
-        columns = [desc[0] for desc in self.cur.description]
-        res = self.cur.fetchall()
-
-        list_of_dicts = [dict(zip(columns, row)) for row in res]
+        list_of_dicts = self.run_sql_rows(sql)
 
-        json_result = json.dumps(list_of_dicts, indent=4, default=self.datetime_handler)
+        json_result = pg_json.dumps(list_of_dicts, indent=4)
 
         return json_result
 
+    def run_sql_rows(self, sql) -> list:
+        """
+        Run a SQL query and return the rows as dicts of json friendly values
+        (the same values run_sql's json would parse back to)
+        """
+        return list(self.iter_sql_rows(sql))
+
+    def iter_sql_rows(self, sql, chunk_rows: int = NDJSON_CHUNK_ROWS) -> Iterator[dict]:
+        """
+        Stream a query's rows as dicts of json friendly values - chunk_rows at a time from a
+        server side cursor, so memory doesn't grow with the result.
+        Statements a cursor can't be declared for (see is_single_query) run on a regular cursor.
+        """
+        if is_single_query(sql):
+            self._cursor_count += 1
+            cur = self.conn.cursor(name=f"run_sql_{self._cursor_count}")
+        else:
+            cur = self.conn.cursor()
+        try:
+            cur.execute(sql)
+            if cur.description is None:
+                return
+            rows = cur.fetchmany(chunk_rows)
+
+            while rows:
+                # converters are picked once per column from the type OIDs (see modules/pg_json.py)
+                yield from pg_json.rows_to_dicts(cur.description, rows)
+                rows = cur.fetchmany(chunk_rows)
+        finally:
+            if not cur.closed:
+                cur.close()
+
     def datetime_handler(self, obj):
         """
         Handle datetime objects when serializing to JSON.
@@ -172,3 +237,55 @@ class PostgresManager:
         related_tables_list = list(set(related_tables_list))
 
         return related_tables_list
+
+
+class PostgresConnectionPool:
+    """
+    A thread safe pool of postgres connections shared across concurrent prompts.
+
+    with pool.connection() as db:
+        db.run_sql("SELECT 1")
+
+    Borrowing waits while all connections are in use (up to DB_POOL_TIMEOUT) instead of raising right away like psycopg2's pool does.
+    """
+
+    def __init__(self, url, minconn=1, maxconn=10):
+        self.pool = ThreadedConnectionPool(
+            minconn, maxconn, url, options=SEARCH_PATH_OPTIONS
+        )
+        self.maxconn = maxconn
+        self.available = threading.BoundedSemaphore(maxconn)
+
+    @contextmanager
+    def connection(self, timeout: float = DB_POOL_TIMEOUT):
+        if not self.available.acquire(timeout=timeout):
+            raise TimeoutError(
+                f"No pooled database connection free after {timeout}s - all {self.maxconn} are in use"
+            )
+        try:
+            conn = self.pool.getconn()
+            db = PostgresManager()
+            try:
+                db.use_connection(conn)
+                yield db
+            finally:
+                self._return(db, conn)
+        finally:
+            # a failed connect or a dropped connection must not cost the pool a slot
+            self.available.release()
+
+    def _return(self, db, conn):
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                if db.cur:
+                    db.cur.close()
+                # end any open transaction so the next borrower starts clean
+                conn.rollback()
+            except psycopg2.Error as e:
+                print(f"Discarding broken pooled connection: {e}")
+                broken = True
+        self.pool.putconn(conn, close=broken)
+
+    def close(self):
+        self.pool.closeall()
@@ -1,39 +1,106 @@
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import BertTokenizer, BertModel
+from functools import lru_cache
+import threading
 
 from postgres_da_ai_agent.modules.db import PostgresManager
+from postgres_da_ai_agent.modules import table_context
+
+
+def cosine_similarity(a, b):
+    """
+    sklearn is imported on first use, not at module import
+    """
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    return cosine_similarity(a, b)
+
+
+@lru_cache(maxsize=None)
+def load_bert(model_name: str = "bert-base-uncased"):
+    """
+    Load the tokenizer and model once per process - every DatabaseEmbedder shares them.
+    transformers (and torch) are imported here, not at module import.
+    """
+    from transformers import BertTokenizer, BertModel
+
+    return BertTokenizer.from_pretrained(model_name), BertModel.from_pretrained(model_name)
 
 
 class DatabaseEmbedder:
     """
     This class is responsible for embedding database table definitions and
     computing similarity between user queries and table definitions.
+
+    Table definitions and their embeddings are loaded once per embedder,
+    so one embedder can be shared as the schema cache for many prompts.
     """
 
     def __init__(self, db: PostgresManager):
-        self.tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
-        self.model = BertModel.from_pretrained("bert-base-uncased")
+        self.tokenizer, self.model = load_bert()
         self.map_name_to_embeddings = {}
         self.map_name_to_table_def = {}
+        self.map_column_to_embeddings = {}
         self.db = db
+        self.load_lock = threading.Lock()
 
-    def get_similar_table_defs_for_prompt(self, prompt: str, n_similar=5, n_foreign=0):
-        map_table_name_to_table_def = self.db.get_table_definition_map_for_embeddings()
-        for name, table_def in map_table_name_to_table_def.items():
-            self.add_table(name, table_def)
+    def load_table_definitions(self):
+        """
+        Embed every table definition in the database - only the first call does any work.
+        """
+        with self.load_lock:
+            if self.map_name_to_table_def:
+                return self
+            map_table_name_to_table_def = self.db.get_table_definition_map_for_embeddings()
+            for name, table_def in map_table_name_to_table_def.items():
+                self.add_table(name, table_def)
+        return self
+
+    def get_similar_table_defs_for_prompt(self, prompt: str, n_similar=5, n_foreign=0, model: str = None):
+        """
+        When a model is given the definitions are compressed to fit that model's table context budget.
+        """
+        self.load_table_definitions()
 
         similar_tables = self.get_similar_tables(prompt, n=n_similar)
 
-        table_definitions = self.get_table_definitions_from_names(similar_tables)
-
         if n_foreign > 0:
             foreign_table_names = self.db.get_foreign_tables(similar_tables, n=3)
+            similar_tables = foreign_table_names + similar_tables
 
-            table_definitions = self.get_table_definitions_from_names(
-                foreign_table_names + similar_tables
-            )
+        if model:
+            return self.get_table_context_from_names(prompt, similar_tables, model).text
 
-        return table_definitions
+        return self.get_table_definitions_from_names(similar_tables)
+
+    def get_table_context_from_names(
+        self, prompt: str, table_names: list, model: str = "gpt-4-1106-preview"
+    ) -> table_context.TableContext:
+        """
+        Given a list of table names, return their definitions fitted to the model's token budget.
+        Columns are pruned by relevance to the prompt when the definitions don't fit.
+        Tables that weren't embedded (e.g. foreign tables outside the embedded schema) are skipped.
+        """
+        map_table_name_to_table_def = {}
+        for table_name in table_names:
+            table_def = self.map_name_to_table_def.get(table_name)
+            if table_def is None:
+                print(f"📐 Table context: no definition loaded for {table_name} - skipping it")
+                continue
+            map_table_name_to_table_def[table_name] = table_def
+        return table_context.build_table_context(
+            prompt, map_table_name_to_table_def, model=model, database_embedder=self
+        )
+
+    def get_column_similarity(self, prompt_embedding, column_name: str) -> float:
+        """
+        Cosine similarity between a prompt and a column name. Column embeddings are cached.
+        """
+        if column_name not in self.map_column_to_embeddings:
+            self.map_column_to_embeddings[column_name] = self.compute_embeddings(
+                column_name.replace("_", " ")
+            )
+        return float(
+            cosine_similarity(prompt_embedding, self.map_column_to_embeddings[column_name])[0][0]
+        )
 
     def add_table(self, table_name: str, text_representation: str):
         """
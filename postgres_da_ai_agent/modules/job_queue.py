@@ -0,0 +1,368 @@
+"""
+Purpose:
+    Persistent SQLite job queue for long running prompts - submit returns a job id right away,
+    workers (see jobs_main.py) run the prompt and callers poll or watch the job for its stage and result.
+
+    - priorities: higher runs first, then oldest first
+    - identical prompts (same executor) that are still queued or running share one job
+    - WAL mode so status polling never blocks the workers
+
+    queue = JobQueue()
+    job_id, deduplicated = queue.submit("How many users signed up last week?", priority=PRIORITY_HIGH)
+    queue.wait(job_id).result
+"""
+
+from contextlib import closing
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Iterator, List, Optional, Tuple
+
+BASE_DIR = os.environ.get("BASE_DIR", "./agent_results")
+
+JOB_QUEUE_DB = os.environ.get("JOB_QUEUE_DB", os.path.join(BASE_DIR, "jobs.sqlite3"))
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 5
+PRIORITY_HIGH = 10
+
+PRIORITIES = {"low": PRIORITY_LOW, "normal": PRIORITY_NORMAL, "high": PRIORITY_HIGH}
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+IN_FLIGHT = (QUEUED, RUNNING)
+
+# a job whose worker process died this many times is failed instead of requeued
+MAX_JOB_ATTEMPTS = int(os.environ.get("MAX_JOB_ATTEMPTS", "3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    executor TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    dedupe_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL DEFAULT '',
+    stages TEXT NOT NULL DEFAULT '[]',
+    session_id TEXT NOT NULL DEFAULT '',
+    worker TEXT NOT NULL DEFAULT '',
+    worker_host TEXT NOT NULL DEFAULT '',
+    worker_pid INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error_message TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_next ON jobs (status, priority DESC, created_at);
+-- at most one in flight job per prompt - the dedupe guarantee
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_in_flight ON jobs (dedupe_key) WHERE status IN ('queued', 'running');
+"""
+
+def is_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # exists, owned by someone else
+        return True
+    return True
+
+
+def make_dedupe_key(prompt: str, executor: str) -> str:
+    normalized = " ".join(prompt.lower().split())
+    return hashlib.sha256(f"{executor}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Job:
+    id: str
+    prompt: str
+    executor: str
+    priority: int
+    dedupe_key: str
+    status: str
+    stage: str = ""
+    stages: list = field(default_factory=list)  # [{"stage": ..., "at": ...}] in order
+    session_id: str = ""
+    worker: str = ""
+    worker_host: str = ""
+    worker_pid: Optional[int] = None
+    attempts: int = 0  # times a worker claimed it
+    result: Optional[dict] = None  # the ConversationResult as a dict
+    error_message: str = ""
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    @staticmethod
+    def from_row(row: sqlite3.Row) -> "Job":
+        values = dict(row)
+        values["stages"] = json.loads(values["stages"])
+        values["result"] = json.loads(values["result"]) if values["result"] else None
+        return Job(**values)
+
+
+class JobQueue:
+    """
+    Safe to share across threads and processes - every call uses its own connection.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        with closing(self.connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        # autocommit - transactions are explicit BEGIN IMMEDIATE where they matter
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # -------------------------- producers -------------------------- #
+
+    def submit(
+        self, prompt: str, executor: str = "AssistantAPI", priority: int = PRIORITY_NORMAL
+    ) -> Tuple[str, bool]:
+        """
+        Returns (job_id, deduplicated). A duplicate of an in flight job gets that job's id -
+        and bumps its priority if the new submission is more urgent.
+        """
+        dedupe_key = make_dedupe_key(prompt, executor)
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = conn.execute(
+                "SELECT id, priority FROM jobs WHERE dedupe_key = ? AND status IN (?, ?)",
+                (dedupe_key, *IN_FLIGHT),
+            ).fetchone()
+            if existing:
+                if priority > existing["priority"]:
+                    conn.execute(
+                        "UPDATE jobs SET priority = ? WHERE id = ?", (priority, existing["id"])
+                    )
+                conn.execute("COMMIT")
+                print(f"📬 Job {existing['id']} already in flight for this prompt")
+                return existing["id"], True
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, prompt, executor, priority, dedupe_key, status, stage, stages, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    prompt,
+                    executor,
+                    priority,
+                    dedupe_key,
+                    QUEUED,
+                    QUEUED,
+                    json.dumps([{"stage": QUEUED, "at": time.time()}]),
+                    time.time(),
+                ),
+            )
+            conn.execute("COMMIT")
+            print(f"📬 Job {job_id} queued (priority {priority})")
+            return job_id, False
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # -------------------------- consumers -------------------------- #
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """
+        Take the most urgent queued job, or None when the queue is empty
+        """
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, worker_host = ?, worker_pid = ?, attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (RUNNING, worker, socket.gethostname(), os.getpid(), now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        self.set_stage(row["id"], RUNNING)
+        return self.get(row["id"])
+
+    def set_stage(self, job_id: str, stage: str, session_id: Optional[str] = None):
+        with closing(self.connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, stages = json_insert(stages, '$[#]', json(?)), session_id = COALESCE(?, session_id) WHERE id = ?",
+                (stage, json.dumps({"stage": stage, "at": time.time()}), session_id, job_id),
+            )
+
+    def complete(self, job_id: str, result: Optional[dict]):
+        self._finish(job_id, SUCCEEDED, json.dumps(result, default=str), "")
+
+    def fail(self, job_id: str, error_message: str):
+        self._finish(job_id, FAILED, None, error_message)
+
+    def _finish(self, job_id: str, status: str, result: Optional[str], error_message: str):
+        # one statement - a reader never sees the final stage without the status and result
+        now = time.time()
+        with closing(self.connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, stages = json_insert(stages, '$[#]', json(?)), result = ?, error_message = ?, finished_at = ? WHERE id = ?",
+                (status, status, json.dumps({"stage": status, "at": now}), result, error_message, now, job_id),
+            )
+
+    def requeue_running(self, max_attempts: int = MAX_JOB_ATTEMPTS) -> int:
+        """
+        Put jobs left running by dead worker processes on this host back in the queue - call before
+        starting workers. Jobs of live workers (other processes) are left alone, and a job that already
+        took down max_attempts workers is failed instead.
+        """
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, worker_pid, attempts FROM jobs WHERE status = ? AND worker_host = ?",
+                (RUNNING, socket.gethostname()),
+            ).fetchall()
+
+            now = time.time()
+            requeued = 0
+            for row in rows:
+                if is_alive(row["worker_pid"]):
+                    continue
+                if row["attempts"] >= max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, stage = ?, stages = json_insert(stages, '$[#]', json(?)), error_message = ?, finished_at = ? WHERE id = ?",
+                        (
+                            FAILED,
+                            FAILED,
+                            json.dumps({"stage": FAILED, "at": now}),
+                            f"Worker died on each of {row['attempts']} attempts",
+                            now,
+                            row["id"],
+                        ),
+                    )
+                    print(f"📬 Job {row['id']} failed after {row['attempts']} attempts")
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, stages = json_insert(stages, '$[#]', json(?)), worker = '', worker_pid = NULL WHERE id = ?",
+                    (QUEUED, QUEUED, json.dumps({"stage": QUEUED, "at": now}), row["id"]),
+                )
+                requeued += 1
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        if requeued:
+            print(f"📬 Requeued {requeued} interrupted jobs")
+        return requeued
+
+    # -------------------------- readers -------------------------- #
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with closing(self.connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 20) -> List[Job]:
+        with closing(self.connect()) as conn:
+            if status:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?",
+                    (status, limit),
+                )
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+                )
+            return [Job.from_row(row) for row in rows]
+
+    def queue_depth(self) -> int:
+        with closing(self.connect()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+
+    def watch(
+        self, job_id: str, poll_interval: float = 0.5, timeout: Optional[float] = None
+    ) -> Iterator[Job]:
+        """
+        Yield the job every time its stage changes, ending with the finished job
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        seen_stages = -1
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                raise KeyError(f"No job {job_id}")
+            if job.done:
+                # always end on the finished job, even when its stage count was already seen
+                yield job
+                return
+            if len(job.stages) != seen_stages:
+                seen_stages = len(job.stages)
+                yield job
+            if deadline and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} still {job.stage} after {timeout}s")
+            time.sleep(poll_interval)
+
+    def wait(
+        self, job_id: str, poll_interval: float = 0.5, timeout: Optional[float] = None
+    ) -> Job:
+        job = None
+        for job in self.watch(job_id, poll_interval, timeout):
+            pass
+        return job
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> JobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,151 @@
+"""
+Purpose:
+    Memory policies for the Orchestrator - decide which part of an agent's history is sent with each generate_reply.
+
+    Autogen agents keep every message they've received, so in long round robin conversations every call carries
+    the whole transcript. A policy trims what's *sent* - the agent's stored history is left untouched.
+
+    - SlidingWindowMemory: the task plus the last N messages
+    - TokenBudgetMemory: the task plus as many recent messages as fit in a token budget
+    - SummarizingMemory: the task, an LLM summary of older turns and the last N messages verbatim
+"""
+
+import hashlib
+from typing import Dict, List, Optional
+
+from postgres_da_ai_agent.modules import llm
+
+
+def message_text(message: dict) -> str:
+    content = message.get("content") or message.get("function_call") or ""
+    return str(content)
+
+
+def count_message_tokens(messages: List[dict]) -> int:
+    return sum(llm.count_tokens(message_text(message)) for message in messages)
+
+
+def drop_orphaned_function_results(messages: List[dict]) -> List[dict]:
+    """
+    A window can start right after a function call - its result alone confuses the model
+    """
+    start = 0
+    while start < len(messages) and messages[start].get("role") in ("function", "tool"):
+        start += 1
+    return messages[start:]
+
+
+class MemoryPolicy:
+    """
+    Base policy - sends the full history
+    """
+
+    def apply(self, messages: List[dict]) -> List[dict]:
+        return messages
+
+
+class SlidingWindowMemory(MemoryPolicy):
+    def __init__(self, max_messages: int = 6):
+        self.max_messages = max_messages
+
+    def apply(self, messages: List[dict]) -> List[dict]:
+        if len(messages) <= self.max_messages + 1:
+            return messages
+        # the first message is the task - always keep it
+        return messages[:1] + drop_orphaned_function_results(
+            messages[-self.max_messages :]
+        )
+
+
+class TokenBudgetMemory(MemoryPolicy):
+    def __init__(self, max_tokens: int = 3_000):
+        self.max_tokens = max_tokens
+
+    def apply(self, messages: List[dict]) -> List[dict]:
+        if len(messages) <= 2:
+            return messages
+
+        budget = self.max_tokens - count_message_tokens(messages[:1])
+
+        kept = []
+        for message in reversed(messages[1:]):
+            tokens = llm.count_tokens(message_text(message))
+            # always keep the latest message, even if it alone is over budget
+            if kept and tokens > budget:
+                break
+            kept.append(message)
+            budget -= tokens
+
+        kept.reverse()
+        if len(kept) == len(messages) - 1:
+            return messages
+        return messages[:1] + drop_orphaned_function_results(kept)
+
+
+class SummarizingMemory(MemoryPolicy):
+    """
+    Older turns are summarized in blocks of `summarize_every` messages so the summary is only
+    regenerated every few turns, not on every call.
+    """
+
+    def __init__(
+        self,
+        keep_last: int = 4,
+        summarize_every: int = 4,
+        model: str = "gpt-3.5-turbo-1106",
+    ):
+        self.keep_last = keep_last
+        self.summarize_every = summarize_every
+        self.model = model
+        self.map_hash_to_summary: Dict[str, str] = {}
+
+    def summarize(self, messages: List[dict]) -> str:
+        transcript = "\n\n".join(
+            f"{message.get('name') or message.get('role')}: {message_text(message)}"
+            for message in messages
+        )
+        key = hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+
+        if key not in self.map_hash_to_summary:
+            print(f"🧠 Summarizing {len(messages)} earlier messages")
+            self.map_hash_to_summary[key] = llm.prompt(
+                transcript,
+                model=self.model,
+                instructions="Summarize this multi-agent conversation concisely. Keep every decision, SQL query, table and column name.",
+            )
+        return self.map_hash_to_summary[key]
+
+    def apply(self, messages: List[dict]) -> List[dict]:
+        older = messages[1 : -self.keep_last] if self.keep_last else messages[1:]
+        summarized_count = (len(older) // self.summarize_every) * self.summarize_every
+        if summarized_count == 0:
+            return messages
+
+        summary = self.summarize(older[:summarized_count])
+        rest = messages[1 + summarized_count :]
+
+        return (
+            messages[:1]
+            + [
+                {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation: {summary}",
+                }
+            ]
+            + drop_orphaned_function_results(rest)
+        )
+
+
+def build_memory_policy(name: Optional[str]) -> Optional[MemoryPolicy]:
+    """
+    'window', 'tokens' or 'summary' - anything else keeps the full history
+    """
+    match name:
+        case "window":
+            return SlidingWindowMemory()
+        case "tokens":
+            return TokenBudgetMemory()
+        case "summary":
+            return SummarizingMemory()
+        case _:
+            return None
@@ -0,0 +1,110 @@
+"""
+Purpose:
+    SQL results on disk as newline delimited JSON - one row per line - plus a small index file,
+    so readers can jump to any page without parsing (or holding) the whole result.
+
+    run_sql_results.ndjson        {"id": 1, ...}\n{"id": 2, ...}\n...
+    run_sql_results.index.json    {"row_count": 2, "columns": ["id", ...], "chunk_rows": 1000, "offsets": [0, ...]}
+
+    offsets[i] is the byte offset of row i * chunk_rows, so a page read seeks to its chunk
+    and skips at most chunk_rows - 1 lines.
+
+    reader = NdjsonResultReader("agent_results/<session>/run_sql_results.ndjson")
+    reader.row_count
+    reader.read_rows(offset=200, limit=100)
+"""
+
+from itertools import islice
+import json
+import os
+from typing import Iterable, Iterator, List, Optional
+
+from postgres_da_ai_agent.modules import pg_json
+
+NDJSON_CHUNK_ROWS = int(os.environ.get("NDJSON_CHUNK_ROWS", "1000"))
+
+
+def index_path_for(path: str) -> str:
+    """
+    run_sql_results.ndjson -> run_sql_results.index.json
+    """
+    root, _ = os.path.splitext(path)
+    return root + ".index.json"
+
+
+def write_ndjson_results(
+    path: str, rows: Iterable[dict], chunk_rows: int = NDJSON_CHUNK_ROWS
+) -> dict:
+    """
+    Stream rows to path and write the index next to it. Returns the index.
+    Rows can be any iterable, so nothing has to be held in memory.
+    """
+    offsets = []
+    columns: List[str] = []
+    row_count = 0
+    position = 0
+
+    with open(path, "wb") as f:
+        for row in rows:
+            if row_count % chunk_rows == 0:
+                offsets.append(position)
+            if not columns:
+                columns = list(row.keys())
+            line = pg_json.dumps(row).encode("utf-8") + b"\n"
+            f.write(line)
+            position += len(line)
+            row_count += 1
+
+    index = {
+        "row_count": row_count,
+        "columns": columns,
+        "chunk_rows": chunk_rows,
+        "offsets": offsets,
+    }
+    with open(index_path_for(path), "w") as f:
+        json.dump(index, f)
+
+    return index
+
+
+class NdjsonResultReader:
+    """
+    Reads rows back a page at a time - memory use is one page, not the whole result
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(index_path_for(path), "r") as f:
+            index = json.load(f)
+
+        self.row_count: int = index["row_count"]
+        self.columns: List[str] = index["columns"]
+        self.chunk_rows: int = index["chunk_rows"]
+        self.offsets: List[int] = index["offsets"]
+
+    def iter_rows(self, offset: int = 0) -> Iterator[dict]:
+        if offset >= self.row_count:
+            return
+
+        chunk = offset // self.chunk_rows
+        skip = offset - chunk * self.chunk_rows
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offsets[chunk])
+            for line in islice(f, skip, None):
+                yield json.loads(line)
+
+    def read_rows(self, offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+        rows = self.iter_rows(offset)
+        if limit is not None:
+            rows = islice(rows, limit)
+        return list(rows)
+
+    def page(self, page_number: int, page_size: int) -> List[dict]:
+        """
+        0 based page_number
+        """
+        return self.read_rows(page_number * page_size, page_size)
+
+    def page_count(self, page_size: int) -> int:
+        return max(1, -(-self.row_count // page_size))
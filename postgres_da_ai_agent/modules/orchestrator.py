@@ -1,11 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
 import dataclasses
-import json
+import os
+import time
 from typing import List, Optional, Tuple
 import autogen
 from postgres_da_ai_agent.agents.instruments import AgentInstruments
 from postgres_da_ai_agent.modules import llm
+from postgres_da_ai_agent.modules import memory
+from postgres_da_ai_agent.modules.termination import TerminationPolicy
+from postgres_da_ai_agent.modules.chat_log import ChatLogWriter
 from postgres_da_ai_agent.types import Chat, ConversationResult
 
+BROADCAST_MAX_WORKERS = int(os.environ.get("BROADCAST_MAX_WORKERS", "4"))
+
+
+def message_as_str(message) -> str:
+    """
+    The text of a raw message: content or function_call for dicts, str() for everything else
+    """
+    if message is None:
+        return ""
+
+    if isinstance(message, dict):
+        content_from_dict = message.get("content", None)
+        func_call_from_dict = message.get("function_call", None)
+        content = content_from_dict or func_call_from_dict
+        if not content:
+            return ""
+        return str(content)
+
+    return str(message)
+
 
 class Orchestrator:
     """
@@ -18,6 +43,8 @@ class Orchestrator:
         agents: List[autogen.ConversableAgent],
         instruments: AgentInstruments,
         validate_results_func: callable = None,
+        memory_policy: Optional[memory.MemoryPolicy] = None,
+        termination_policy: Optional[TerminationPolicy] = None,
     ):
         # Name of agent team
         self.name = name
@@ -34,9 +61,28 @@ class Orchestrator:
         # List of chats - {from, to, message}
         self.chats: List[Chat] = []
 
+        # Append-only transcript of self.messages as text, kept in step by add_message
+        self.transcript: List[str] = []
+
+        # Running token count of the transcript
+        self.transcript_tokens = 0
+
+        # Append-only JSON Lines log of self.chats - opened on the first spy_on_agents()
+        self.chat_log: Optional[ChatLogWriter] = None
+        self.chats_logged = 0
+
         # Function to validate results at the end of every conversation
         self.validate_results_func: callable = validate_results_func
 
+        # Decides which part of an agent's history is sent with each reply - None sends everything
+        self.memory_policy = memory_policy
+
+        # Tokens sent with each generate_reply, in order
+        self.turn_tokens: List[int] = []
+
+        # Checked after every step - None always runs the full conversation
+        self.termination_policy = termination_policy
+
         if len(self.agents) < 2:
             raise Exception("Orchestrator needs at least two agents")
 
@@ -84,6 +130,19 @@ class Orchestrator:
             return self.validate_results_func()
         return True, ""
 
+    def should_terminate(self) -> bool:
+        """
+        True once the termination policy says the team's work is done
+        """
+        if self.termination_policy is None:
+            return False
+        return self.termination_policy.should_stop(self.validate_results_func)
+
+    def report_early_termination(self, skipped_turns: int):
+        print(
+            f"🏁 {self.name} finished early - skipped {skipped_turns} remaining agent turns"
+        )
+
     def send_message(
         self,
         from_agent: autogen.ConversableAgent,
@@ -107,35 +166,44 @@ class Orchestrator:
 
     def add_message(self, message: str):
         """
-        Add a message to the orchestrator
+        Add a message to the orchestrator and extend the transcript
         """
         self.messages.append(message)
 
+        text = message_as_str(message)
+        if text:
+            self.transcript.append(text)
+            self.transcript_tokens += llm.count_tokens(text)
+
     def get_message_as_str(self):
         """
         Get all messages as a string
         """
+        return "".join(self.transcript)
 
-        messages_as_str = ""
-
-        for message in self.messages:
-            if message is None:
-                continue
+    def get_cost_and_tokens(self):
+        """
+        Cost and tokens of the whole conversation from the running count - no re-tokenizing.
+        Tokens are counted per message so the total can differ from tokenizing the joined string by a few tokens.
+        """
+        return llm.estimate_price(self.transcript_tokens), self.transcript_tokens
 
-            if isinstance(message, dict):
-                content_from_dict = message.get("content", None)
-                func_call_from_dict = message.get("function_call", None)
-                content = content_from_dict or func_call_from_dict
-                if not content:
-                    continue
-                messages_as_str += str(content)
-            else:
-                messages_as_str += str(message)
+    def generate_reply(
+        self, agent: autogen.ConversableAgent, sender: autogen.ConversableAgent
+    ):
+        """
+        agent.generate_reply with the memory policy applied to the history it's sent. Logs tokens per turn.
+        """
+        history = agent.chat_messages.get(sender, [])
+        messages = self.memory_policy.apply(history) if self.memory_policy else history
 
-        return messages_as_str
+        tokens = memory.count_message_tokens(messages)
+        self.turn_tokens.append(tokens)
+        print(
+            f"🧮 Turn {len(self.turn_tokens)} ({sender.name} -> {agent.name}): {tokens} tokens, {len(messages)}/{len(history)} messages"
+        )
 
-    def get_cost_and_tokens(self):
-        return llm.estimate_price_and_tokens(self.get_message_as_str())
+        return agent.generate_reply(messages=messages, sender=sender)
 
     def has_functions(self, agent: autogen.ConversableAgent):
         return len(agent._function_map) > 0
@@ -150,7 +218,7 @@ class Orchestrator:
 
         self.send_message(agent_a, agent_b, message)
 
-        reply = agent_b.generate_reply(sender=agent_a)
+        reply = self.generate_reply(agent_b, agent_a)
 
         self.add_message(reply)
 
@@ -166,7 +234,7 @@ class Orchestrator:
 
         self.send_message(agent_a, agent_b, message)
 
-        reply = agent_b.generate_reply(sender=agent_a)
+        reply = self.generate_reply(agent_b, agent_a)
 
         self.send_message(agent_b, agent_b, message)
 
@@ -191,7 +259,7 @@ class Orchestrator:
 
         self.send_message(agent, agent, message)
 
-        reply = agent.generate_reply(sender=agent)
+        reply = self.generate_reply(agent, agent)
 
         self.send_message(agent, agent, message)
 
@@ -200,15 +268,29 @@ class Orchestrator:
         print(f"self_function_chat(): replied with:", reply)
 
     def spy_on_agents(self, append_to_file: bool = True):
-        conversations = []
+        """
+        Append the chats since the last call to the team's chat log - written in the background
+        """
+        if not append_to_file:
+            return
 
-        for chat in self.chats:
-            conversations.append(dataclasses.asdict(chat))
+        if self.chat_log is None:
+            self.chat_log = ChatLogWriter(
+                self.instruments.make_agent_chat_file(self.name),
+                truncate=self.chats_logged == 0,
+            )
 
-        if append_to_file:
-            file_name = self.instruments.make_agent_chat_file(self.name)
-            with open(file_name, "w") as f:
-                f.write(json.dumps(conversations, indent=4))
+        for chat in self.chats[self.chats_logged :]:
+            self.chat_log.append(dataclasses.asdict(chat))
+        self.chats_logged = len(self.chats)
+
+    def close_chat_log(self):
+        """
+        Final flush of the chat log once a conversation is complete
+        """
+        if self.chat_log is not None:
+            self.chat_log.close()
+            self.chat_log = None
 
     def sequential_conversation(self, prompt: str) -> ConversationResult:
         """
@@ -222,49 +304,65 @@ class Orchestrator:
 
         print(f"\n\n--------- {self.name} Orchestrator Starting ---------\n\n")
 
-        self.add_message(prompt)
+        start = time.time()
 
-        for idx, agent in enumerate(self.agents):
-            agent_a = self.agents[idx]
-            agent_b = self.agents[idx + 1]
+        try:
+            self.add_message(prompt)
 
-            print(
-                f"\n\n--------- Running iteration {idx} with (agent_a: {agent_a.name}, agent_b: {agent_b.name}) ---------\n\n"
-            )
+            skipped_turns = 0
 
-            # agent_a -> chat -> agent_b
-            if self.last_message_is_string:
-                self.basic_chat(agent_a, agent_b, self.latest_message)
+            for idx in range(self.total_agents - 1):
+                agent_a = self.agents[idx]
+                agent_b = self.agents[idx + 1]
 
-            # agent_a -> func() -> agent_b
-            if self.last_message_is_func_call and self.has_functions(agent_a):
-                self.function_chat(agent_a, agent_b, self.latest_message)
+                print(
+                    f"\n\n--------- Running iteration {idx} with (agent_a: {agent_a.name}, agent_b: {agent_b.name}) ---------\n\n"
+                )
 
-            self.spy_on_agents()
+                # agent_a -> chat -> agent_b
+                if self.last_message_is_string:
+                    self.basic_chat(agent_a, agent_b, self.latest_message)
 
-            if idx == self.total_agents - 2:
-                if self.has_functions(agent_b):
-                    # agent_b -> func() -> agent_b
-                    self.self_function_chat(agent_b, self.latest_message)
+                # agent_a -> func() -> agent_b
+                if self.last_message_is_func_call and self.has_functions(agent_a):
+                    self.function_chat(agent_a, agent_b, self.latest_message)
 
-                print(f"-------- Orchestrator Complete --------\n\n")
+                self.spy_on_agents()
 
-                was_successful, error_message = self.handle_validate_func()
+                if idx == self.total_agents - 2:
+                    if self.has_functions(agent_b):
+                        # agent_b -> func() -> agent_b
+                        self.self_function_chat(agent_b, self.latest_message)
+                elif self.should_terminate():
+                    skipped_turns = self.total_agents - 2 - idx
+                    self.report_early_termination(skipped_turns)
+                    break
 
-                self.spy_on_agents()
+            print(f"-------- Orchestrator Complete --------\n\n")
 
-                cost, tokens = self.get_cost_and_tokens()
+            was_successful, error_message = self.handle_validate_func()
 
-                return ConversationResult(
-                    success=was_successful,
-                    messages=self.messages,
-                    cost=cost,
-                    tokens=tokens,
-                    last_message_str=self.last_message_always_string,
-                    error_message=error_message,
-                )
+            self.spy_on_agents()
+        finally:
+            # runs when an agent reply raises too - the buffered tail is written and the writer thread stopped
+            self.close_chat_log()
+
+        cost, tokens = self.get_cost_and_tokens()
+
+        return ConversationResult(
+            success=was_successful,
+            messages=self.messages,
+            cost=cost,
+            tokens=tokens,
+            last_message_str=self.last_message_always_string,
+            error_message=error_message,
+            latency=time.time() - start,
+            skipped_turns=skipped_turns,
+        )
 
-    def broadcast_conversation(self, prompt: str) -> ConversationResult:
+    def broadcast_conversation(
+        self, prompt: str, concurrent: bool = False, max_workers: int = BROADCAST_MAX_WORKERS
+    ) -> ConversationResult:
         """
         Broadcast a message from agent_a to all agents.
 
@@ -273,30 +371,50 @@ class Orchestrator:
             "Agent A" -> "Agent C"
             "Agent A" -> "Agent D"
             "Agent A" -> "Agent E"
+
+        The replies are independent, so with concurrent=True every exchange runs at once on a bounded pool
+        and the conversation takes as long as the slowest agent. Messages and chats are merged in agent order.
         """
 
         print(f"\n\n--------- {self.name} Orchestrator Starting ---------\n\n")
 
-        self.add_message(prompt)
+        start = time.time()
 
-        broadcast_agent = self.agents[0]
+        try:
+            self.add_message(prompt)
 
-        for idx, agent_iterate in enumerate(self.agents[1:]):
-            print(
-                f"\n\n--------- Running iteration {idx} with (agent_broadcast: {broadcast_agent.name}, agent_iteration: {agent_iterate.name}) ---------\n\n"
-            )
+            broadcast_agent = self.agents[0]
 
-            # agent_a -> chat -> agent_b
-            if self.last_message_is_string:
-                self.memory_chat(broadcast_agent, agent_iterate, prompt)
+            skipped_turns = 0
 
-            # agent_b -> func() -> agent_b
-            if self.last_message_is_func_call and self.has_functions(agent_iterate):
-                self.function_chat(agent_iterate, agent_iterate, self.latest_message)
+            if concurrent:
+                self._concurrent_broadcast(broadcast_agent, prompt, max_workers)
+            else:
+                for idx, agent_iterate in enumerate(self.agents[1:]):
+                    print(
+                        f"\n\n--------- Running iteration {idx} with (agent_broadcast: {broadcast_agent.name}, agent_iteration: {agent_iterate.name}) ---------\n\n"
+                    )
 
-            self.spy_on_agents()
+                    # agent_a -> chat -> agent_b
+                    if self.last_message_is_string:
+                        self.memory_chat(broadcast_agent, agent_iterate, prompt)
+
+                    # agent_b -> func() -> agent_b
+                    if self.last_message_is_func_call and self.has_functions(agent_iterate):
+                        self.function_chat(agent_iterate, agent_iterate, self.latest_message)
+
+                    self.spy_on_agents()
 
-        print(f"-------- Orchestrator Complete --------\n\n")
+                    remaining = len(self.agents) - 2 - idx
+                    if remaining and self.should_terminate():
+                        skipped_turns = remaining
+                        self.report_early_termination(skipped_turns)
+                        break
+
+            print(f"-------- Orchestrator Complete --------\n\n")
+        finally:
+            # runs when an agent reply raises too - the buffered tail is written and the writer thread stopped
+            self.close_chat_log()
 
         was_successful, error_message = self.handle_validate_func()
 
@@ -314,7 +432,62 @@ class Orchestrator:
             tokens=tokens,
             last_message_str=self.last_message_always_string,
             error_message=error_message,
+            latency=time.time() - start,
+            skipped_turns=skipped_turns,
+        )
+
+    def _broadcast_exchange(
+        self, broadcast_agent: autogen.ConversableAgent, agent_iterate: autogen.ConversableAgent, prompt: str
+    ) -> "Orchestrator":
+        """
+        One broadcast exchange recorded on its own two agent orchestrator so concurrent exchanges don't share state
+        """
+        branch = Orchestrator(
+            name=f"{self.name}:{agent_iterate.name}",
+            agents=[broadcast_agent, agent_iterate],
+            instruments=self.instruments,
+            memory_policy=self.memory_policy,
         )
+        branch.add_message(prompt)
+
+        start = time.time()
+
+        branch.memory_chat(broadcast_agent, agent_iterate, prompt)
+
+        if branch.last_message_is_func_call and branch.has_functions(agent_iterate):
+            branch.function_chat(agent_iterate, agent_iterate, branch.latest_message)
+
+        print(f"broadcast: {agent_iterate.name} replied in {time.time() - start:.2f}s")
+
+        return branch
+
+    def _concurrent_broadcast(
+        self, broadcast_agent: autogen.ConversableAgent, prompt: str, max_workers: int
+    ):
+        agents = self.agents[1:]
+
+        print(
+            f"\n\n--------- Broadcasting from {broadcast_agent.name} to {len(agents)} agents at once ---------\n\n"
+        )
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(agents))), thread_name_prefix="broadcast"
+        ) as pool:
+            futures = [
+                pool.submit(self._broadcast_exchange, broadcast_agent, agent_iterate, prompt)
+                for agent_iterate in agents
+            ]
+
+        # merge in agent order, not completion order
+        for future in futures:
+            branch = future.result()
+            self.chats.extend(branch.chats)
+            self.turn_tokens.extend(branch.turn_tokens)
+            # the branch's first message is the prompt - already added
+            for message in branch.messages[1:]:
+                self.add_message(message)
+
+        self.spy_on_agents()
 
     def round_robin_conversation(
         self, prompt: str, loops: int = 1
@@ -342,35 +515,51 @@ class Orchestrator:
             f"\n\n🚀 --------- {self.name} ::: Orchestrator Starting ::: Round Robin Conversation ---------\n\n"
         )
 
-        self.add_message(prompt)
+        start = time.time()
 
-        total_iterations = loops * len(self.agents)
-        for iteration in range(total_iterations):
-            idx = iteration % len(self.agents)
-            agent_a = self.agents[idx]
-            agent_b = self.agents[(idx + 1) % len(self.agents)]
+        try:
+            self.add_message(prompt)
 
-            print(
-                f"\n\n💬 --------- Running iteration {iteration} with conversation ({agent_a.name} -> {agent_b.name}) ---------\n\n",
-            )
+            skipped_turns = 0
 
-            # if we're back at the first agent, we need to reset the last message to the prompt
-            if iteration % (len(self.agents)) == 0:
-                self.add_message(prompt)
+            total_iterations = loops * len(self.agents)
+            for iteration in range(total_iterations):
+                idx = iteration % len(self.agents)
+                agent_a = self.agents[idx]
+                agent_b = self.agents[(idx + 1) % len(self.agents)]
 
-            # agent_a -> chat -> agent_b
-            if self.last_message_is_string:
-                self.basic_chat(agent_a, agent_b, self.latest_message)
+                print(
+                    f"\n\n💬 --------- Running iteration {iteration} with conversation ({agent_a.name} -> {agent_b.name}) ---------\n\n",
+                )
 
-            # agent_a -> func() -> agent_b
-            if self.last_message_is_func_call and self.has_functions(agent_a):
-                self.function_chat(agent_a, agent_b, self.latest_message)
+                # if we're back at the first agent, we need to reset the last message to the prompt
+                if iteration % (len(self.agents)) == 0:
+                    self.add_message(prompt)
 
-            self.spy_on_agents()
+                # agent_a -> chat -> agent_b
+                if self.last_message_is_string:
+                    self.basic_chat(agent_a, agent_b, self.latest_message)
 
-        print(f"-------- Orchestrator Complete --------\n\n")
+                # agent_a -> func() -> agent_b
+                if self.last_message_is_func_call and self.has_functions(agent_a):
+                    self.function_chat(agent_a, agent_b, self.latest_message)
 
-        self.spy_on_agents()
+                self.spy_on_agents()
+
+                remaining = total_iterations - iteration - 1
+                if remaining and self.should_terminate():
+                    skipped_turns = remaining
+                    self.report_early_termination(skipped_turns)
+                    break
+
+            print(f"-------- Orchestrator Complete --------\n\n")
+
+            print(f"🧮 Tokens per turn: {self.turn_tokens}")
+
+            self.spy_on_agents()
+        finally:
+            # runs when an agent reply raises too - the buffered tail is written and the writer thread stopped
+            self.close_chat_log()
 
         agents_were_successful, error_message = self.handle_validate_func()
 
@@ -383,6 +572,8 @@ class Orchestrator:
             tokens=tokens,
             last_message_str=self.last_message_always_string,
             error_message=error_message,
+            latency=time.time() - start,
+            skipped_turns=skipped_turns,
         )
 
         return conversation_result
@@ -1,4 +1,5 @@
 from datetime import datetime
+import re
 import uuid
 
 
@@ -8,7 +9,9 @@ def generate_session_id(raw_prompt: str):
 
     ->
 
-    "get_jobs_with_Completed_or_Started_status__12_22_22"
+    "get_jobs_with_completed_or_start__12_22_22__3f9c2a1b"
+
+    The random suffix keeps ids unique when the same prompt runs concurrently (or twice in one second).
     """
 
     now = datetime.now()
@@ -21,6 +24,8 @@ def generate_session_id(raw_prompt: str):
     lower_case = raw_prompt.lower()
     no_spaces = lower_case.replace(" ", "_")
     no_quotes = no_spaces.replace("'", "")
-    shorter = no_quotes[:30]
-    with_uuid = shorter + "__" + short_time_mm_ss
+    # the id is a directory name - drop path separators and anything else odd
+    safe = re.sub(r"[^a-z0-9_\-]", "", no_quotes)
+    shorter = safe[:30]
+    with_uuid = shorter + "__" + short_time_mm_ss + "__" + uuid.uuid4().hex[:8]
     return with_uuid
@@ -0,0 +1,254 @@
+"""
+Purpose:
+    Session scoped store for what the agents produce - the SQL, its result rows and innovations -
+    kept as python objects so nothing is written and re-parsed on the hot path.
+
+    - results larger than RESULT_STORE_SPILL_ROWS rows are streamed to disk (chunked NDJSON, see
+      modules/ndjson_results.py) as they're fetched instead of held in memory, and read back a page at a time
+    - the classic files (run_sql_results.ndjson, sql_query.sql, {i}_innovation_file.json) are still
+      written for browsing, but in the background - set EXPORT_RESULT_FILES=0 to skip them
+    - each result in a session gets its own file (run_sql_results.ndjson, run_sql_results_2.ndjson, ...)
+      so a slow export can't overwrite a newer result
+"""
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+import json
+import os
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from postgres_da_ai_agent.modules import tool_calls
+from postgres_da_ai_agent.modules.ndjson_results import NdjsonResultReader, write_ndjson_results
+from postgres_da_ai_agent.types import Innovation
+
+RESULT_STORE_SPILL_ROWS = int(os.environ.get("RESULT_STORE_SPILL_ROWS", "50000"))
+EXPORT_RESULT_FILES = os.environ.get("EXPORT_RESULT_FILES", "1") != "0"
+# rows handed back in ConversationResult.result when the full result was spilled to disk
+RESULT_PREVIEW_ROWS = int(os.environ.get("RESULT_PREVIEW_ROWS", "1000"))
+
+RUN_SQL_RESULTS_FILE = "run_sql_results.ndjson"
+SQL_QUERY_FILE = "sql_query.sql"
+
+
+def results_file_name(version: int) -> str:
+    """
+    run_sql_results.ndjson for a session's first result, run_sql_results_2.ndjson for the next...
+    """
+    if version <= 1:
+        return RUN_SQL_RESULTS_FILE
+    root, ext = os.path.splitext(RUN_SQL_RESULTS_FILE)
+    return f"{root}_{version}{ext}"
+
+
+def innovation_file_name(index: int) -> str:
+    return f"{index}_innovation_file.json"
+
+
+def drain(buffered: deque, rest: Iterator[dict]) -> Iterator[dict]:
+    """
+    The buffered rows then the rest - buffered rows are released as they're written
+    """
+    while buffered:
+        yield buffered.popleft()
+    yield from rest
+
+
+class SessionResultStore:
+    """
+    Thread safe - tool functions can run concurrently.
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        export_files: bool = EXPORT_RESULT_FILES,
+        spill_rows: int = RESULT_STORE_SPILL_ROWS,
+    ):
+        self.root_dir = root_dir
+        self.export_files = export_files
+        self.spill_rows = spill_rows
+        self.lock = threading.Lock()
+
+        self.sql: Optional[str] = None
+        self.results: Optional[list] = None
+        self.preview: Optional[list] = None  # first rows of a spilled result
+        self.row_count = 0
+        self.spilled_results_path: Optional[str] = None
+        self.innovations: List[List[Innovation]] = []
+
+        self._exporter: Optional[ThreadPoolExecutor] = None
+        self._exports: List[Future] = []
+        self._result_version = 0
+        self._applied_order: Optional[Tuple[int, int]] = None
+        self._results_path = ""
+        self._results_export: Optional[Future] = None
+
+    # -------------------------- SQL results -------------------------- #
+
+    def set_sql_result(self, sql: str, rows: Iterable[dict], order: Optional[Tuple[int, int]] = None):
+        """
+        rows can be a generator (e.g. PostgresManager.iter_sql_rows) - it's consumed here.
+        Up to spill_rows rows are buffered, past that everything goes to disk as it streams in
+        and only the first RESULT_PREVIEW_ROWS rows stay in memory.
+
+        order decides which result is kept when several are set at once (parallel run_sql calls of
+        one step) - the highest wins, like the last call in the model's order did when they ran one by one.
+        """
+        order = order or tool_calls.next_order()
+        # every result gets its own file, so a queued export never overwrites a newer result
+        with self.lock:
+            self._result_version += 1
+            version = self._result_version
+        results_path = os.path.join(self.root_dir, results_file_name(version))
+
+        rows = iter(rows)
+        buffered = deque(islice(rows, self.spill_rows + 1))
+
+        spilled_path = None
+        preview = None
+        row_count = len(buffered)
+        if row_count > self.spill_rows:
+            preview = list(islice(buffered, RESULT_PREVIEW_ROWS))
+            os.makedirs(self.root_dir, exist_ok=True)
+            row_count = write_ndjson_results(results_path, drain(buffered, rows))["row_count"]
+            spilled_path = results_path
+            print(f"result_store: spilled {row_count} rows to {spilled_path}")
+        else:
+            buffered = list(buffered)
+
+        results_export = None
+        if not spilled_path:
+            results_export = self.export_with(self._write_rows, results_path, buffered)
+
+        with self.lock:
+            if self._applied_order and order < self._applied_order:
+                # a result that comes later in the model's order already landed
+                return
+            self._applied_order = order
+            self.sql = sql
+            self.results = None if spilled_path else buffered
+            self.preview = preview
+            self.row_count = row_count
+            self.spilled_results_path = spilled_path
+            self._results_path = results_path
+            self._results_export = results_export
+
+        self.export(SQL_QUERY_FILE, lambda: sql)
+
+    @property
+    def has_results(self) -> bool:
+        with self.lock:
+            return self.sql is not None
+
+    @property
+    def result_path(self) -> str:
+        """
+        Where the results can be read from outside the process - "" when only held in memory.
+        Doesn't wait for a pending export (this is read on the hot path): a spilled result's file is
+        already complete, an exported one is once close() has waited for the exports.
+        In process readers page from memory with read_rows instead.
+        """
+        with self.lock:
+            spilled_path, results_path, results_export = (
+                self.spilled_results_path,
+                self._results_path,
+                self._results_export,
+            )
+        if spilled_path:
+            return spilled_path
+        if results_export is None:
+            return ""
+        if results_export.done() and results_export.exception() is not None:
+            # already reported by wait_for_exports
+            return ""
+        return results_path
+
+    @property
+    def is_spilled(self) -> bool:
+        with self.lock:
+            return self.spilled_results_path is not None
+
+    def get_results(self) -> Optional[list]:
+        """
+        Every row - for spilled results prefer read_rows
+        """
+        return self.read_rows()
+
+    def read_rows(self, offset: int = 0, limit: Optional[int] = None) -> Optional[list]:
+        with self.lock:
+            results, spilled_path, preview = self.results, self.spilled_results_path, self.preview
+        if spilled_path and limit is not None and offset + limit <= len(preview):
+            return preview[offset : offset + limit]
+        if spilled_path:
+            return NdjsonResultReader(spilled_path).read_rows(offset, limit)
+        if results is None:
+            return None
+        return results[offset:] if limit is None else results[offset : offset + limit]
+
+    # -------------------------- Innovations -------------------------- #
+
+    def add_innovations(self, content: str) -> int:
+        """
+        Parse and keep a batch of innovations. Raises ValueError/TypeError on malformed content.
+        """
+        data = json.loads(content)
+        innovations = [Innovation(**item) for item in data]
+
+        with self.lock:
+            index = len(self.innovations)
+            self.innovations.append(innovations)
+
+        self.export(innovation_file_name(index), lambda: content)
+        return index
+
+    def get_innovations(self) -> List[Innovation]:
+        with self.lock:
+            return [innovation for batch in self.innovations for innovation in batch]
+
+    # -------------------------- Export -------------------------- #
+
+    def export(self, fname: str, make_content: Callable[[], str]):
+        """
+        Write a file in the background - serialization happens off the caller's thread too
+        """
+        self.export_with(self._write_text, os.path.join(self.root_dir, fname), make_content)
+
+    def export_with(self, write: Callable, *args) -> Optional[Future]:
+        if not self.export_files:
+            return None
+
+        with self.lock:
+            if self._exporter is None:
+                self._exporter = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="result_export"
+                )
+            export = self._exporter.submit(write, *args)
+            self._exports.append(export)
+        return export
+
+    def wait_for_exports(self):
+        with self.lock:
+            exports, self._exports = self._exports, []
+        for export in exports:
+            try:
+                export.result()
+            except Exception as e:
+                print(f"result_store: export failed: {e}")
+
+    def close(self):
+        self.wait_for_exports()
+        if self._exporter is not None:
+            self._exporter.shutdown()
+            self._exporter = None
+
+    def _write_text(self, path: str, make_content: Callable[[], str]):
+        # the session directory is created on first write
+        os.makedirs(self.root_dir, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(make_content())
+
+    def _write_rows(self, path: str, rows: list):
+        os.makedirs(self.root_dir, exist_ok=True)
+        write_ndjson_results(path, rows)
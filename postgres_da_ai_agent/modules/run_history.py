@@ -0,0 +1,219 @@
+"""
+Purpose:
+    Local SQLite history of every prompt run - prompt, generated SQL, where the results are,
+    innovations, timings and token cost - so history lookups are an indexed query instead of
+    a scan of the session directories under BASE_DIR.
+
+    - WAL mode so readers (dashboards, cache warming) never block the writer
+    - runs are queued and inserted in batches from a background thread
+"""
+
+import atexit
+from contextlib import closing
+from dataclasses import asdict, dataclass, field
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+BASE_DIR = os.environ.get("BASE_DIR", "./agent_results")
+
+RUN_HISTORY_DB = os.environ.get(
+    "RUN_HISTORY_DB", os.path.join(BASE_DIR, "run_history.sqlite3")
+)
+
+BATCH_SIZE = 100
+BATCH_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    session_id TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    executor TEXT NOT NULL DEFAULT '',
+    success INTEGER NOT NULL,
+    error_message TEXT NOT NULL DEFAULT '',
+    sql TEXT NOT NULL DEFAULT '',
+    row_count INTEGER,
+    result_path TEXT NOT NULL DEFAULT '',
+    innovations TEXT NOT NULL DEFAULT '[]',
+    cost REAL NOT NULL DEFAULT 0,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at);
+CREATE INDEX IF NOT EXISTS runs_prompt ON runs (prompt, created_at);
+"""
+
+COLUMNS = [
+    "session_id",
+    "prompt",
+    "executor",
+    "success",
+    "error_message",
+    "sql",
+    "row_count",
+    "result_path",
+    "innovations",
+    "cost",
+    "tokens",
+    "seconds",
+    "created_at",
+]
+
+
+@dataclass
+class RunRecord:
+    session_id: str
+    prompt: str
+    executor: str = ""
+    success: bool = False
+    error_message: str = ""
+    sql: str = ""
+    row_count: Optional[int] = None
+    result_path: str = ""
+    innovations: list = field(default_factory=list)
+    cost: float = 0.0
+    tokens: int = 0
+    seconds: float = 0.0
+    created_at: float = field(default_factory=time.time)
+
+    def as_row(self) -> tuple:
+        values = asdict(self)
+        values["success"] = int(self.success)
+        values["innovations"] = json.dumps(values["innovations"], default=str)
+        return tuple(values[column] for column in COLUMNS)
+
+    @staticmethod
+    def from_row(row: sqlite3.Row) -> "RunRecord":
+        values = dict(row)
+        values["success"] = bool(values["success"])
+        values["innovations"] = json.loads(values["innovations"])
+        return RunRecord(**values)
+
+
+class RunHistory:
+    """
+    record() is non blocking - call flush() when you need to read your own writes.
+    """
+
+    def __init__(self, path: str = RUN_HISTORY_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        with closing(self.connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+        self.queue: "queue.Queue[Optional[RunRecord]]" = queue.Queue()
+        self.closed = False
+        self.writer = threading.Thread(target=self._run, name="run_history", daemon=True)
+        self.writer.start()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # -------------------------- writes -------------------------- #
+
+    def record(self, run: RunRecord):
+        if self.closed:
+            raise ValueError("Run history is closed")
+        self.queue.put(run)
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.writer.join()
+
+    def _run(self):
+        conn = self.connect()
+        try:
+            while True:
+                batch = [self.queue.get()]
+                deadline = time.monotonic() + BATCH_INTERVAL
+                while batch[-1] is not None and len(batch) < BATCH_SIZE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self.queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+                runs = [run for run in batch if run is not None]
+                try:
+                    with conn:
+                        conn.executemany(
+                            f"INSERT OR REPLACE INTO runs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+                            [run.as_row() for run in runs],
+                        )
+                except sqlite3.Error as e:
+                    print(f"run_history: failed to write {len(runs)} runs: {e}")
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+
+                if batch[-1] is None:
+                    return
+        finally:
+            conn.close()
+
+    # -------------------------- reads -------------------------- #
+
+    def _query(self, sql: str, params: tuple = ()) -> List[RunRecord]:
+        with closing(self.connect()) as conn:
+            return [RunRecord.from_row(row) for row in conn.execute(sql, params)]
+
+    def get(self, session_id: str) -> Optional[RunRecord]:
+        runs = self._query("SELECT * FROM runs WHERE session_id = ?", (session_id,))
+        return runs[0] if runs else None
+
+    def recent(self, limit: int = 20) -> List[RunRecord]:
+        return self._query(
+            "SELECT * FROM runs ORDER BY created_at DESC LIMIT ?", (limit,)
+        )
+
+    def for_prompt(self, prompt: str, limit: int = 20) -> List[RunRecord]:
+        return self._query(
+            "SELECT * FROM runs WHERE prompt = ? ORDER BY created_at DESC LIMIT ?",
+            (prompt, limit),
+        )
+
+    def last_successful_sql(self, prompt: str) -> Optional[str]:
+        """
+        The most recent SQL that answered this exact prompt - for cache warming
+        """
+        runs = self._query(
+            "SELECT * FROM runs WHERE prompt = ? AND success = 1 AND sql != '' ORDER BY created_at DESC LIMIT 1",
+            (prompt,),
+        )
+        return runs[0].sql if runs else None
+
+
+_history: Optional[RunHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_history() -> RunHistory:
+    """
+    Process wide history - pending runs are written on interpreter exit
+    """
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = RunHistory()
+            atexit.register(_history.close)
+        return _history
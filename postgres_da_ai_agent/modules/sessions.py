@@ -0,0 +1,181 @@
+"""
+Purpose:
+    Lifecycle of the per-session directories under BASE_DIR.
+
+    - a session's directory is only created when something is first written to it
+    - old session directories are garbage collected on a background thread, never on the request path
+    - sessions that are still running are never collected - in this process or any other one sharing BASE_DIR
+      - a running session keeps a BASE_DIR/<session_id>.active marker file fresh (touched every
+        SESSION_HEARTBEAT_SECONDS), removed when it finishes
+      - a marker older than 3 heartbeats was left by a process that died, the session is collectable again
+    - a session's age is the newest modification time of anything inside its directory
+"""
+
+import os
+import shutil
+import threading
+import time
+from typing import Dict
+
+BASE_DIR = os.environ.get("BASE_DIR", "./agent_results")
+
+# session directories untouched for this long are removed - 0 disables collection
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_HOURS", "24")) * 60 * 60
+# run the collector at most this often
+SESSION_GC_INTERVAL = float(os.environ.get("SESSION_GC_INTERVAL", "600"))
+# running sessions touch their marker this often
+SESSION_HEARTBEAT_SECONDS = float(os.environ.get("SESSION_HEARTBEAT_SECONDS", "60"))
+
+ACTIVE_MARKER_SUFFIX = ".active"
+
+_active_sessions: Dict[str, str] = {}  # session id -> its marker file
+_lock = threading.Lock()
+_last_gc = 0.0
+_gc_thread = None
+_heartbeat_thread = None
+
+
+def ensure_dir(root_dir: str) -> str:
+    os.makedirs(root_dir, exist_ok=True)
+    return root_dir
+
+
+def marker_path(base_dir: str, session_id: str) -> str:
+    # next to the session directory, so marking a session active doesn't create its directory
+    return os.path.join(base_dir, session_id + ACTIVE_MARKER_SUFFIX)
+
+
+def mark_active(session_id: str, base_dir: str = BASE_DIR):
+    global _heartbeat_thread
+
+    marker = marker_path(ensure_dir(base_dir), session_id)
+    try:
+        with open(marker, "a"):
+            pass
+        os.utime(marker)
+    except OSError as e:
+        print(f"sessions: could not write {marker}: {e}")
+
+    with _lock:
+        _active_sessions[session_id] = marker
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(
+                target=_heartbeat, name="session_heartbeat", daemon=True
+            )
+            _heartbeat_thread.start()
+
+
+def mark_inactive(session_id: str):
+    with _lock:
+        marker = _active_sessions.pop(session_id, None)
+    if marker:
+        try:
+            os.remove(marker)
+        except FileNotFoundError:
+            pass
+
+
+def _heartbeat():
+    while True:
+        time.sleep(SESSION_HEARTBEAT_SECONDS)
+        with _lock:
+            markers = list(_active_sessions.values())
+        for marker in markers:
+            try:
+                # utime only - never recreate a marker mark_inactive just removed
+                os.utime(marker)
+            except OSError:
+                pass
+
+
+def is_active(base_dir: str, session_id: str, stale_before: float) -> bool:
+    with _lock:
+        if session_id in _active_sessions:
+            return True
+    try:
+        return os.stat(marker_path(base_dir, session_id)).st_mtime >= stale_before
+    except FileNotFoundError:
+        return False
+
+
+def newest_mtime(path: str) -> float:
+    """
+    Newest modification time of the directory and everything inside it - writing into an existing file
+    doesn't touch its directory's mtime.
+    """
+    newest = os.stat(path, follow_symlinks=False).st_mtime
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                newest = max(newest, os.stat(os.path.join(root, name), follow_symlinks=False).st_mtime)
+            except FileNotFoundError:
+                pass
+    return newest
+
+
+def collect_old_sessions(
+    base_dir: str = BASE_DIR, ttl_seconds: float = SESSION_TTL_SECONDS
+) -> int:
+    """
+    Remove session directories not modified within ttl_seconds. Returns how many were removed.
+    """
+    if ttl_seconds <= 0 or not os.path.isdir(base_dir):
+        return 0
+
+    now = time.time()
+    cutoff = now - ttl_seconds
+    stale_before = now - 3 * SESSION_HEARTBEAT_SECONDS
+    removed = 0
+
+    with os.scandir(base_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(ACTIVE_MARKER_SUFFIX) and entry.is_file(follow_symlinks=False):
+                _remove_stale_marker(entry, stale_before)
+                continue
+            # the run history and the assistant registry live next to the sessions as plain files
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            if is_active(base_dir, entry.name, stale_before):
+                continue
+            try:
+                if newest_mtime(entry.path) >= cutoff:
+                    continue
+                shutil.rmtree(entry.path)
+                removed += 1
+            except OSError as e:
+                print(f"sessions: could not remove {entry.path}: {e}")
+
+    if removed:
+        print(f"🧹 Removed {removed} old sessions from {base_dir}")
+    return removed
+
+
+def _remove_stale_marker(entry: os.DirEntry, stale_before: float):
+    # left behind by a process that died while its session was running
+    try:
+        if entry.stat(follow_symlinks=False).st_mtime < stale_before:
+            os.remove(entry.path)
+    except OSError:
+        pass
+
+
+def schedule_gc(base_dir: str = BASE_DIR):
+    """
+    Start a background collection if the last one was more than SESSION_GC_INTERVAL ago - returns immediately
+    """
+    global _last_gc, _gc_thread
+
+    if SESSION_TTL_SECONDS <= 0:
+        return
+
+    with _lock:
+        now = time.monotonic()
+        if _last_gc and now - _last_gc < SESSION_GC_INTERVAL:
+            return
+        if _gc_thread is not None and _gc_thread.is_alive():
+            return
+        _last_gc = now
+        _gc_thread = threading.Thread(
+            target=collect_old_sessions, args=(base_dir,), name="session_gc", daemon=True
+        )
+        _gc_thread.start()
@@ -0,0 +1,215 @@
+"""
+Purpose:
+    Fit CREATE TABLE definitions into a per model token budget before they're attached to a prompt.
+
+    - measure the tokens of every table definition
+    - abbreviate verbose postgres types (character varying -> varchar, ...)
+    - when the definitions still don't fit, keep the columns most relevant to the prompt
+      (lexical match on column names plus embedding similarity) and drop the rest
+    - report how many tokens were saved
+"""
+
+from dataclasses import dataclass, field
+import re
+from typing import Dict, List, Optional, Tuple
+
+from postgres_da_ai_agent.modules import llm
+
+# tokens available for TABLE_DEFINITIONS in a single prompt
+map_model_to_table_context_budget = {
+    "gpt-4": 2_000,
+    "gpt-4-1106-preview": 6_000,
+    "gpt-4-1106-vision-preview": 6_000,
+    "gpt-3.5-turbo-1106": 3_000,
+}
+
+DEFAULT_TABLE_CONTEXT_BUDGET = 3_000
+
+# a pruned table always keeps at least this many columns
+MIN_COLUMNS_PER_TABLE = 5
+
+map_type_to_abbreviation = [
+    ("timestamp without time zone", "timestamp"),
+    ("timestamp with time zone", "timestamptz"),
+    ("time without time zone", "time"),
+    ("time with time zone", "timetz"),
+    ("character varying", "varchar"),
+    ("double precision", "float8"),
+    ("character", "char"),
+    ("integer", "int"),
+    ("smallint", "int2"),
+    ("bigint", "int8"),
+    ("boolean", "bool"),
+]
+
+# columns that are worth keeping regardless of the prompt - they're needed for joins and filters
+KEY_COLUMN_PATTERN = re.compile(r"(^id$|_id$|^event_id$|tstamp$)")
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class TableDefinition:
+    name: str
+    header: str
+    columns: List[Tuple[str, str]]
+
+    def render(self, columns: Optional[List[Tuple[str, str]]] = None) -> str:
+        columns = self.columns if columns is None else columns
+        lines = [f"    {name} {col_type}" for name, col_type in columns]
+        omitted = len(self.columns) - len(columns)
+        body = ",\n".join(lines)
+        if omitted:
+            body += f"\n    -- {omitted} more columns omitted"
+        return f"{self.header}\n{body}\n);"
+
+
+@dataclass
+class TableContext:
+    text: str
+    original_tokens: int
+    tokens: int
+    budget: int
+    map_table_to_tokens: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.tokens
+
+
+def parse_table_definition(name: str, table_def: str) -> Optional[TableDefinition]:
+    """
+    Parse the CREATE TABLE text built by PostgresManager.get_table_definition
+    """
+    lines = table_def.strip().splitlines()
+    if not lines or not lines[0].upper().startswith("CREATE TABLE"):
+        return None
+
+    columns = []
+    for line in lines[1:]:
+        line = line.strip().rstrip(",")
+        if not line or line.startswith(")"):
+            continue
+        parts = line.split(" ", 1)
+        columns.append((parts[0], parts[1] if len(parts) > 1 else ""))
+
+    return TableDefinition(name=name, header=lines[0], columns=columns)
+
+
+def abbreviate_type(col_type: str) -> str:
+    for verbose, short in map_type_to_abbreviation:
+        if col_type.startswith(verbose):
+            return short + col_type[len(verbose) :]
+    return col_type
+
+
+def words(text: str) -> set:
+    """
+    Lower case words with a naive plural strip so 'events' matches 'event'
+    """
+    return {
+        word[:-1] if len(word) > 3 and word.endswith("s") else word
+        for word in WORD_PATTERN.findall(text.lower())
+    }
+
+
+def score_columns(
+    prompt: str, columns: List[Tuple[str, str]], database_embedder=None
+) -> Dict[str, float]:
+    """
+    Relevance of each column to the prompt: lexical overlap of the column name's words with the prompt,
+    plus cosine similarity of the embeddings when an embedder is available. Key columns get a bonus.
+    """
+    prompt_words = words(prompt)
+    prompt_embedding = None
+    if database_embedder is not None:
+        prompt_embedding = database_embedder.compute_embeddings(prompt)
+
+    scores = {}
+    for name, _ in columns:
+        column_words = words(name.replace("_", " "))
+        lexical = len(column_words & prompt_words) / max(len(column_words), 1)
+        score = 2.0 * lexical
+        if KEY_COLUMN_PATTERN.search(name):
+            score += 0.5
+        if prompt_embedding is not None:
+            score += database_embedder.get_column_similarity(prompt_embedding, name)
+        scores[name] = score
+    return scores
+
+
+def build_table_context(
+    prompt: str,
+    map_table_name_to_table_def: Dict[str, str],
+    model: str = "gpt-4-1106-preview",
+    budget: Optional[int] = None,
+    database_embedder=None,
+) -> TableContext:
+    """
+    Fit the table definitions into the model's token budget.
+
+    Tables keep their order (most relevant first). Every table gets a share of the budget proportional
+    to its abbreviated size and keeps its highest scoring columns, rendered in their original order.
+    """
+    budget = budget or map_model_to_table_context_budget.get(
+        model, DEFAULT_TABLE_CONTEXT_BUDGET
+    )
+
+    original_text = "\n\n".join(map_table_name_to_table_def.values())
+    original_tokens = llm.count_tokens(original_text)
+
+    tables: List[Tuple[str, Optional[TableDefinition], str]] = []
+    for name, table_def in map_table_name_to_table_def.items():
+        parsed = parse_table_definition(name, table_def)
+        if parsed is not None:
+            parsed.columns = [(col, abbreviate_type(t)) for col, t in parsed.columns]
+            tables.append((name, parsed, parsed.render()))
+        else:
+            tables.append((name, None, table_def))
+
+    map_table_to_tokens = {name: llm.count_tokens(text) for name, _, text in tables}
+    abbreviated_tokens = sum(map_table_to_tokens.values())
+
+    if abbreviated_tokens > budget:
+        for i, (name, parsed, text) in enumerate(tables):
+            if parsed is None:
+                continue
+
+            table_budget = int(budget * map_table_to_tokens[name] / abbreviated_tokens)
+            scores = score_columns(prompt, parsed.columns, database_embedder)
+            ranked = sorted(parsed.columns, key=lambda c: scores[c[0]], reverse=True)
+
+            # tokens per column are close enough to uniform to estimate from the full table
+            overhead = llm.count_tokens(parsed.render([]))
+            tokens_per_column = max(map_table_to_tokens[name] - overhead, 1) / max(
+                len(parsed.columns), 1
+            )
+            keep_count = max(
+                MIN_COLUMNS_PER_TABLE, int((table_budget - overhead) / tokens_per_column)
+            )
+            keep = {col for col, _ in ranked[:keep_count]}
+
+            pruned_text = parsed.render([c for c in parsed.columns if c[0] in keep])
+            tables[i] = (name, parsed, pruned_text)
+            map_table_to_tokens[name] = llm.count_tokens(pruned_text)
+
+    text = "\n\n".join(text for _, _, text in tables)
+    context = TableContext(
+        text=text,
+        original_tokens=original_tokens,
+        tokens=llm.count_tokens(text),
+        budget=budget,
+        map_table_to_tokens=map_table_to_tokens,
+    )
+
+    if context.tokens > context.budget:
+        # every table keeps at least MIN_COLUMNS_PER_TABLE columns, so many tables can still overflow
+        print(
+            f"⚠️ Table context over budget: {context.tokens}/{context.budget} tokens for {model} across {len(tables)} tables - saved {context.tokens_saved} of {context.original_tokens}"
+        )
+    else:
+        print(
+            f"📐 Table context: {context.tokens}/{context.budget} tokens for {model} - saved {context.tokens_saved} of {context.original_tokens}"
+        )
+
+    return context
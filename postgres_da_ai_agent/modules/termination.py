@@ -0,0 +1,49 @@
+"""
+Purpose:
+    Decide when a multi-agent conversation has done its job so the Orchestrator can stop early
+    instead of running every remaining agent turn.
+
+    A check is any function returning (ok, error_message) - the same shape as validate_results_func.
+"""
+
+from typing import Callable, List, Optional, Tuple
+
+TerminationCheck = Callable[[], Tuple[bool, str]]
+
+
+class TerminationPolicy:
+    """
+    Stop once the team's validate_results_func and every extra predicate pass.
+
+    validate_results_func alone isn't always enough - e.g. validate_innovation_files passes before any file
+    is written - so teams can add predicates like "at least one innovation file written".
+    """
+
+    def __init__(
+        self,
+        use_validate_results: bool = True,
+        predicates: Optional[List[TerminationCheck]] = None,
+    ):
+        self.use_validate_results = use_validate_results
+        self.predicates = predicates or []
+
+    def checks(self, validate_results_func: Optional[TerminationCheck]) -> List[TerminationCheck]:
+        checks = list(self.predicates)
+        if self.use_validate_results and validate_results_func:
+            checks.insert(0, validate_results_func)
+        return checks
+
+    def should_stop(self, validate_results_func: Optional[TerminationCheck]) -> bool:
+        checks = self.checks(validate_results_func)
+        if not checks:
+            return False
+
+        for check in checks:
+            try:
+                ok, _ = check()
+            except Exception:
+                # e.g. the results file hasn't been written yet
+                return False
+            if not ok:
+                return False
+        return True
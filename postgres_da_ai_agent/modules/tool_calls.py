@@ -0,0 +1,97 @@
+"""
+Purpose:
+    Run the tool calls from one model step concurrently.
+
+    Works with chat completion tool calls (llm.prompt_func) and Assistants API
+    requires_action tool calls (Turbo4.run_thread) - both have .id, .function.name and .function.arguments.
+
+    Calls finish in any order, so a tool with side effects that must land in the model's order
+    (run_sql storing "the" result) reads current_call_order() - (step, index) of the call it runs in.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from postgres_da_ai_agent.types import ToolCallResult, TurboTool
+
+MAX_TOOL_WORKERS = int(os.environ.get("MAX_TOOL_WORKERS", "4"))
+
+# steps are numbered process wide - a later step always orders after an earlier one
+_steps = itertools.count(1)
+_running = threading.local()
+
+
+def next_order() -> Tuple[int, int]:
+    """
+    An order after every call so far - for side effects outside of a tool call
+    """
+    return (next(_steps), 0)
+
+
+def current_call_order() -> Optional[Tuple[int, int]]:
+    """
+    (step, index in the step) of the tool call running on this thread, None outside of one
+    """
+    return getattr(_running, "order", None)
+
+
+def parse_arguments(arguments) -> dict:
+    # Check if arguments is already a dictionary, otherwise assume a JSON string
+    if isinstance(arguments, dict):
+        return arguments
+    return json.loads(arguments)
+
+
+def run_tool_call(
+    tool_call, map_function_tools: Dict[str, TurboTool], order: Optional[Tuple[int, int]] = None
+) -> ToolCallResult:
+    tool_name = tool_call.function.name
+    tool_arguments = parse_arguments(tool_call.function.arguments)
+
+    print(f"Calling {tool_name}({tool_arguments})")
+
+    _running.order = order or next_order()
+    start = time.monotonic()
+    try:
+        output = map_function_tools[tool_name].function(**tool_arguments)
+    finally:
+        _running.order = None
+    seconds = time.monotonic() - start
+
+    print(f"{tool_name} finished in {seconds:.2f}s")
+
+    return ToolCallResult(
+        tool_call_id=tool_call.id, name=tool_name, output=output, seconds=seconds
+    )
+
+
+def execute_tool_calls(
+    tool_calls,
+    map_function_tools: Dict[str, TurboTool],
+    max_workers: int = MAX_TOOL_WORKERS,
+) -> List[ToolCallResult]:
+    """
+    Run every tool call of a step on a bounded thread pool. Results keep the order of tool_calls.
+    The first failing tool call's exception is raised once all calls have finished.
+    """
+    tool_calls = list(tool_calls)
+    step = next(_steps)
+    if len(tool_calls) <= 1 or max_workers <= 1:
+        return [
+            run_tool_call(tool_call, map_function_tools, (step, index))
+            for index, tool_call in enumerate(tool_calls)
+        ]
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(tool_calls)), thread_name_prefix="tool_call"
+    ) as pool:
+        futures = [
+            pool.submit(run_tool_call, tool_call, map_function_tools, (step, index))
+            for index, tool_call in enumerate(tool_calls)
+        ]
+    return [future.result() for future in futures]
@@ -1,17 +1,30 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from postgres_da_ai_agent.types import TurboTool
 from postgres_da_ai_agent.agents.turbo4 import Turbo4
+from postgres_da_ai_agent.agents import turbo4_pool
 from postgres_da_ai_agent.modules import llm
+from postgres_da_ai_agent.modules import embeddings
+from postgres_da_ai_agent.modules import run_history
 from postgres_da_ai_agent.modules.embeddings import DatabaseEmbedder
 from postgres_da_ai_agent.modules.db import PostgresManager
-from postgres_da_ai_agent.agents import agents
-from postgres_da_ai_agent.types import ConversationResult
-from postgres_da_ai_agent.crew_builder import CrewBuilder
+from postgres_da_ai_agent.types import ConversationResult, SpeculationStats, SpeculativeResult
 import os
 import json
+import threading
+import time
+
+# autogen/guidance (agents) and crewai/langchain (crew_builder) are imported inside the executors that use
+# them so importing this module - e.g. for the constants below - stays cheap. See warmup.py to preload them.
 
 POSTGRES_TABLE_DEFINITIONS_CAP_REF = "TABLE_DEFINITIONS"
 
+SQL_DEVELOPER_INSTRUCTIONS = "You're an elite SQL developer. You generate the most concise and performant SQL queries."
+
+# Process wide counters for speculative execution - see PromptHandler(speculative=True)
+speculation_stats = SpeculationStats()
+speculation_stats_lock = threading.Lock()
+
 
 run_sql_tool_config = {
     "type": "function",
@@ -40,7 +53,7 @@ def data_analysis_prompt(nlq_confidence: int, prompt: str, db: PostgresManager ,
     print(f"✅ Gate Team Approved - Valid confidence: {nlq_confidence}")
 
     database_embedder = embeddings.DatabaseEmbedder(db)
-    table_definitions = database_embedder.get_similar_table_defs_for_prompt(prompt)
+    table_definitions = database_embedder.get_similar_table_defs_for_prompt(prompt, model="gpt-4-1106-preview")
 
     prompt = llm.add_cap_ref(
         prompt,
@@ -81,6 +94,8 @@ def invalid_prompt():
 
 
 def prompt_confidence(prompt: str, agent_instruments) -> int:
+    from postgres_da_ai_agent.agents import agents
+
     gate_orchestrator = agents.build_team_orchestrator(
         "scrum_master",
         agent_instruments,
@@ -116,9 +131,12 @@ def data_analyst_prompt_autogen(prompt: str, agent_instruments):
     agent_instruments.validate_run_sql()
 
 class PromptExecutor:
-    def __init__(self, prompt: str, agent_instruments):
+    def __init__(self, prompt: str, agent_instruments, speculation: Optional[SpeculativeResult] = None):
         self.prompt = prompt
         self.agent_instruments = agent_instruments
+        self.speculation = speculation
+        # shared schema cache - set by PromptHandler when the caller holds one (e.g. the Streamlit app)
+        self.database_embedder: Optional[DatabaseEmbedder] = None
         self.conversation_result = ConversationResult(success=True,messages=[],cost=0.0,tokens=0,last_message_str="",error_message="",suggestions=[])
 
     def __enter__(self):
@@ -129,27 +147,28 @@ class PromptExecutor:
 
     def execute(self) -> ConversationResult:
         raise NotImplementedError("Subclasses should implement this!")
+
+    def get_database_embedder(self) -> DatabaseEmbedder:
+        """
+        The shared embedder when there is one, otherwise one built (and reused) for this prompt
+        """
+        if self.database_embedder is None:
+            self.database_embedder = embeddings.DatabaseEmbedder(self.db)
+        return self.database_embedder
     
     def innovation_suggestions(self)-> ConversationResult:
         # ----------- Data Insights Team: Based on sql table definitions and a prompt generate novel insights -------------
         innovation_prompt = f"Given this database query: '{self.prompt}'. Generate novel insights and new database queries to give business insights."
         
-        map_table_name_to_table_def = self.db.get_table_definition_map_for_embeddings()
-
-        database_embedder = embeddings.DatabaseEmbedder(self.db)
-
-        for name, table_def in map_table_name_to_table_def.items():
-            database_embedder.add_table(name, table_def)
+        database_embedder = self.get_database_embedder().load_table_definitions()
 
         similar_tables = database_embedder.get_similar_tables(self.prompt, n=5)
 
         related_table_names = self.db.get_related_tables(similar_tables, n=3)
 
-        core_and_related_table_definitions = (
-            database_embedder.get_table_definitions_from_names(
-                related_table_names + similar_tables
-            )
-        )
+        core_and_related_table_definitions = database_embedder.get_table_context_from_names(
+            self.prompt, related_table_names + similar_tables, model="gpt-4"
+        ).text
 
 
         insights_prompt = llm.add_cap_ref(
@@ -159,6 +178,8 @@ class PromptExecutor:
             core_and_related_table_definitions,
         )
 
+        from postgres_da_ai_agent.agents import agents
+
         data_insights_orchestrator = agents.build_team_orchestrator(
             "data_insights",
             self.agent_instruments,
@@ -231,25 +252,18 @@ class InformationalPromptExecutor(PromptExecutor):
         pass
 
 class AutogenDataAnalystPromptExecutor(PromptExecutor):
-    def __init__(self, prompt: str,  db: PostgresManager, agent_instruments):
-        super().__init__(prompt, agent_instruments)
+    def __init__(self, prompt: str,  db: PostgresManager, agent_instruments, speculation: Optional[SpeculativeResult] = None):
+        super().__init__(prompt, agent_instruments, speculation)
         self.db = db
 
     def execute(self)-> ConversationResult:
         print(f"✅ Gate Team Approved AUTOGEN")
         # ---------- Simple Prompt Solution - Same thing, only 2 api calls instead of 8+ ------------
-        map_table_name_to_table_def = self.db.get_table_definition_map_for_embeddings()
-
-        database_embedder = embeddings.DatabaseEmbedder(self.db)
-
-        for name, table_def in map_table_name_to_table_def.items():
-            database_embedder.add_table(name, table_def)
-
-        similar_tables = database_embedder.get_similar_tables(self.prompt, n=5)
-
-        table_definitions = database_embedder.get_table_definitions_from_names(
-            similar_tables
-        )
+        if self.speculation and self.speculation.table_definitions:
+            table_definitions = self.speculation.table_definitions
+        else:
+            database_embedder = self.get_database_embedder()
+            table_definitions = database_embedder.get_similar_table_defs_for_prompt(self.prompt, model="gpt-4")
 
         prompt = llm.add_cap_ref(
             self.prompt,
@@ -276,6 +290,8 @@ class AutogenDataAnalystPromptExecutor(PromptExecutor):
 
         # ----------- Data Eng Team: Based on a sql table definitions and a prompt create an sql statement and execute it -------------
 
+        from postgres_da_ai_agent.agents import agents
+
         data_eng_orchestrator = agents.build_team_orchestrator(
             "data_eng",
             self.agent_instruments,
@@ -316,8 +332,8 @@ class AutogenDataAnalystPromptExecutor(PromptExecutor):
         return self.conversation_result
 
 class AssistantApiPromptExecutor(AutogenDataAnalystPromptExecutor):
-    def __init__(self, prompt: str, agent_instruments, assistant_name: str, db: PostgresManager, nlq_confidence: int):
-        super().__init__(prompt, db, agent_instruments)
+    def __init__(self, prompt: str, agent_instruments, assistant_name: str, db: PostgresManager, nlq_confidence: int, speculation: Optional[SpeculativeResult] = None):
+        super().__init__(prompt, db, agent_instruments, speculation)
         self.assistant_name = assistant_name
         self.db = db
         self.nlq_confidence = nlq_confidence
@@ -325,10 +341,14 @@ class AssistantApiPromptExecutor(AutogenDataAnalystPromptExecutor):
     def execute(self) -> ConversationResult:
         print(f"✅ Gate Team Approved OPEN API: {self.nlq_confidence}")
 
-        database_embedder = embeddings.DatabaseEmbedder(self.db)
-        table_definitions = database_embedder.get_similar_table_defs_for_prompt(self.prompt)
+        if self.speculation and self.speculation.table_definitions:
+            table_definitions = self.speculation.table_definitions
+        else:
+            database_embedder = self.get_database_embedder()
+            table_definitions = database_embedder.get_similar_table_defs_for_prompt(self.prompt, model="gpt-4-1106-preview")
 
-        self.prompt = llm.add_cap_ref(
+        # keep self.prompt as the raw question - innovation_suggestions builds its own context from it
+        prompt = llm.add_cap_ref(
             self.prompt,
             f"Use these {POSTGRES_TABLE_DEFINITIONS_CAP_REF} to satisfy the database query.",
             POSTGRES_TABLE_DEFINITIONS_CAP_REF,
@@ -339,63 +359,254 @@ class AssistantApiPromptExecutor(AutogenDataAnalystPromptExecutor):
             TurboTool("run_sql", run_sql_tool_config, self.agent_instruments.run_sql),
         ]
 
-        (
-            Turbo4().get_or_create_assistant(self.assistant_name)
-            .set_instructions(
-                "You're an elite SQL developer. You generate the most concise and performant SQL queries."
-            )
-            .equip_tools(tools)
-            .make_thread()
-            .add_message(self.prompt)
-            .run_thread()
-            .add_message(
-                "Use the run_sql function to run the SQL you've just generated.",
-            )
-            .run_thread(toolbox=[tools[0].name])
-            .run_validation(self.agent_instruments.validate_run_sql)
-            .spy_on_assistant(self.agent_instruments.make_agent_chat_file(self.assistant_name))
-            .get_costs_and_tokens(
-                self.agent_instruments.make_agent_cost_file(self.assistant_name)
+        # warm handle: assistant looked up, instructions set and a fresh thread already created
+        pool = turbo4_pool.get_pool(self.assistant_name, SQL_DEVELOPER_INSTRUCTIONS)
+
+        with pool.handle(tools) as assistant:
+            assistant.add_message(prompt)
+
+            if self.speculation and self.speculation.sql_draft:
+                # the sql was drafted while the gate team was deciding - skip straight to running it
+                assistant.add_message(
+                    f"Use the run_sql function to run this SQL: {self.speculation.sql_draft}",
+                )
+            else:
+                assistant.run_thread().add_message(
+                    "Use the run_sql function to run the SQL you've just generated.",
+                )
+
+            (
+                assistant.run_thread(toolbox=[tools[0].name])
+                .run_validation(self.agent_instruments.validate_run_sql)
+                .spy_on_assistant(self.agent_instruments.make_agent_chat_file(self.assistant_name))
+                .get_costs_and_tokens(
+                    self.agent_instruments.make_agent_cost_file(self.assistant_name)
+                )
             )
-        )
+            # read before the handle goes back to the pool - checkin resets its thread and totals
+            tokens = assistant.thread_tokens
+            cost = llm.estimate_price(tokens, assistant.model)
 
         print(f"✅ Turbo4 Assistant finished.")
         self.innovation_suggestions()
         result, sql, follow_up = self.agent_instruments.populate_conversation_result()
-        self.conversation_result = ConversationResult(success=True, messages=[], cost=0.0, tokens=0, last_message_str="", error_message="", sql=sql, result=result, follow_up=follow_up)
+        self.conversation_result = ConversationResult(success=True, messages=[], cost=cost, tokens=tokens, last_message_str="", error_message="", sql=sql, result=result, follow_up=follow_up, row_count=self.agent_instruments.results.row_count, result_path=self.agent_instruments.results.result_path)
         return self.conversation_result
 
 class PromptHandler:
-    def __init__(self, prompt: str, agent_instruments, db: PostgresManager, executor: str):
+    """
+    Runs the gate team on a prompt and hands back the executor that should fulfill it.
+
+    Pass a database_embedder that outlives the prompt (built with load_table_definitions()) to skip
+    embedding every table definition again on each prompt.
+
+    With speculative=True, schema retrieval (and for the AssistantAPI executor, SQL drafting)
+    start in parallel with the gate team. The speculative work has no side effects - nothing
+    is written to the session directory and no SQL is run - so when the gate rejects the
+    prompt the results are simply dropped.
+    """
+
+    def __init__(self, prompt: str, agent_instruments, db: PostgresManager, executor: str, speculative: bool = False, database_embedder: Optional[DatabaseEmbedder] = None):
         self.prompt = prompt
         self.agent_instruments = agent_instruments
         self.db = db
         self.executor = executor
+        self.database_embedder = database_embedder
+        self.speculative = speculative
+        self._speculation_pool: Optional[ThreadPoolExecutor] = None
+        self._speculation_futures = []
+        self._speculation_cancelled = threading.Event()
+        self._started = None
+        self._prompt_executor: Optional[PromptExecutor] = None
 
     def __enter__(self) -> PromptExecutor:
-        return self.assess_prompt(self.db)
+        self._started = time.time()
+        try:
+            self._prompt_executor = self.assess_prompt(self.db)
+        except Exception as e:
+            # __exit__ doesn't run when __enter__ raises - e.g. the gate team answered with something that isn't a number
+            self._discard_speculation()
+            self._record_history(e)
+            raise
+        # executors build their own embedder only when none was shared (or speculation built one)
+        self._prompt_executor.database_embedder = self.database_embedder
+        return self._prompt_executor
 
     def __exit__(self, exc_type, exc_value, traceback):
-        pass
+        self._discard_speculation()
+        self._record_history(exc_value)
+
+    def _record_history(self, error: Optional[BaseException]):
+        """
+        Queue this run for the run history - written in the background
+        """
+        try:
+            run_history.get_history().record(
+                self.agent_instruments.make_run_record(
+                    self.prompt,
+                    executor=type(self._prompt_executor).__name__ if self._prompt_executor else self.executor,
+                    conversation_result=getattr(self._prompt_executor, "conversation_result", None),
+                    error_message=str(error) if error else "",
+                    seconds=time.time() - self._started if self._started else 0.0,
+                )
+            )
+        except Exception as e:
+            print(f"run_history: could not record {self.agent_instruments.session_id}: {e}")
 
     def assess_prompt(self, db: PostgresManager) -> PromptExecutor:
+        speculation_futures = self._start_speculation() if self.speculative else None
+
+        if self.executor == "AssistantAPI":
+            # warm assistant handles while the gate team decides (when the process enabled prewarming)
+            turbo4_pool.get_pool("Turbo4", SQL_DEVELOPER_INSTRUCTIONS)
+
+        gate_start = time.time()
         nlq_confidence = self._prompt_confidence()
+        gate_elapsed = time.time() - gate_start
+
         match nlq_confidence:
             case 1 | 2:
+                self._discard_speculation()
                 return InformationalPromptExecutor(self.prompt, self.agent_instruments, "SQL_Analyst")
             case 3 | 4 | 5:
+                speculation = self._commit_speculation(speculation_futures, gate_elapsed)
                 match self.executor:
                     case "AssistantAPI":
-                        return AssistantApiPromptExecutor(self.prompt, self.agent_instruments, "Turbo4", db, nlq_confidence)
+                        return AssistantApiPromptExecutor(self.prompt, self.agent_instruments, "Turbo4", db, nlq_confidence, speculation)
                     case "Autogen":
-                        return AutogenDataAnalystPromptExecutor(self.prompt, db, self.agent_instruments)
+                        return AutogenDataAnalystPromptExecutor(self.prompt, db, self.agent_instruments, speculation)
                     case "CrewAI":
                         return CrewAIDataAnalystPromptExecutor(self.prompt, self.agent_instruments)
                     case _:
                         raise ValueError(f"Unknown executor type: {self.executor}")
 
+    # ------------- Speculative Execution -----------------
+
+    def _start_speculation(self):
+        """
+        Kick off schema retrieval and sql drafting while the gate team runs.
+        CrewAI looks up its own table definitions so there's nothing to speculate on.
+        """
+        if self.executor not in ("AssistantAPI", "Autogen"):
+            return None
+
+        print(f"🔮 Speculating on schema retrieval for executor: {self.executor}")
+
+        self._speculation_pool = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="speculation"
+        )
+        table_definitions_future = self._speculation_pool.submit(
+            self._timed, self._speculative_table_definitions
+        )
+        sql_draft_future = None
+        if self.executor == "AssistantAPI":
+            sql_draft_future = self._speculation_pool.submit(
+                self._timed, self._speculative_sql_draft, table_definitions_future
+            )
+        self._speculation_futures = [
+            f for f in (table_definitions_future, sql_draft_future) if f is not None
+        ]
+        return table_definitions_future, sql_draft_future
+
+    def _timed(self, func, *args):
+        start = time.time()
+        try:
+            return func(*args), time.time() - start
+        except Exception as e:
+            print(f"🔮 Speculative {func.__name__} failed: {e}")
+            return None, time.time() - start
+
+    def _speculative_table_definitions(self) -> Optional[str]:
+        if self._speculation_cancelled.is_set():
+            return None
+        if self.database_embedder is None:
+            self.database_embedder = embeddings.DatabaseEmbedder(self.db)
+        database_embedder = self.database_embedder
+        model = "gpt-4-1106-preview" if self.executor == "AssistantAPI" else "gpt-4"
+        return database_embedder.get_similar_table_defs_for_prompt(self.prompt, model=model)
+
+    def _speculative_sql_draft(self, table_definitions_future) -> Optional[str]:
+        table_definitions, _ = table_definitions_future.result()
+        if not table_definitions or self._speculation_cancelled.is_set():
+            return None
+        prompt = llm.add_cap_ref(
+            self.prompt,
+            f"Use these {POSTGRES_TABLE_DEFINITIONS_CAP_REF} to satisfy the database query. Respond with the SQL query only.",
+            POSTGRES_TABLE_DEFINITIONS_CAP_REF,
+            table_definitions,
+        )
+        return llm.prompt(
+            prompt,
+            model="gpt-4-1106-preview",
+            instructions=SQL_DEVELOPER_INSTRUCTIONS,
+        )
+
+    def _commit_speculation(self, speculation_futures, gate_elapsed: float) -> Optional[SpeculativeResult]:
+        """
+        Gate approved - wait for the speculative work and hand it to the executor.
+        Saved time is the part of the speculative work that overlapped with the gate team.
+        """
+        if not speculation_futures:
+            return None
+
+        table_definitions_future, sql_draft_future = speculation_futures
+        table_definitions, elapsed = table_definitions_future.result()
+        sql_draft = ""
+        if sql_draft_future is not None:
+            sql_draft, sql_elapsed = sql_draft_future.result()
+            # the draft started with the schema lookup and waited on it - its time already covers the overlap
+            elapsed = max(elapsed, sql_elapsed)
+
+        self._speculation_pool.shutdown(wait=False)
+        self._speculation_pool = None
+        self._speculation_futures = []
+
+        saved = min(gate_elapsed, elapsed)
+        with speculation_stats_lock:
+            speculation_stats.committed += 1
+            speculation_stats.saved_seconds += saved
+
+        print(f"🔮 Speculation committed - saved {saved:.2f}s. Totals: {speculation_stats}")
+
+        return SpeculativeResult(
+            table_definitions=table_definitions or "",
+            sql_draft=sql_draft or "",
+            elapsed=elapsed,
+        )
+
+    def _discard_speculation(self):
+        """
+        Gate rejected (or the handler exited) - cancel anything not started and
+        count the time of anything already running as wasted once it finishes.
+        """
+        if self._speculation_pool is None:
+            return
+
+        self._speculation_cancelled.set()
+        self._speculation_pool.shutdown(wait=False, cancel_futures=True)
+        self._speculation_pool = None
+
+        for future in self._speculation_futures:
+            future.add_done_callback(self._count_wasted)
+        self._speculation_futures = []
+
+        with speculation_stats_lock:
+            speculation_stats.discarded += 1
+
+        print(f"🔮 Speculation discarded. Totals: {speculation_stats}")
+
+    @staticmethod
+    def _count_wasted(future):
+        if future.cancelled():
+            return
+        _, elapsed = future.result()
+        with speculation_stats_lock:
+            speculation_stats.wasted_seconds += elapsed
+
 
     def _prompt_confidence(self) -> int:
+        from postgres_da_ai_agent.agents import agents
+
         gate_orchestrator = agents.build_team_orchestrator(
             "scrum_master",
             self.agent_instruments,
@@ -418,6 +629,9 @@ class CrewAIDataAnalystPromptExecutor(PromptExecutor):
 
 class CrewAIDataAnalystPromptExecutor(PromptExecutor):
     def execute(self) -> ConversationResult:
+        # crewai and langchain are only imported when this executor runs
+        from postgres_da_ai_agent.crew_builder import CrewBuilder
+
         # Initialize CrewBuilder and build the crew with the necessary tasks
         crew_builder = CrewBuilder(self.agent_instruments, self.prompt) \
             .create_agents() \
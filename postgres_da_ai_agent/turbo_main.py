@@ -33,6 +33,7 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--prompt", help="The prompt for the AI")
     parser.add_argument("--executor", default="CrewAI", help="The executor for handling the prompt")
+    parser.add_argument("--speculative", action="store_true", help="Retrieve tables and draft SQL while the gate team decides")
     args = parser.parse_args()
 
     if not args.prompt:
@@ -50,7 +51,7 @@ def main():
     session_id = rand.generate_session_id(assistant_name + raw_prompt)
 
     with PostgresAgentInstruments(DB_URL, session_id) as (agent_instruments, db):
-        with PromptHandler(raw_prompt, agent_instruments, db, args.executor) as executor:
+        with PromptHandler(raw_prompt, agent_instruments, db, args.executor, speculative=args.speculative) as executor:
             return executor.execute()
 
 
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Callable, List
+from typing import Callable, List, Optional
 from dataclasses import dataclass, field
 import time
 import json
@@ -38,6 +38,10 @@ class ConversationResult:
     result: dict = field(default_factory=dict)  # This will store the result as a dictionary
     follow_up: List[Innovation] = field(default_factory=list)  # This will store a list of Innovation instances
     suggestions: List[str] = field(default_factory=list)
+    latency: float = 0.0  # wall clock seconds of the conversation
+    skipped_turns: int = 0  # agent turns not run because the team finished early
+    row_count: Optional[int] = None  # rows in the full result - result may only hold the first page
+    result_path: str = ""  # NDJSON file to page the full result from (see modules/ndjson_results.py)
 
 
 
@@ -47,3 +51,38 @@ class TurboTool:
     name: str
     config: dict
     function: Callable
+
+
+@dataclass
+class RunStats:
+    run_id: str
+    status: str
+    polls: int
+    waited_seconds: float
+    streamed: bool = False
+
+
+@dataclass
+class ToolCallResult:
+    tool_call_id: str
+    name: str
+    output: str
+    seconds: float
+
+
+@dataclass
+class SpeculativeResult:
+    """
+    Work started before the gate team decided - only handed to an executor once the gate approves
+    """
+    table_definitions: str = ""
+    sql_draft: str = ""
+    elapsed: float = 0.0
+
+
+@dataclass
+class SpeculationStats:
+    committed: int = 0
+    discarded: int = 0
+    saved_seconds: float = 0.0
+    wasted_seconds: float = 0.0
@@ -0,0 +1,78 @@
+"""
+Pay the cold start up front - call warm_up() once at process start (or from a platform warm-up hook)
+so the first prompt only pays for its LLM and SQL work.
+
+    python -m postgres_da_ai_agent.warmup --executor AssistantAPI
+
+- imports the modules the chosen executor needs (the gate team's autogen is always needed)
+- loads the BERT model
+- with a db url, builds the schema cache (every table definition embedded) and returns it
+  - pass it to PromptHandler(database_embedder=...) / share it like batch_main does
+"""
+
+from typing import Dict, Optional, Tuple
+import argparse
+import importlib
+import os
+import time
+
+from postgres_da_ai_agent.modules import embeddings
+from postgres_da_ai_agent.modules.db import PostgresManager
+from postgres_da_ai_agent.modules.embeddings import DatabaseEmbedder
+
+EXECUTOR_MODULES = {
+    "AssistantAPI": ["postgres_da_ai_agent.agents.agents", "postgres_da_ai_agent.agents.turbo4_pool"],
+    "Autogen": ["postgres_da_ai_agent.agents.agents"],
+    "CrewAI": ["postgres_da_ai_agent.agents.agents", "postgres_da_ai_agent.crew_builder"],
+}
+
+
+def warm_up(
+    db_url: Optional[str] = None,
+    executor: str = "AssistantAPI",
+    load_model: bool = True,
+) -> Tuple[Optional[DatabaseEmbedder], Dict[str, float]]:
+    """
+    Returns the loaded schema cache (None without a db_url) and how long each step took.
+    """
+    timings: Dict[str, float] = {}
+
+    def timed(name: str, func):
+        start = time.perf_counter()
+        value = func()
+        timings[name] = time.perf_counter() - start
+        print(f"🔥 Warm up: {name} {timings[name]:.2f}s")
+        return value
+
+    for module_name in EXECUTOR_MODULES.get(executor, []):
+        timed(f"import {module_name}", lambda: importlib.import_module(module_name))
+
+    if load_model:
+        timed("load bert", embeddings.load_bert)
+
+    database_embedder = None
+    if db_url:
+        # the embedder keeps its connection - it outlives any single prompt
+        db = PostgresManager()
+        db.connect_with_url(db_url)
+        database_embedder = timed(
+            "schema cache", lambda: DatabaseEmbedder(db).load_table_definitions()
+        )
+
+    return database_embedder, timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--executor", default="AssistantAPI", choices=list(EXECUTOR_MODULES))
+    parser.add_argument("--skip-model", action="store_true", help="Don't load the BERT model")
+    args = parser.parse_args()
+
+    _, timings = warm_up(
+        os.environ.get("DATABASE_URL"), executor=args.executor, load_model=not args.skip_model
+    )
+    print(f"🔥 Warm up done in {sum(timings.values()):.2f}s")
+
+
+if __name__ == "__main__":
+    main()